@@ -1,35 +1,137 @@
 """
 Module for defining Admin Panel related Stuff
 """
+from typing import Dict, Optional, Tuple
+
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy.orm import Query
+from wtforms import Form
 
-from utils.mixins import AdminRequiredMixin
+from models.event import EventModel, GuestEventModel, \
+    ParticipantEventModel, event_search
+from models.guest import GuestModel
+from models.participant import ParticipantModel
+from resources.event import invalidate_events
+from utils.mixins import AdminRequiredMixin, StreamingExportMixin
 
 
-class EventAdmin(AdminRequiredMixin, ModelView):
+class EventAdmin(AdminRequiredMixin, StreamingExportMixin,
+                 ModelView):
     """
     Admin Panel Settings for Event Model
     """
     column_hide_backrefs = False
     can_export = True
     column_searchable_list = ('name', 'description',)
-    column_list = ('id', 'name', 'start', 'end',
-                   'description', 'participants',)
+    column_list = ('id', 'name', 'start', 'end', 'description',
+                   'participants', 'guest_count', 'participant_count',)
+    # Counters are maintained by the registration methods of EventModel
+    form_excluded_columns = ('guest_count', 'participant_count',
+                             'updated_at',)
+    # Relationships are loaded by get_query instead of flask-admin joins
+    column_auto_select_related = False
+
+    def get_query(self) -> Query:
+        """
+        Return query for the list view with displayed relationships
+        loaded in a fixed number of queries
+        :return: Query
+        """
+        return super().get_query() \
+            .options(*EventModel.loader_options(self.column_list, many=True))
+
+    def _apply_search(self, query: Query, count_query: Optional[Query],
+                      joins: Dict, count_joins: Dict, search: str) \
+            -> Tuple[Query, Optional[Query], Dict, Dict]:
+        """
+        Search name and description through the full-text index
+        instead of LIKE scans of searchable columns
+        :param query: Query
+        :param count_query: Optional[Query]
+        :param joins: Dict
+        :param count_joins: Dict
+        :param search: str
+        :return: Tuple[Query, Optional[Query], Dict, Dict]
+        """
+        query, _rank = event_search.search(query, search)
+        if count_query is not None:
+            count_query, _rank = event_search.search(count_query, search)
+        return query, count_query, joins, count_joins
+
+    def after_model_change(self, form: Form, model: EventModel,
+                           is_created: bool) -> None:
+        """
+        Recount registrations, that could be edited through the form.
+        Flask-Admin commits the form on its own, the recount is
+        committed once the request is handled
+        :param form: Form
+        :param model: EventModel
+        :param is_created: bool
+        :return: None
+        """
+        EventModel.refresh_counts([model.id])
+        invalidate_events(model.id)
 
+    def after_model_delete(self, model: EventModel) -> None:
+        """
+        Invalidate cached responses with the deleted event
+        :param model: EventModel
+        :return: None
+        """
+        invalidate_events(model.id)
 
-class ParticipantAdmin(AdminRequiredMixin, ModelView):
+
+class ParticipantAdmin(AdminRequiredMixin, StreamingExportMixin,
+                       ModelView):
     """
     Admin Panel Settings for Participant Model
     """
     can_export = True
     column_searchable_list = ('name',)
     column_list = ('id', 'name',)
+    form_excluded_columns = ('updated_at',)
+
+    def after_model_change(self, form: Form, model: ParticipantModel,
+                           is_created: bool) -> None:
+        """
+        Mark events showing the participant as modified
+        and invalidate their cached details, once the request
+        is handled and the change is committed
+        :param form: Form
+        :param model: ParticipantModel
+        :param is_created: bool
+        :return: None
+        """
+        if not is_created:
+            event_ids = ParticipantEventModel.event_ids(model.id)
+            EventModel.touch(event_ids)
+            invalidate_events(*event_ids, lists=False)
 
+    def on_model_delete(self, model: ParticipantModel) -> None:
+        """
+        Keep registration counters of events consistent
+        :param model: ParticipantModel
+        :return: None
+        """
+        invalidate_events(*ParticipantEventModel.event_ids(model.id))
+        EventModel.release_participant(model.id)
 
-class GuestAdmin(AdminRequiredMixin, ModelView):
+
+class GuestAdmin(AdminRequiredMixin, StreamingExportMixin,
+                 ModelView):
     """
     Admin Panel Settings for Guest Model
     """
     can_export = True
     column_searchable_list = ('name',)
     column_list = ('id', 'name',)
+    form_excluded_columns = ('updated_at',)
+
+    def on_model_delete(self, model: GuestModel) -> None:
+        """
+        Keep registration counters of events consistent
+        :param model: GuestModel
+        :return: None
+        """
+        invalidate_events(*GuestEventModel.event_ids(model.id))
+        EventModel.release_guest(model.id)
@@ -1,9 +1,12 @@
 """
 Main Script for Setup and App running
 """
+import json
 import os
+import time
 from typing import Tuple
 
+import click
 import jwt
 from dotenv import load_dotenv
 from flask import Flask, jsonify, g, Response
@@ -14,14 +17,22 @@ from flask_restful import Api
 from marshmallow import ValidationError
 
 from admin import EventAdmin, GuestAdmin, ParticipantAdmin
-from db import db
+from db import db, unit_of_work
 from ma import ma
-from models.event import EventModel
+from models.event import EventModel, event_hot_set, event_spans
 from models.guest import GuestModel
 from models.participant import ParticipantModel
-from resources.event import RetrieveUpdateDestroyEvent, ListCreateEvent
-from resources.guest import Login, EventGuests, GuestResource
-from resources.participant import EventParticipants, ParticipantResource
+from resources.event import RetrieveUpdateDestroyEvent, ListCreateEvent, \
+    CreateEventBatch, EventHistogram, ExportEvents
+from resources.guest import Login, EventGuests, GuestList, GuestResource
+from resources.participant import EventParticipants, ParticipantList, \
+    ParticipantResource
+from utils.books import UpstreamError
+from utils.instrumentation import instrumentation
+from utils.interval_index import InvalidTimeRange
+from utils.pagination import InvalidCursor, InvalidOrder
+from utils.response_cache import response_cache
+from utils.serializer import InvalidFields
 
 # Define app configs
 app = Flask(__name__)
@@ -33,6 +44,18 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['PROPAGATE_EXCEPTIONS'] = True
 app.config['BABEL_DEFAULT_LOCALE'] = 'en'
+app.config['RESPONSE_CACHE_URL'] = os.getenv('RESPONSE_CACHE_URL',
+                                             'memory://')
+app.config['RESPONSE_CACHE_TTL'] = float(os.getenv('RESPONSE_CACHE_TTL') or 30)
+app.config['SLOW_QUERY_THRESHOLD'] = float(
+    os.getenv('SLOW_QUERY_THRESHOLD') or 0.2
+)
+# Interval tree refreshes changes of other processes every few seconds,
+# events modified since its latest refresh are matched in the database
+app.config['EVENT_INTERVAL_INDEX'] = \
+    os.getenv('EVENT_INTERVAL_INDEX', '0').lower() in ('1', 'true')
+app.config['EVENT_HOT_SET'] = \
+    os.getenv('EVENT_HOT_SET', '0').lower() in ('1', 'true')
 app.secret_key = os.getenv('SECRET_KEY')
 
 api = Api(app)
@@ -91,19 +114,110 @@ def handle_jwt_error(err: jwt.PyJWTError) -> Tuple[Response, int]:
     return jsonify({'message': str(err)}), 400
 
 
+@app.errorhandler(InvalidCursor)
+def handle_invalid_cursor(err: InvalidCursor) -> Tuple[Response, int]:
+    """
+    Handler for malformed pagination cursors
+    :param err: InvalidCursor
+    :return: Tuple[Response, int]
+    """
+    return jsonify({'message': _('invalid_cursor')}), 400
+
+
+@app.errorhandler(InvalidOrder)
+def handle_invalid_order(err: InvalidOrder) -> Tuple[Response, int]:
+    """
+    Handler for ordering by columns, that are not sortable
+    :param err: InvalidOrder
+    :return: Tuple[Response, int]
+    """
+    return jsonify({'message': _('invalid_order_by').format(err)}), 400
+
+
+@app.errorhandler(InvalidTimeRange)
+def handle_invalid_time_range(err: InvalidTimeRange) \
+        -> Tuple[Response, int]:
+    """
+    Handler for time range filters, that are not valid
+    :param err: InvalidTimeRange
+    :return: Tuple[Response, int]
+    """
+    return jsonify({'message': _('invalid_time_range').format(err)}), 400
+
+
+@app.errorhandler(InvalidFields)
+def handle_invalid_fields(err: InvalidFields) -> Tuple[Response, int]:
+    """
+    Handler for requests of fields, that can not be dumped
+    :param err: InvalidFields
+    :return: Tuple[Response, int]
+    """
+    return jsonify({'message': _('invalid_fields').format(err)}), 400
+
+
+@app.errorhandler(UpstreamError)
+def handle_upstream_error(err: UpstreamError) -> Tuple[Response, int]:
+    """
+    Handler for failures of the Book Reviews service
+    :param err: UpstreamError
+    :return: Tuple[Response, int]
+    """
+    return jsonify({'message': _('books_service_unavailable')}), 503
+
+
+@app.cli.command('check-hot-set')
+@click.option('--wait', type=float, default=0.0,
+              help='Seconds to keep the hot set before the check, '
+                   'so that events change status in the meantime.')
+def check_hot_set(wait: float) -> None:
+    """
+    Compare hot set of upcoming and ongoing events with the database
+    and exit with status 1 when they differ
+    :param wait: float
+    :return: None
+    """
+    event_hot_set.load()
+    time.sleep(wait)
+    differences = EventModel.check_hot_set()
+    click.echo(json.dumps(differences, indent=2))
+    if differences:
+        raise SystemExit(1)
+
+
+@app.cli.command('cache-stats')
+def cache_stats() -> None:
+    """
+    Show hits, misses and hit ratio of the response cache. Counters
+    of the memory backend are only seen by the process they are kept
+    in, those of Redis by every process using the same server
+    :return: None
+    """
+    click.echo(json.dumps(response_cache.stats(), indent=2))
+
+
 # Register Endpoints
 api.add_resource(ListCreateEvent,
                  '/events')
 api.add_resource(RetrieveUpdateDestroyEvent,
                  '/events/<int:id_>')
+api.add_resource(CreateEventBatch,
+                 '/events/batch')
+api.add_resource(ExportEvents,
+                 '/events/export')
+api.add_resource(EventHistogram,
+                 '/events/histogram')
 api.add_resource(EventGuests,
                  '/events/<int:event_id>/guests')
 api.add_resource(EventParticipants,
                  '/events/<int:event_id>/participants')
 api.add_resource(Login,
                  '/login')
+api.add_resource(GuestList,
+                 '/guests')
 api.add_resource(GuestResource,
                  '/guests/<int:id_>')
+api.add_resource(ParticipantList,
+                 '/participants')
 api.add_resource(ParticipantResource,
                  '/participants/<int:id_>')
 
@@ -120,6 +234,12 @@ admin.add_view(GuestAdmin(GuestModel,
 # Initialize SQLAlchemy and Marshmallow
 db.init_app(app)
 ma.init_app(app)
+response_cache.init_app(app)
+instrumentation.init_app(app)
+# Registered last, so changes are committed before the request is measured
+unit_of_work.init_app(app)
+event_spans.enabled = app.config['EVENT_INTERVAL_INDEX']
+event_hot_set.enabled = app.config['EVENT_HOT_SET']
 
 if __name__ == '__main__':
     """
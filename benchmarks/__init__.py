@@ -0,0 +1,3 @@
+"""
+Benchmark Suite of the App Endpoints
+"""
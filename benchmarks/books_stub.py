@@ -0,0 +1,181 @@
+"""
+Local Stub of the Book Reviews Service Endpoints used by the App
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+import jwt
+
+DOCUMENT_PATH = re.compile(r'^/api/(user|author)/(\d+)/?$')
+
+
+class BooksStub:
+    """
+    Book Reviews service answering /api/login/, /api/user/<id>
+    and /api/author/<id> after configurable latency.
+    Users and authors exist for ids up to max_id,
+    login succeeds with the configured password
+    """
+    def __init__(self, *, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 max_id: int = 10 ** 9,
+                 password: Optional[str] = 'password',
+                 secret_key: str = 'secret', seed: Optional[int] = None) \
+            -> None:
+        """
+        Initialize Stub
+        :param host: str = '127.0.0.1'
+        :param port: int = 0 - any free port
+        :param latency: float = 0.0 - seconds before every response
+        :param jitter: float = 0.0 - random seconds added to latency
+        :param max_id: int = 10 ** 9
+        :param password: Optional[str] = 'password' - any password
+            is accepted when None
+        :param secret_key: str = 'secret' - signs issued tokens
+        :param seed: Optional[int] = None
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.max_id = max_id
+        self.password = password
+        self.secret_key = secret_key
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Base url to be used as BOOKS_URL
+        :return: str
+        """
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'BooksStub':
+        """
+        Start serving requests in a background thread
+        :return: BooksStub
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name='books-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving requests
+        :return: None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'BooksStub':
+        """
+        Start stub for the with block
+        :return: BooksStub
+        """
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Stop stub after the with block
+        :param exc_info: Any
+        :return: None
+        """
+        self.stop()
+
+    def delay(self) -> None:
+        """
+        Wait for the configured latency
+        :return: None
+        """
+        with self._lock:
+            self.calls += 1
+            seconds = self.latency + self._random.uniform(0, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def document(self, kind: str, id_: int) -> Tuple[int, Dict]:
+        """
+        Return status and body of the user or author document
+        :param kind: str - user or author
+        :param id_: int
+        :return: Tuple[int, Dict]
+        """
+        if not 0 < id_ <= self.max_id:
+            return 404, {'detail': 'Not found.'}
+        return 200, {'id': id_, 'name': f'{kind.capitalize()} {id_}'}
+
+    def login(self, credentials: Dict) -> Tuple[int, Dict]:
+        """
+        Return status and body of the login response
+        :param credentials: Dict
+        :return: Tuple[int, Dict]
+        """
+        if self.password is not None \
+                and credentials.get('password') != self.password:
+            return 401, {'detail': 'Invalid credentials.'}
+
+        username = str(credentials.get('username', ''))
+        claims = {
+            'id': int(username) if username.isdigit() else 1,
+            'is_admin': username in ('admin', '1'),
+            'exp': int(time.time()) + 3600,
+        }
+        return 200, {'access_token': jwt.encode(claims, self.secret_key,
+                                                algorithm='HS256')}
+
+    def _handler(self) -> type:
+        """
+        Create request handler class bound to the stub
+        :return: type
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are sent separately, delaying
+            # responses on kept alive connections otherwise
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def send(self, status: int, body: Dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self) -> None:
+                stub.delay()
+                match = DOCUMENT_PATH.match(self.path)
+                if match is None:
+                    return self.send(404, {'detail': 'Not found.'})
+                self.send(*stub.document(match.group(1),
+                                         int(match.group(2))))
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                stub.delay()
+                if self.path.rstrip('/') != '/api/login':
+                    return self.send(404, {'detail': 'Not found.'})
+                try:
+                    credentials = json.loads(body or b'{}')
+                except ValueError:
+                    return self.send(400, {'detail': 'Malformed JSON.'})
+                self.send(*stub.login(credentials))
+
+        return Handler
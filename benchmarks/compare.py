@@ -0,0 +1,123 @@
+"""
+Comparison of two Benchmark Results.
+
+Prints change of p95 latency, SQL queries and commits of every endpoint
+measured in both results and exits with status 1 when any of them
+grew by more than the threshold. Results measured before commits
+were counted are compared by latency and queries only
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+def changes(baseline: Dict, current: Dict) \
+        -> Iterator[Tuple[str, str, Dict, Dict]]:
+    """
+    Yield scale, endpoint and measurements of the endpoints
+    present in both results
+    :param baseline: Dict
+    :param current: Dict
+    :return: Iterator[Tuple[str, str, Dict, Dict]]
+    """
+    for scale, results in current['scales'].items():
+        old_endpoints = baseline['scales'].get(scale, {}).get('endpoints', {})
+        for name, new in results['endpoints'].items():
+            if name in old_endpoints:
+                yield scale, name, old_endpoints[name], new
+
+
+def ratio(old: float, new: float) -> float:
+    """
+    Relative change from old to new value
+    :param old: float
+    :param new: float
+    :return: float
+    """
+    if old == 0:
+        return 0.0 if new == 0 else float('inf')
+    return new / old - 1
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.2,
+            min_latency: float = 1.0) -> Tuple[List[str], List[str]]:
+    """
+    Compare results, returning report lines and regressions.
+    Latencies below min_latency milliseconds in both results
+    are too noisy to be reported as regressions
+    :param baseline: Dict
+    :param current: Dict
+    :param threshold: float = 0.2 - allowed relative growth
+    :param min_latency: float = 1.0
+    :return: Tuple[List[str], List[str]]
+    """
+    lines = [f'{"scale":<8} {"endpoint":<32} {"p95 ms":>21} '
+             f'{"change":>8} {"sql":>13} {"commits":>13}']
+    regressions = []
+    for scale, name, old, new in changes(baseline, current):
+        old_p95 = old['latency_ms']['p95']
+        new_p95 = new['latency_ms']['p95']
+        old_sql = old['sql_queries']['mean']
+        new_sql = new['sql_queries']['mean']
+        old_commits = old.get('commits', {}).get('mean')
+        new_commits = new.get('commits', {}).get('mean')
+        latency_change = ratio(old_p95, new_p95)
+
+        lines.append(f'{scale:<8} {name:<32} {old_p95:>10.2f}'
+                     f'{new_p95:>11.2f} {latency_change:>+8.0%} '
+                     f'{old_sql:>6g}{new_sql:>7g} '
+                     f'{old_commits if old_commits is not None else "-":>6}'
+                     f'{new_commits if new_commits is not None else "-":>7}')
+
+        if latency_change > threshold and new_p95 >= min_latency:
+            regressions.append(f'{scale} {name}: p95 {old_p95:.2f} ms '
+                               f'-> {new_p95:.2f} ms')
+        if ratio(old_sql, new_sql) > threshold:
+            regressions.append(f'{scale} {name}: sql queries '
+                               f'{old_sql:g} -> {new_sql:g}')
+        if old_commits is not None and new_commits is not None \
+                and ratio(old_commits, new_commits) > threshold:
+            regressions.append(f'{scale} {name}: commits '
+                               f'{old_commits:g} -> {new_commits:g}')
+        if new['errors'] > old['errors']:
+            regressions.append(f'{scale} {name}: errors '
+                               f'{old["errors"]} -> {new["errors"]}')
+    return lines, regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Compare results files given on the command line
+    :param argv: Optional[Sequence[str]] = None
+    :return: int - exit status
+    """
+    parser = argparse.ArgumentParser(
+        description='Compare two results of benchmarks/run.py'
+    )
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative growth of p95 latency, '
+                             'SQL queries and commits, 0.2 by default')
+    parser.add_argument('--min-latency', type=float, default=1.0,
+                        help='p95 milliseconds below which latency '
+                             'growth is ignored')
+    options = parser.parse_args(argv)
+
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    with open(options.current) as file:
+        current = json.load(file)
+
+    lines, regressions = compare(baseline, current, options.threshold,
+                                 options.min_latency)
+    print('\n'.join(lines))
+    if regressions:
+        print('\nRegressions:\n' + '\n'.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
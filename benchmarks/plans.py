@@ -0,0 +1,220 @@
+"""
+Query Plan Check of the Event List.
+
+Explains every statement EventModel.get_list runs for each combination
+of status, participant, guest, search and time filters, order column,
+direction and pagination style, and exits with status 1 when any plan
+falls back to a full scan of a table. Checked database is the seeded
+one of the scale, see benchmarks/seed.py, or the one given by url
+"""
+import argparse
+import itertools
+import os
+import re
+import sys
+from datetime import timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATUSES = (None, 'past', 'ongoing', 'upcoming')
+
+# Time filters, either the range between from and to or the moment at
+TIME_FILTERS = ((), ('from', 'to'), ('at',))
+
+# Relationships dumped along with the events,
+# so association lookups by event are explained as well
+FIELDS = ('guests', 'participants')
+
+# SQLite reports a table scan as SCAN followed by just the table name,
+# scans of an index or a virtual table are followed by more words
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\s*$')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Statement(NamedTuple):
+    statement: str
+    parameters: Sequence
+
+
+class Failure(NamedTuple):
+    query_params: Dict
+    pagination: str
+    statement: str
+    plan: str
+
+
+def combinations(order_columns: Sequence[str]) -> Iterator[Dict]:
+    """
+    Yield query params of every filter, order and direction combination.
+    Member and search filters are given as flags, the values are
+    picked from the checked database
+    :param order_columns: Sequence[str]
+    :return: Iterator[Dict]
+    """
+    for status, participant, guest, search, time_filter, order_by, order \
+            in itertools.product(STATUSES, (False, True), (False, True),
+                                 (False, True), TIME_FILTERS,
+                                 (None, *order_columns), ('asc', 'desc')):
+        params = {'order': order}
+        if status is not None:
+            params['status'] = status
+        if participant:
+            params['participant'] = True
+        if guest:
+            params['guest'] = True
+        if search:
+            params['q'] = True
+        params.update(dict.fromkeys(time_filter, True))
+        if order_by is not None:
+            params['order_by'] = order_by
+        yield params
+
+
+def full_scans(dialect: str, statement: str, plan: str) -> List[str]:
+    """
+    Tables scanned in full by the plan of the statement.
+    SQLite scans the table along its primary key to return rows in id
+    order, which stops at the page limit, so such a scan is only counted
+    when its rows have to be sorted or the statement is not limited
+    :param dialect: str
+    :param statement: str
+    :param plan: str
+    :return: List[str]
+    """
+    if dialect != 'sqlite':
+        return POSTGRES_SCAN.findall(plan)
+
+    lines = plan.splitlines()
+    tables = [match.group(1) for match in map(SQLITE_SCAN.search, lines)
+              if match is not None]
+    ordered = SQLITE_SORT not in plan and 'LIMIT' in statement.upper()
+    return [] if ordered else tables
+
+
+def check(limit: int = 20) -> List[Failure]:
+    """
+    Explain statements of every list combination. Has to be called
+    within app context of a database with registered guests
+    and participants
+    :param limit: int = 20 - page size
+    :return: List[Failure]
+    """
+    from sqlalchemy import event
+
+    from db import db
+    from models.event import EventModel, GuestEventModel, \
+        ParticipantEventModel
+    from utils.instrumentation import Instrumentation
+
+    participant = ParticipantEventModel.query.first().participant_id
+    guest = GuestEventModel.query.first().guest_id
+    first = EventModel.query.order_by(EventModel.id).first()
+    moment = first.start.isoformat()
+    values = {'participant': participant, 'guest': guest,
+              'q': first.name.split()[0], 'from': moment,
+              'to': (first.start + timedelta(days=7)).isoformat(),
+              'at': moment}
+
+    statements: List[Statement] = []
+
+    def record(conn, cursor, statement, parameters, context,
+               executemany) -> None:
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(Statement(statement, parameters))
+
+    engine = db.engine
+    failures = []
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            # Small tables are scanned sequentially even when indexed,
+            # scan is only planned now when there is no index to use
+            conn.execute('SET enable_seqscan = off')
+
+        for flags in combinations(EventModel.sortable_columns):
+            query_params = {key: values.get(key, value)
+                            if value is True else value
+                            for key, value in flags.items()}
+
+            # Second page of keyset pagination seeks past the first one
+            next_key = EventModel.get_list(limit=limit,
+                                           query_params=dict(query_params),
+                                           cursor={}).next_key
+            cursors = {'page': None, 'cursor': {}, 'next cursor': next_key}
+
+            for pagination, cursor in cursors.items():
+                if pagination == 'next cursor' and cursor is None:
+                    continue
+                statements.clear()
+                event.listen(engine, 'before_cursor_execute', record)
+                try:
+                    EventModel.get_list(limit=limit,
+                                        query_params=dict(query_params),
+                                        cursor=cursor, fields=FIELDS)
+                finally:
+                    event.remove(engine, 'before_cursor_execute', record)
+                    db.session.rollback()
+
+                for statement, parameters in statements:
+                    plan = Instrumentation.explain(conn, statement,
+                                                   parameters)
+                    if full_scans(engine.dialect.name, statement, plan):
+                        failures.append(Failure(query_params, pagination,
+                                                statement, plan))
+    return failures
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Check plans of the database given on the command line
+    :param argv: Optional[Sequence[str]] = None
+    :return: int - exit status
+    """
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(
+        description='Fail when any filter combination of the event list '
+                    'is planned as a full table scan'
+    )
+    parser.add_argument('--scale', choices=list(SCALES), default='small',
+                        help='seeded database to check')
+    parser.add_argument('--database-uri',
+                        help='check this database instead of a seeded one')
+    parser.add_argument('--database-dir',
+                        default=os.path.join(ROOT, 'benchmarks', '.data'),
+                        help='seeded databases are kept here between runs')
+    parser.add_argument('--analyze', action='store_true',
+                        help='gather planner statistics before the check')
+    parser.add_argument('--limit', type=int, default=20, help='page size')
+    options = parser.parse_args(argv)
+
+    if options.database_uri is None:
+        os.makedirs(options.database_dir, exist_ok=True)
+        database = os.path.join(os.path.abspath(options.database_dir),
+                                f'{options.scale}.db')
+        options.database_uri = f'sqlite:///{database}'
+    os.environ['DATABASE_URI'] = options.database_uri
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+
+    from app import app
+    from benchmarks import seed
+    from db import db
+
+    with app.app_context():
+        if options.database_uri.startswith('sqlite'):
+            seed.seed(options.scale)
+        if options.analyze:
+            db.session.execute('ANALYZE')
+            db.session.commit()
+        failures = check(options.limit)
+
+    for failure in failures:
+        print(f'{failure.query_params} {failure.pagination}\n'
+              f'{failure.statement}\n{failure.plan}\n')
+    print(f'{len(failures)} statements planned as full scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
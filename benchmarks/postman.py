@@ -0,0 +1,583 @@
+"""
+Load Test replaying Requests of the Postman Collection.
+
+Requests of the collection, along with their saved examples, make up
+a weighted mix of traffic. Variables are substituted for every request,
+values like 1-1000 or 1,5,9 pick a random one each time, and literal
+ids in the paths can be turned into variables with --parameterize.
+Requests are authorized with JWT tokens signed with SECRET_KEY.
+
+Traffic is either closed, with every worker sending the next request
+once the previous one is answered, or open, arriving at --rate
+requests per second regardless of how fast they are served.
+In open mode latency is measured from the time the request was due,
+so that queueing behind slow requests is not hidden
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, \
+    Tuple
+
+import jwt
+import requests
+
+from benchmarks.run import PERCENTILES, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTION = os.path.join(ROOT, 'Flask-Events.postman_collection.json')
+
+VARIABLE = re.compile(r'{{\s*([$\w.-]+)\s*}}')
+RANGE = re.compile(r'^(-?\d+)-(-?\d+)$')
+
+# Upper bounds of latency histogram buckets, in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+           float('inf'))
+
+# Literal ids following these path segments are replaced by variables.
+# Guests are users themselves, so their id is the id of the token
+PARAMETERS = {
+    'events': 'event_id',
+    'guests': 'user_id',
+    'participants': 'participant_id',
+}
+
+
+class Step(NamedTuple):
+    """
+    Request of the collection, with variables not yet substituted
+    """
+    name: str
+    method: str
+    url: str
+    headers: Dict[str, str]
+    body: Optional[str]
+    auth: bool
+
+
+class Variables:
+    """
+    Values of the collection variables. Ranges and lists of values
+    are resolved to one of them separately for every request
+    """
+    def __init__(self, values: Dict[str, str],
+                 rng: Optional[random.Random] = None) -> None:
+        """
+        Initialize Variables
+        :param values: Dict[str, str]
+        :param rng: Optional[random.Random] = None
+        """
+        self.values = values
+        self.rng = rng or random.Random()
+
+    def resolve(self) -> Dict[str, str]:
+        """
+        Pick values of the variables for a single request
+        :return: Dict[str, str]
+        """
+        resolved = {'$guid': str(uuid.uuid4()),
+                    '$timestamp': str(int(time.time())),
+                    '$randomInt': str(self.rng.randint(0, 1000))}
+        for name, value in self.values.items():
+            match = RANGE.match(value)
+            if match is not None:
+                low, high = sorted(map(int, match.groups()))
+                value = str(self.rng.randint(low, high))
+            elif ',' in value:
+                value = self.rng.choice(value.split(','))
+            resolved[name] = value
+        return resolved
+
+    @staticmethod
+    def substitute(text: str, values: Dict[str, str]) -> str:
+        """
+        Replace variables in the text, unknown ones are kept
+        :param text: str
+        :param values: Dict[str, str]
+        :return: str
+        """
+        return VARIABLE.sub(
+            lambda match: values.get(match.group(1), match.group(0)), text
+        )
+
+
+def parameterize(url: str) -> str:
+    """
+    Replace literal ids in the url by variables
+    :param url: str
+    :return: str
+    """
+    for segment, variable in PARAMETERS.items():
+        url = re.sub(rf'/{segment}/\d+(?=/|\?|$)',
+                     f'/{segment}/{{{{{variable}}}}}', url)
+    return url
+
+
+def load_collection(path: str, *, examples: bool = True,
+                    parameterized: bool = False) \
+        -> Tuple[List[Step], Dict[str, str]]:
+    """
+    Load requests and variables of the collection.
+    Saved examples of a request are loaded as separate steps
+    :param path: str
+    :param examples: bool = True
+    :param parameterized: bool = False - replace literal ids by variables
+    :return: Tuple[List[Step], Dict[str, str]]
+    """
+    with open(path) as file:
+        collection = json.load(file)
+
+    def make_step(name: str, request: Dict, auth: Optional[Dict]) -> Step:
+        url = request['url']
+        url = url['raw'] if isinstance(url, dict) else url
+        body = request.get('body') or {}
+        auth = request.get('auth') or auth
+        return Step(
+            name=name,
+            method=request['method'],
+            url=parameterize(url) if parameterized else url,
+            headers={header['key']: header['value']
+                     for header in request.get('header') or ()
+                     if not header.get('disabled')},
+            body=body.get('raw') if body.get('mode', 'raw') == 'raw'
+            else None,
+            auth=auth is not None and auth.get('type') != 'noauth'
+        )
+
+    def walk(items: List[Dict], prefix: str, auth: Optional[Dict]) \
+            -> Iterator[Step]:
+        for item in items:
+            name = f'{prefix}{item["name"]}'
+            if 'item' in item:
+                yield from walk(item['item'], f'{name} / ',
+                                item.get('auth') or auth)
+                continue
+            yield make_step(name, item['request'], auth)
+            if examples:
+                for example in item.get('response') or ():
+                    if example.get('originalRequest'):
+                        yield make_step(f'{name} / {example["name"]}',
+                                        example['originalRequest'],
+                                        item['request'].get('auth')
+                                        or auth)
+
+    variables = {variable['key']: str(variable.get('value', ''))
+                 for variable in collection.get('variable') or ()}
+    return list(walk(collection['item'], '', collection.get('auth'))), \
+        variables
+
+
+class LoadTest:
+    """
+    Replay of the collection steps by a pool of worker threads
+    """
+    def __init__(self, steps: Sequence[Step], variables: Variables, *,
+                 secret_key: str, weights: Optional[Dict[str, float]] = None,
+                 concurrency: int = 8, rate: Optional[float] = None,
+                 poisson: bool = True, timeout: float = 10.0,
+                 token_ttl: int = 3600, admin: bool = True,
+                 seed: Optional[int] = None) -> None:
+        """
+        Initialize Load Test
+        :param steps: Sequence[Step]
+        :param variables: Variables
+        :param secret_key: str - signs tokens of the requests
+        :param weights: Optional[Dict[str, float]] = None - relative
+            frequency of the steps by name, 1 by default
+        :param concurrency: int = 8 - worker threads
+        :param rate: Optional[float] = None - requests per second,
+            closed traffic when not given
+        :param poisson: bool = True - random intervals between arrivals
+        :param timeout: float = 10.0 - seconds to wait for response
+        :param token_ttl: int = 3600
+        :param admin: bool = True - is_admin claim of the tokens
+        :param seed: Optional[int] = None
+        """
+        self.steps = list(steps)
+        self.variables = variables
+        self.secret_key = secret_key
+        self.weights = [(weights or {}).get(step.name, 1.0)
+                        for step in self.steps]
+        self.concurrency = concurrency
+        self.rate = rate
+        self.poisson = poisson
+        self.timeout = timeout
+        self.token_ttl = token_ttl
+        self.admin = admin
+        self.rng = random.Random(seed)
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[Tuple[float, Optional[int]]]] = {
+            step.name: [] for step in self.steps
+        }
+
+    def token(self, user_id: str) -> str:
+        """
+        Token of the user, signed once for the whole test
+        :param user_id: str
+        :return: str
+        """
+        with self._lock:
+            if user_id not in self._tokens:
+                claims = {'id': int(user_id) if user_id.isdigit() else 1,
+                          'is_admin': self.admin,
+                          'exp': int(time.time()) + self.token_ttl}
+                self._tokens[user_id] = jwt.encode(claims, self.secret_key,
+                                                   algorithm='HS256')
+            return self._tokens[user_id]
+
+    def prepare(self, step: Step) -> Dict:
+        """
+        Substitute variables of the step, returning arguments of
+        the request. Token is issued for the user_id variable
+        :param step: Step
+        :return: Dict
+        """
+        with self._lock:
+            values = self.variables.resolve()
+        if not values.get('access_token'):
+            values['access_token'] = self.token(values.get('user_id', '1'))
+        substitute = Variables.substitute
+
+        headers = {key: substitute(value, values)
+                   for key, value in step.headers.items()}
+        if step.auth:
+            headers['Authorization'] = values['access_token']
+        return {
+            'method': step.method,
+            'url': substitute(step.url, values),
+            'headers': headers,
+            'data': substitute(step.body, values).encode()
+            if step.body else None,
+        }
+
+    def choose(self) -> Step:
+        """
+        Pick the next step according to the weights
+        :return: Step
+        """
+        with self._lock:
+            return self.rng.choices(self.steps, self.weights)[0]
+
+    def send(self, session: requests.Session, step: Step,
+             due: Optional[float] = None) -> None:
+        """
+        Send request of the step and record its latency and status
+        :param session: requests.Session
+        :param step: Step
+        :param due: Optional[float] - time request was due to be sent
+        :return: None
+        """
+        arguments = self.prepare(step)
+        started = time.perf_counter() if due is None else due
+        try:
+            response = session.request(timeout=self.timeout, **arguments)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        self.samples[step.name].append((time.perf_counter() - started,
+                                        status))
+
+    def run(self, *, duration: Optional[float] = None,
+            requests_: Optional[int] = None) -> float:
+        """
+        Send requests until either duration passes or number
+        of requests is sent
+        :param duration: Optional[float] - seconds
+        :param requests_: Optional[int]
+        :return: float - seconds the test took
+        """
+        started = time.perf_counter()
+        deadline = started + duration if duration else float('inf')
+        remaining = [requests_ if requests_ else float('inf')]
+        arrivals: queue.Queue = queue.Queue()
+
+        def take() -> bool:
+            with self._lock:
+                if remaining[0] <= 0 or time.perf_counter() >= deadline:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def closed_worker() -> None:
+            with requests.Session() as session:
+                while take():
+                    self.send(session, self.choose())
+
+        def open_worker() -> None:
+            with requests.Session() as session:
+                while True:
+                    item = arrivals.get()
+                    if item is None:
+                        return
+                    self.send(session, *item)
+
+        if self.rate is None:
+            workers = [threading.Thread(target=closed_worker)
+                       for _ in range(self.concurrency)]
+        else:
+            workers = [threading.Thread(target=open_worker)
+                       for _ in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+
+        if self.rate is not None:
+            due = time.perf_counter()
+            while take():
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                arrivals.put((self.choose(), due))
+                due += self.rng.expovariate(self.rate) if self.poisson \
+                    else 1 / self.rate
+            for _ in workers:
+                arrivals.put(None)
+
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> Dict:
+        """
+        Latency histograms, percentiles and error rates of the steps.
+        Requests failed to be sent or answered with 4xx or 5xx
+        status are errors
+        :param elapsed: float - seconds the test took
+        :return: Dict
+        """
+        steps = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            durations = sorted(duration * 1000 for duration, _ in samples)
+            statuses = Counter('error' if status is None else str(status)
+                               for _, status in samples)
+            errors = sum(count for status, count in statuses.items()
+                         if status == 'error' or int(status) >= 400)
+            histogram = Counter(next(bound for bound in BUCKETS
+                                     if duration <= bound)
+                                for duration in durations)
+            steps[name] = {
+                'requests': len(samples),
+                'error_rate': round(errors / len(samples), 4),
+                'statuses': dict(sorted(statuses.items())),
+                'latency_ms': {
+                    **{f'p{q}': round(percentile(durations, q), 3)
+                       for q in PERCENTILES},
+                    'max': round(durations[-1], 3),
+                    'mean': round(sum(durations) / len(durations), 3),
+                },
+                'histogram_ms': {
+                    str(bound) if bound != float('inf') else 'inf':
+                        histogram.get(bound, 0)
+                    for bound in BUCKETS
+                },
+            }
+
+        total = sum(step['requests'] for step in steps.values())
+        errors = sum(step['requests'] * step['error_rate']
+                     for step in steps.values())
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'steps': steps,
+        }
+
+
+def format_report(report: Dict, width: int = 40) -> str:
+    """
+    Human readable report with a bar chart of every histogram
+    :param report: Dict
+    :param width: int = 40 - characters of the longest bar
+    :return: str
+    """
+    lines = [f'{report["requests"]} requests in '
+             f'{report["elapsed_seconds"]} s, '
+             f'{report["throughput_rps"]} req/s, '
+             f'{report["error_rate"]:.2%} errors']
+    for name, step in report['steps'].items():
+        latency = step['latency_ms']
+        lines.append('')
+        lines.append(f'{name}: {step["requests"]} requests, '
+                     f'{step["error_rate"]:.2%} errors, '
+                     f'statuses {step["statuses"]}')
+        lines.append('  ' + ', '.join(f'{key} {value} ms'
+                                      for key, value in latency.items()))
+        longest = max(step['histogram_ms'].values())
+        for bound, count in step['histogram_ms'].items():
+            if count:
+                bar = '#' * max(1, round(count / longest * width))
+                lines.append(f'  <= {bound:>5} ms {count:>7} {bar}')
+    return '\n'.join(lines)
+
+
+def serve(database_uri: Optional[str], books_latency: float,
+          secret_key: str) -> str:
+    """
+    Serve the app and a stub of the Books service from threads of this
+    process, returning base url of the app.
+    Environment is set up before the app is imported
+    :param database_uri: Optional[str]
+    :param books_latency: float - seconds the Books stub takes to respond
+    :param secret_key: str
+    :return: str
+    """
+    from werkzeug.serving import make_server
+
+    from benchmarks.books_stub import BooksStub
+
+    if database_uri:
+        os.environ['DATABASE_URI'] = database_uri
+    os.environ['SECRET_KEY'] = secret_key
+    # Credentials of the collection are not known to the stub
+    stub = BooksStub(latency=books_latency, password=None,
+                     secret_key=secret_key).start()
+    os.environ['BOOKS_URL'] = stub.url
+
+    from app import app
+
+    app.config['DEBUG'] = False
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='app',
+                     daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def parse_pairs(values: Sequence[str], convert=str) -> Dict:
+    """
+    Parse NAME=VALUE options
+    :param values: Sequence[str]
+    :param convert: Callable - converts values
+    :return: Dict
+    """
+    pairs = {}
+    for value in values or ():
+        name, separator, value = value.partition('=')
+        if not separator:
+            raise argparse.ArgumentTypeError(f'expected NAME=VALUE: {value}')
+        pairs[name] = convert(value)
+    return pairs
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) \
+        -> argparse.Namespace:
+    """
+    Parse command line options
+    :param argv: Optional[Sequence[str]] = None
+    :return: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description='Replay requests of the Postman collection as load '
+                    'test of a running app, or of one served with --serve'
+    )
+    parser.add_argument('--collection', default=COLLECTION)
+    parser.add_argument('--base-url',
+                        help='app url, base_url variable by default')
+    parser.add_argument('--serve', action='store_true',
+                        help='serve the app along with a Books stub '
+                             'from this process')
+    parser.add_argument('--database-uri',
+                        help='database of the app served with --serve')
+    parser.add_argument('--books-latency', type=float, default=0.02)
+    parser.add_argument('--secret-key', default=os.getenv('SECRET_KEY'),
+                        help='signs tokens, SECRET_KEY by default')
+    parser.add_argument('--var', action='append', metavar='NAME=VALUE',
+                        help='set variable, value may be a range like '
+                             '1-1000 or list like 1,5,9')
+    parser.add_argument('--weight', action='append', metavar='STEP=WEIGHT',
+                        help='relative frequency of the step, 1 by default')
+    parser.add_argument('--only', action='append', metavar='PATTERN',
+                        help='run only steps with names matching pattern')
+    parser.add_argument('--no-examples', action='store_true',
+                        help='skip saved examples of the requests')
+    parser.add_argument('--parameterize', action='store_true',
+                        help='replace literal ids in paths by event_id, '
+                             'user_id and participant_id variables')
+    parser.add_argument('--user', action='store_true',
+                        help='issue tokens without admin rights')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float,
+                        help='arrival rate in requests per second, '
+                             'workers send requests back to back otherwise')
+    parser.add_argument('--constant-arrivals', action='store_true',
+                        help='equal intervals between arrivals instead '
+                             'of Poisson ones')
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help='seconds to run')
+    parser.add_argument('--requests', type=int,
+                        help='number of requests to send, stops earlier '
+                             'than duration if given')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--list', action='store_true',
+                        help='list steps of the collection and exit')
+    parser.add_argument('--output', help='write JSON report to the file')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Run the load test
+    :param argv: Optional[Sequence[str]] = None
+    :return: int - exit status
+    """
+    options = parse_args(argv)
+    steps, values = load_collection(options.collection,
+                                    examples=not options.no_examples,
+                                    parameterized=options.parameterize)
+    values.update(parse_pairs(options.var))
+
+    if options.serve:
+        options.secret_key = options.secret_key or 'load-test-secret'
+        values['base_url'] = serve(options.database_uri,
+                                   options.books_latency,
+                                   options.secret_key)
+    elif options.base_url:
+        values['base_url'] = options.base_url
+
+    # Requests to other services, like the Books one, are not replayed
+    steps = [step for step in steps
+             if step.url.startswith('{{base_url}}')
+             and (not options.only
+                  or any(re.search(pattern, step.name)
+                         for pattern in options.only))]
+    if options.list or not steps:
+        for step in steps:
+            print(f'{step.method:<7} {step.url:<50} {step.name}')
+        return 0 if steps else 2
+    if not options.secret_key:
+        print('SECRET_KEY of the app is required to sign tokens',
+              file=sys.stderr)
+        return 2
+
+    test = LoadTest(steps, Variables(values, random.Random(options.seed)),
+                    secret_key=options.secret_key,
+                    weights=parse_pairs(options.weight, float),
+                    concurrency=options.concurrency,
+                    rate=options.rate,
+                    poisson=not options.constant_arrivals,
+                    admin=not options.user,
+                    seed=options.seed)
+    report = test.report(test.run(duration=options.duration,
+                                  requests_=options.requests))
+
+    print(format_report(report))
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Local Stub of a Redis Server for the Shared Response Cache Backend
+"""
+import argparse
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class RedisStub:
+    """
+    Server speaking the Redis protocol for the commands used by the
+    response cache, GET, SET with EX or PX, INCR, INCRBY and DEL,
+    along with PING and FLUSHALL. Keys are kept in memory of the stub,
+    so app processes pointed at it share cached responses and counters
+    the way they would share a Redis server
+    """
+    def __init__(self, *, host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        Initialize Stub
+        :param host: str = '127.0.0.1'
+        :param port: int = 0 - any free port
+        """
+        # Values with the monotonic time they expire at, or None
+        self.entries: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port),
+                                                      self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Url to be used as RESPONSE_CACHE_URL
+        :return: str
+        """
+        host, port = self.server.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self) -> 'RedisStub':
+        """
+        Start serving connections in a background thread
+        :return: RedisStub
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name='redis-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving connections
+        :return: None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'RedisStub':
+        """
+        Start stub for the with block
+        :return: RedisStub
+        """
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Stop stub after the with block
+        :param exc_info: Any
+        :return: None
+        """
+        self.stop()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """
+        Return value of the key, None when it is missing or expired.
+        Called with the lock held
+        :param key: bytes
+        :return: Optional[bytes]
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> bytes:
+        """
+        Run the command and return its encoded reply
+        :param args: List[bytes] - command name and its arguments
+        :return: bytes
+        """
+        name = args[0].upper()
+        with self._lock:
+            self.commands += 1
+            if name == b'PING':
+                return b'+PONG\r\n'
+            if name == b'GET' and len(args) == 2:
+                return bulk(self.get(args[1]))
+            if name == b'SET' and len(args) in (3, 5):
+                expires_at = None
+                if len(args) == 5:
+                    unit = {b'EX': 1.0, b'PX': 0.001}.get(args[3].upper())
+                    if unit is None:
+                        return b'-ERR syntax error\r\n'
+                    expires_at = time.monotonic() + int(args[4]) * unit
+                self.entries[args[1]] = (args[2], expires_at)
+                return b'+OK\r\n'
+            if name == b'INCR' and len(args) == 2 \
+                    or name == b'INCRBY' and len(args) == 3:
+                value = int(self.get(args[1]) or 0) \
+                    + (int(args[2]) if len(args) == 3 else 1)
+                self.entries[args[1]] = (str(value).encode(), None)
+                return b':%d\r\n' % value
+            if name == b'DEL' and len(args) > 1:
+                deleted = 0
+                for key in args[1:]:
+                    if self.get(key) is not None:
+                        del self.entries[key]
+                        deleted += 1
+                return b':%d\r\n' % deleted
+            if name == b'FLUSHALL':
+                self.entries.clear()
+                return b'+OK\r\n'
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+    def _handler(self) -> type:
+        """
+        Create connection handler class bound to the stub
+        :return: type
+        """
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # Replies are written in one piece, delaying them otherwise
+            disable_nagle_algorithm = True
+
+            def handle(self) -> None:
+                while True:
+                    args = read_command(self.rfile)
+                    if not args:
+                        return
+                    self.wfile.write(stub.execute(args))
+
+        return Handler
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    """
+    Encode bulk string reply, null one for None
+    :param value: Optional[bytes]
+    :return: bytes
+    """
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def read_command(file) -> Optional[List[bytes]]:
+    """
+    Read command sent as an array of bulk strings.
+    Returns None once the connection is closed
+    :param file: BinaryIO
+    :return: Optional[List[bytes]]
+    """
+    line = file.readline()
+    if not line.startswith(b'*'):
+        return None
+    args = []
+    for _ in range(int(line[1:])):
+        length = int(file.readline()[1:])
+        args.append(file.read(length + 2)[:-2])
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Serve the stub until interrupted
+    :param argv: Optional[Sequence[str]] = None
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description='Serve a stub of Redis for the shared response cache'
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    options = parser.parse_args(argv)
+
+    stub = RedisStub(host=options.host, port=options.port)
+    print(f'RESPONSE_CACHE_URL={stub.url}', flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Benchmark Runner of the App Endpoints.
+
+Every scale is measured in a separate process, as the app reads its
+database url on import. The process seeds the database of the scale,
+starts the Books service stub and times requests of every case
+through the Flask test client. Results of all scales are written
+as a single JSON document, see benchmarks/compare.py
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Linearly interpolated percentile of sorted values
+    :param values: Sequence[float] - sorted
+    :param q: float - from 0 to 100
+    :return: float
+    """
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(durations: List[float], queries: List[int],
+              commits: List[int], upstream_calls: List[int],
+              statuses: Counter, errors: int) -> Dict:
+    """
+    Summarize measurements of a case
+    :param durations: List[float] - seconds of every request
+    :param queries: List[int] - SQL statements of every request
+    :param commits: List[int] - transactions committed by every request
+    :param upstream_calls: List[int] - Books service calls of every request
+    :param statuses: Counter - response status codes
+    :param errors: int - requests failed with exception or 5xx
+    :return: Dict
+    """
+    durations = sorted(durations)
+    total = sum(durations)
+    latency = {f'p{q}': round(percentile(durations, q) * 1000, 3)
+               for q in PERCENTILES}
+    latency.update({
+        'min': round(durations[0] * 1000, 3) if durations else 0.0,
+        'max': round(durations[-1] * 1000, 3) if durations else 0.0,
+        'mean': round(total / len(durations) * 1000, 3)
+        if durations else 0.0,
+    })
+    return {
+        'requests': len(durations),
+        'errors': errors,
+        'statuses': {str(status): count
+                     for status, count in sorted(statuses.items())},
+        'latency_ms': latency,
+        'throughput_rps': round(len(durations) / total, 2) if total else 0.0,
+        'sql_queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else 0,
+            'max': max(queries, default=0),
+        },
+        'commits': {
+            'mean': round(sum(commits) / len(commits), 2) if commits else 0,
+            'max': max(commits, default=0),
+        },
+        'upstream_calls': {
+            'mean': round(sum(upstream_calls) / len(upstream_calls), 2)
+            if upstream_calls else 0,
+            'total': sum(upstream_calls),
+        },
+    }
+
+
+def run_worker(options: argparse.Namespace) -> Dict:
+    """
+    Measure all cases at a single scale.
+    Environment of the app is set up before it is imported
+    :param options: argparse.Namespace
+    :return: Dict
+    """
+    os.makedirs(options.database_dir, exist_ok=True)
+    seeded = os.path.join(options.database_dir, f'{options.scale}.db')
+    database = os.path.join(options.database_dir, f'{options.scale}.run.db')
+
+    os.environ['DATABASE_URI'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    if options.no_response_cache:
+        os.environ['RESPONSE_CACHE_TTL'] = '0'
+
+    # Responses are cached in the Redis stub, as they would be
+    # in a server shared by app processes
+    redis_stub = None
+    if options.shared_cache:
+        from benchmarks.redis_stub import RedisStub
+
+        redis_stub = RedisStub().start()
+        os.environ['RESPONSE_CACHE_URL'] = redis_stub.url
+
+    from benchmarks.books_stub import BooksStub
+
+    stub = BooksStub(latency=options.latency, jitter=options.jitter,
+                     secret_key=os.environ['SECRET_KEY'], seed=options.seed)
+    os.environ['BOOKS_URL'] = stub.url
+
+    from sqlalchemy import event
+
+    from app import app
+    from benchmarks import scenarios, seed
+    from db import db
+
+    # Cases modify the database, so every run starts from a copy
+    # of the seeded one, which is only created once
+    started = time.perf_counter()
+    if not os.path.exists(seeded):
+        app.config['SQLALCHEMY_DATABASE_URI'] = \
+            f'sqlite:///{os.path.abspath(seeded)}'
+        with app.app_context():
+            seed.seed(options.scale, options.seed)
+            db.get_engine(app).dispose()
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URI']
+    seeding = time.perf_counter() - started
+    shutil.copyfile(seeded, database)
+
+    queries, commits = 0, 0
+
+    def count_query(*args) -> None:
+        nonlocal queries
+        queries += 1
+
+    def count_commit(*args) -> None:
+        nonlocal commits
+        commits += 1
+
+    with app.app_context():
+        engine = db.engine
+        rows = seed.row_counts()
+        ctx = scenarios.Context(app, options.seed)
+    event.listen(engine, 'before_cursor_execute', count_query)
+    event.listen(engine, 'commit', count_commit)
+
+    selected = [case_ for case_ in scenarios.CASES
+                if not options.cases or case_.name in options.cases]
+    endpoints = {}
+    client = app.test_client()
+    with stub:
+        for case_ in selected:
+            durations, counts, commit_counts, calls = [], [], [], []
+            statuses, errors = Counter(), 0
+            for i in range(options.warmup + options.requests):
+                # Requests must not share the app context, nor g with it
+                with app.app_context():
+                    request = case_.build(ctx, i)
+                queries, commits, upstream = 0, 0, stub.calls
+
+                started = time.perf_counter()
+                try:
+                    response = client.open(request.path,
+                                           method=request.method,
+                                           json=request.json,
+                                           headers=request.headers)
+                    response.get_data()
+                    status = response.status_code
+                except Exception:
+                    status = 'exception'
+                duration = time.perf_counter() - started
+
+                if i < options.warmup:
+                    continue
+                durations.append(duration)
+                counts.append(queries)
+                commit_counts.append(commits)
+                calls.append(stub.calls - upstream)
+                statuses[status] += 1
+                if status == 'exception' or status >= 500:
+                    errors += 1
+
+            endpoints[case_.name] = {
+                'resource': case_.resource,
+                'method': case_.method,
+                **summarize(durations, counts, commit_counts, calls,
+                            statuses, errors),
+            }
+            print(f'{options.scale:>8} {case_.name:<32} '
+                  f'p95 {endpoints[case_.name]["latency_ms"]["p95"]:>9} ms',
+                  file=sys.stderr)
+    event.remove(engine, 'before_cursor_execute', count_query)
+    event.remove(engine, 'commit', count_commit)
+    if redis_stub is not None:
+        redis_stub.stop()
+
+    return {
+        'rows': rows,
+        'seed_seconds': round(seeding, 3),
+        'uncovered': [list(pair) for pair in scenarios.uncovered(app)],
+        'endpoints': endpoints,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """
+    Commit of the measured working tree
+    :return: Optional[str]
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options: argparse.Namespace) -> Dict:
+    """
+    Measure every scale in a worker process and collect results
+    :param options: argparse.Namespace
+    :return: Dict
+    """
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'options': {key: value for key, value in vars(options).items()
+                        if key not in ('worker', 'output', 'result_file')},
+        },
+        'scales': {},
+    }
+
+    for scale in options.scales:
+        with tempfile.NamedTemporaryFile(suffix='.json') as result_file:
+            command = [sys.executable, '-m', 'benchmarks.run', '--worker',
+                       '--scales', scale,
+                       '--result-file', result_file.name,
+                       '--requests', str(options.requests),
+                       '--warmup', str(options.warmup),
+                       '--latency', str(options.latency),
+                       '--jitter', str(options.jitter),
+                       '--seed', str(options.seed),
+                       '--database-dir', options.database_dir]
+            if options.no_response_cache:
+                command.append('--no-response-cache')
+            if options.shared_cache:
+                command.append('--shared-cache')
+            if options.cases:
+                command.extend(['--cases', *options.cases])
+
+            subprocess.run(command, cwd=ROOT, check=True)
+            with open(result_file.name) as file:
+                results['scales'][scale] = json.load(file)
+    return results
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) \
+        -> argparse.Namespace:
+    """
+    Parse command line options
+    :param argv: Optional[Sequence[str]] = None
+    :return: argparse.Namespace
+    """
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark every endpoint of the app at several '
+                    'database scales against a stub of the Books service'
+    )
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES),
+                        default=['small', 'medium'])
+    parser.add_argument('--requests', type=int, default=200,
+                        help='timed requests of every case')
+    parser.add_argument('--warmup', type=int, default=10,
+                        help='untimed requests made before timed ones')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds the Books stub takes to respond')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='random seconds added to the stub latency')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cases', nargs='*',
+                        help='names of the cases to run, all by default')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='measure without the response cache')
+    parser.add_argument('--shared-cache', action='store_true',
+                        help='cache responses in a local Redis stub')
+    parser.add_argument('--database-dir',
+                        default=os.path.join(ROOT, 'benchmarks', '.data'),
+                        help='seeded databases are kept here between runs')
+    parser.add_argument('--output', default='-',
+                        help='results file, stdout by default')
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    options.database_dir = os.path.abspath(options.database_dir)
+    return options
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Run benchmarks and write results
+    :param argv: Optional[Sequence[str]] = None
+    :return: None
+    """
+    options = parse_args(argv)
+
+    if options.worker:
+        options.scale = options.scales[0]
+        with open(options.result_file, 'w') as file:
+            json.dump(run_worker(options), file)
+        return
+
+    results = json.dumps(run(options), indent=2)
+    if options.output == '-':
+        print(results)
+    else:
+        with open(options.output, 'w') as file:
+            file.write(results + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+"""
+Benchmark Scenarios of the Endpoints registered in the App
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, \
+    Set, Tuple, Union
+
+import jwt
+from flask import Flask
+from flask_restful import Resource
+
+from db import db
+from models.event import EventModel, GuestEventModel, ParticipantEventModel
+from models.guest import GuestModel
+from models.participant import ParticipantModel
+
+# Words searched by the full-text and autocomplete cases
+SEARCH_WORDS = ('the', 'life', 'story', 'world', 'night', 'house',
+                'ma', 'jo', 'an', 'el', 'ro', 'st')
+
+# Events created by a request of the batch case
+BATCH_SIZE = 100
+
+
+class Request(NamedTuple):
+    """
+    Request made by the timed part of a case
+    """
+    method: str
+    path: str
+    json: Optional[Union[Dict, List[Dict]]] = None
+    headers: Optional[Dict] = None
+
+
+class Case(NamedTuple):
+    """
+    Benchmark case of a resource method. Build is called before
+    every timed request and may prepare rows the request works on
+    """
+    name: str
+    resource: str
+    method: str
+    build: Callable[['Context', int], Request]
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, resource: str, method: str) -> Callable:
+    """
+    Register function building requests of the case
+    :param name: str - unique name, used as key of the results
+    :param resource: str - name of the resource class
+    :param method: str
+    :return: Callable
+    """
+    def decorator(build: Callable[['Context', int], Request]) -> Callable:
+        CASES.append(Case(name, resource, method.upper(), build))
+        return build
+    return decorator
+
+
+class Context:
+    """
+    State shared by the cases of a benchmark run: ids of seeded rows,
+    random generator and helpers preparing rows outside of timed requests
+    """
+    def __init__(self, app: Flask, seed: int = 42) -> None:
+        """
+        Initialize Context, loading ids of seeded rows.
+        Has to be called within app context
+        :param app: Flask
+        :param seed: int = 42
+        """
+        self.app = app
+        self.rng = random.Random(seed)
+        self.event_ids = [id_ for id_, in db.session.query(EventModel.id)]
+        self.guest_ids = [id_ for id_, in db.session.query(GuestModel.id)]
+        self.participant_ids = [
+            id_ for id_, in db.session.query(ParticipantModel.id)
+        ]
+        # Ids of users and authors, that are not yet in the database,
+        # so that creating them calls the Books service
+        self._next_id = max(self.guest_ids + self.participant_ids,
+                            default=0) + 1
+        self._created = 0
+
+    def token(self, id_: int = 1, admin: bool = True) -> Dict:
+        """
+        Headers authorizing requests as the user
+        :param id_: int = 1
+        :param admin: bool = True
+        :return: Dict
+        """
+        claims = {'id': id_, 'is_admin': admin,
+                  'exp': int(time.time()) + 3600}
+        return {'Authorization': jwt.encode(claims, self.app.secret_key,
+                                            algorithm='HS256')}
+
+    def new_id(self) -> int:
+        """
+        Id, that is not used by any guest or participant
+        :return: int
+        """
+        self._next_id += 1
+        return self._next_id - 1
+
+    def unique_name(self, prefix: str) -> str:
+        """
+        Name, that is not used by any other row created by the cases
+        :param prefix: str
+        :return: str
+        """
+        self._created += 1
+        return f'{prefix} {self.rng.getrandbits(32):08x} {self._created}'
+
+    def event_id(self) -> int:
+        """
+        Id of a random seeded event
+        :return: int
+        """
+        return self.rng.choice(self.event_ids)
+
+    def create_event(self, **kwargs: Dict) -> EventModel:
+        """
+        Create event starting in a few days
+        :param kwargs: Dict - overrides defaults of the columns
+        :return: EventModel
+        """
+        start = datetime.utcnow() + timedelta(days=self.rng.randint(1, 30))
+        event = EventModel(**{'name': self.unique_name('Benchmark event'),
+                              'description': 'Created by benchmarks',
+                              'start': start,
+                              'end': start + timedelta(hours=2),
+                              **kwargs})
+        event.save_to_db()
+        db.session.commit()
+        return event
+
+    def create_guest(self) -> GuestModel:
+        """
+        Create guest with an unused id
+        :return: GuestModel
+        """
+        guest = GuestModel(id=self.new_id(),
+                           name=self.unique_name('Benchmark guest'))
+        guest.save_to_db()
+        db.session.commit()
+        return guest
+
+    def create_participant(self) -> ParticipantModel:
+        """
+        Create participant with an unused id
+        :return: ParticipantModel
+        """
+        participant = ParticipantModel(
+            id=self.new_id(), name=self.unique_name('Benchmark author')
+        )
+        participant.save_to_db()
+        db.session.commit()
+        return participant
+
+
+def uncovered(app: Flask, cases: Optional[Iterable[Case]] = None) \
+        -> List[Tuple[str, str]]:
+    """
+    Methods of the resources registered in the app, that have no case
+    :param app: Flask
+    :param cases: Optional[Iterable[Case]] = None - all cases by default
+    :return: List[Tuple[str, str]]
+    """
+    covered: Set[Tuple[str, str]] = {(case_.resource, case_.method)
+                                     for case_ in cases or CASES}
+    resources = {view.view_class
+                 for view in app.view_functions.values()
+                 if isinstance(getattr(view, 'view_class', None), type)
+                 and issubclass(view.view_class, Resource)}
+    return sorted({
+        (resource.__name__, method)
+        for resource in resources
+        for method in resource.methods or ()
+    } - covered)
+
+
+# Events
+
+@case('events_list', 'ListCreateEvent', 'GET')
+def events_list(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/events?page={ctx.rng.randint(1, 20)}')
+
+
+@case('events_list_status', 'ListCreateEvent', 'GET')
+def events_list_status(ctx: Context, i: int) -> Request:
+    status = ctx.rng.choice(('past', 'ongoing', 'upcoming'))
+    return Request('GET', f'/events?status={status}&order_by=start')
+
+
+@case('events_list_search', 'ListCreateEvent', 'GET')
+def events_list_search(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/events?q={ctx.rng.choice(SEARCH_WORDS)}')
+
+
+@case('events_list_cursor', 'ListCreateEvent', 'GET')
+def events_list_cursor(ctx: Context, i: int) -> Request:
+    return Request('GET', '/events?cursor=&order_by=start&order=desc')
+
+
+@case('events_list_participant', 'ListCreateEvent', 'GET')
+def events_list_participant(ctx: Context, i: int) -> Request:
+    participant = ctx.rng.choice(ctx.participant_ids)
+    return Request('GET', f'/events?participant={participant}')
+
+
+@case('events_list_fields', 'ListCreateEvent', 'GET')
+def events_list_fields(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/events?page={ctx.rng.randint(1, 20)}'
+                          f'&fields=id,name,start&datetime_format=iso')
+
+
+@case('events_list_time_range', 'ListCreateEvent', 'GET')
+def events_list_time_range(ctx: Context, i: int) -> Request:
+    start = datetime.now() + timedelta(days=ctx.rng.randint(-30, 30))
+    end = start + timedelta(days=7)
+    return Request('GET', f'/events?from={start:%Y-%m-%dT%H:%M}'
+                          f'&to={end:%Y-%m-%dT%H:%M}')
+
+
+@case('events_list_at', 'ListCreateEvent', 'GET')
+def events_list_at(ctx: Context, i: int) -> Request:
+    moment = datetime.now() + timedelta(hours=ctx.rng.randint(-720, 720))
+    return Request('GET', f'/events?at={moment:%Y-%m-%dT%H:%M}')
+
+
+@case('events_list_ids', 'ListCreateEvent', 'GET')
+def events_list_ids(ctx: Context, i: int) -> Request:
+    ids = ctx.rng.sample(ctx.event_ids, min(len(ctx.event_ids), 20))
+    return Request('GET', f'/events?ids={",".join(map(str, ids))}')
+
+
+@case('events_create', 'ListCreateEvent', 'POST')
+def events_create(ctx: Context, i: int) -> Request:
+    return Request('POST', '/events', json={
+        'name': ctx.unique_name('Benchmark event'),
+        'description': 'Created by benchmarks',
+        'start': '2030.01.01 10:00',
+        'end': '2030.01.01 12:00',
+    }, headers=ctx.token())
+
+
+@case('events_create_batch', 'CreateEventBatch', 'POST')
+def events_create_batch(ctx: Context, i: int) -> Request:
+    return Request('POST', '/events/batch', json=[{
+        'name': ctx.unique_name('Benchmark event'),
+        'description': 'Created by benchmarks',
+        'start': '2030.01.01 10:00',
+        'end': '2030.01.01 12:00',
+    } for _ in range(BATCH_SIZE)], headers=ctx.token())
+
+
+@case('event_retrieve', 'RetrieveUpdateDestroyEvent', 'GET')
+def event_retrieve(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/events/{ctx.event_id()}')
+
+
+@case('event_retrieve_not_modified', 'RetrieveUpdateDestroyEvent', 'GET')
+def event_retrieve_not_modified(ctx: Context, i: int) -> Request:
+    path = f'/events/{ctx.event_id()}'
+    etag = ctx.app.test_client().get(path).headers.get('ETag', '')
+    return Request('GET', path, headers={'If-None-Match': etag})
+
+
+@case('event_patch', 'RetrieveUpdateDestroyEvent', 'PATCH')
+def event_patch(ctx: Context, i: int) -> Request:
+    return Request('PATCH', f'/events/{ctx.event_id()}',
+                   json={'description': f'Patched by benchmarks {i}'},
+                   headers=ctx.token())
+
+
+@case('event_update', 'RetrieveUpdateDestroyEvent', 'PUT')
+def event_update(ctx: Context, i: int) -> Request:
+    event = ctx.create_event()
+    return Request('PUT', f'/events/{event.id}', json={
+        'name': ctx.unique_name('Benchmark event'),
+        'description': f'Updated by benchmarks {i}',
+    }, headers=ctx.token())
+
+
+@case('event_delete', 'RetrieveUpdateDestroyEvent', 'DELETE')
+def event_delete(ctx: Context, i: int) -> Request:
+    event = ctx.create_event()
+    return Request('DELETE', f'/events/{event.id}', headers=ctx.token())
+
+
+@case('events_export', 'ExportEvents', 'GET')
+def events_export(ctx: Context, i: int) -> Request:
+    participant = ctx.rng.choice(ctx.participant_ids)
+    format_ = ctx.rng.choice(('ndjson', 'csv'))
+    return Request('GET', f'/events/export?participant={participant}'
+                          f'&format={format_}')
+
+
+@case('events_histogram', 'EventHistogram', 'GET')
+def events_histogram(ctx: Context, i: int) -> Request:
+    bucket = ctx.rng.choice(('day', 'week', 'month'))
+    return Request('GET', f'/events/histogram?bucket={bucket}')
+
+
+# Guests
+
+@case('event_guests', 'EventGuests', 'GET')
+def event_guests(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/events/{ctx.event_id()}/guests')
+
+
+@case('event_guests_register', 'EventGuests', 'PUT')
+def event_guests_register(ctx: Context, i: int) -> Request:
+    # Unknown user is loaded from the Books service
+    return Request('PUT', f'/events/{ctx.event_id()}/guests',
+                   headers=ctx.token(ctx.new_id(), admin=False))
+
+
+@case('event_guests_unregister', 'EventGuests', 'DELETE')
+def event_guests_unregister(ctx: Context, i: int) -> Request:
+    event_id, guest = ctx.event_id(), ctx.create_guest()
+    db.session.add(GuestEventModel(event_id=event_id, guest_id=guest.id))
+    db.session.commit()
+    EventModel.refresh_counts([event_id])
+    db.session.commit()
+    return Request('DELETE', f'/events/{event_id}/guests',
+                   headers=ctx.token(guest.id, admin=False))
+
+
+@case('login', 'Login', 'POST')
+def login(ctx: Context, i: int) -> Request:
+    return Request('POST', '/login',
+                   json={'username': 'admin', 'password': 'password'})
+
+
+@case('guests_autocomplete', 'GuestList', 'GET')
+def guests_autocomplete(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/guests?prefix={ctx.rng.choice(SEARCH_WORDS)}')
+
+
+@case('guest_retrieve', 'GuestResource', 'GET')
+def guest_retrieve(ctx: Context, i: int) -> Request:
+    return Request('GET', f'/guests/{ctx.rng.choice(ctx.guest_ids)}')
+
+
+@case('guest_update', 'GuestResource', 'PUT')
+def guest_update(ctx: Context, i: int) -> Request:
+    # Only the user itself, being admin, passes both checks
+    id_ = ctx.rng.choice(ctx.guest_ids)
+    return Request('PUT', f'/guests/{id_}', headers=ctx.token(id_))
+
+
+@case('guest_delete', 'GuestResource', 'DELETE')
+def guest_delete(ctx: Context, i: int) -> Request:
+    guest = ctx.create_guest()
+    return Request('DELETE', f'/guests/{guest.id}',
+                   headers=ctx.token(guest.id))
+
+
+# Participants
+
+@case('event_participants_register', 'EventParticipants', 'POST')
+def event_participants_register(ctx: Context, i: int) -> Request:
+    # One known author and one loaded from the Books service
+    participants = [ctx.rng.choice(ctx.participant_ids), ctx.new_id()]
+    return Request('POST', f'/events/{ctx.event_id()}/participants',
+                   json={'participants': participants},
+                   headers=ctx.token())
+
+
+@case('event_participants_unregister', 'EventParticipants', 'DELETE')
+def event_participants_unregister(ctx: Context, i: int) -> Request:
+    event_id, participant = ctx.event_id(), ctx.create_participant()
+    db.session.add(ParticipantEventModel(event_id=event_id,
+                                         participant_id=participant.id))
+    db.session.commit()
+    EventModel.refresh_counts([event_id])
+    db.session.commit()
+    return Request('DELETE', f'/events/{event_id}/participants',
+                   json={'participants': [participant.id]},
+                   headers=ctx.token())
+
+
+@case('participants_autocomplete', 'ParticipantList', 'GET')
+def participants_autocomplete(ctx: Context, i: int) -> Request:
+    return Request('GET',
+                   f'/participants?prefix={ctx.rng.choice(SEARCH_WORDS)}')
+
+
+@case('participant_retrieve', 'ParticipantResource', 'GET')
+def participant_retrieve(ctx: Context, i: int) -> Request:
+    return Request('GET',
+                   f'/participants/{ctx.rng.choice(ctx.participant_ids)}')
+
+
+@case('participant_update', 'ParticipantResource', 'PUT')
+def participant_update(ctx: Context, i: int) -> Request:
+    return Request('PUT',
+                   f'/participants/{ctx.rng.choice(ctx.participant_ids)}',
+                   headers=ctx.token())
+
+
+@case('participant_delete', 'ParticipantResource', 'DELETE')
+def participant_delete(ctx: Context, i: int) -> Request:
+    participant = ctx.create_participant()
+    return Request('DELETE', f'/participants/{participant.id}',
+                   headers=ctx.token())
@@ -0,0 +1,71 @@
+"""
+Seeding of Benchmark Databases at Several Scales
+"""
+import random
+from datetime import datetime
+from typing import Dict
+
+from faker import Faker
+
+from db import db
+from models.event import EventModel, GuestEventModel, ParticipantEventModel
+from models.guest import GuestModel
+from models.participant import ParticipantModel
+
+# Number of rows of every model at the scale
+SCALES = {
+    'small': {'participants': 200, 'guests': 1000, 'events': 1000},
+    'medium': {'participants': 2000, 'guests': 10000, 'events': 20000},
+    'large': {'participants': 10000, 'guests': 50000, 'events': 200000},
+}
+
+
+def row_counts() -> Dict[str, int]:
+    """
+    Count rows of the benchmarked tables
+    :return: Dict[str, int]
+    """
+    return {
+        'participants': ParticipantModel.query.count(),
+        'guests': GuestModel.query.count(),
+        'events': EventModel.query.count(),
+        'participant_event': ParticipantEventModel.query.count(),
+        'guest_event': GuestEventModel.query.count(),
+    }
+
+
+def seed(scale: str, seed_: int = 42, chunk_size: int = 10000) \
+        -> Dict[str, int]:
+    """
+    Create tables and fill them with rows of the scale, unless database
+    is already seeded. Has to be called within app context.
+    Data is generated by the populate script bulk loader
+    :param scale: str - one of SCALES
+    :param seed_: int = 42 - makes generated data reproducible
+    :param chunk_size: int = 10000
+    :return: Dict[str, int] - number of rows in every table
+    """
+    # Script imports the app, which has to be configured first
+    import populate
+
+    db.create_all()
+    if EventModel.query.first() is not None:
+        return row_counts()
+
+    sizes = SCALES[scale]
+    fake = Faker()
+    fake.seed_instance(seed_)
+    populate.fake.seed_instance(seed_)
+
+    now = datetime.utcnow()
+    names = populate.unique_names(
+        (fake.name() for _ in range(sizes['participants'])), set()
+    )
+    populate.insert_chunks(ParticipantModel.__table__,
+                           ({'name': name, 'updated_at': now}
+                            for name in names),
+                           chunk_size)
+    populate.generate_guests(sizes['guests'], chunk_size)
+    populate.generate_events(sizes['events'], chunk_size=chunk_size,
+                             rng=random.Random(seed_))
+    return row_counts()
@@ -2,5 +2,31 @@
 Module for creating SQLAlchemy object
 """
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Insert
+
+from utils.unit_of_work import UnitOfWork
 
 db = SQLAlchemy()
+# Changes made by models are committed once per request
+unit_of_work = UnitOfWork(db.session)
+
+
+def insert_ignore(table: Table) -> Insert:
+    """
+    Create INSERT statement for the table, that silently skips rows
+    conflicting with existing primary or unique keys,
+    so the number of inserted rows is the statement rowcount
+    :param table: Table
+    :return: Insert
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return table.insert().prefix_with('OR IGNORE')
+    if dialect == 'mysql':
+        return table.insert().prefix_with('IGNORE')
+    raise NotImplementedError(f'INSERT ignoring conflicts '
+                              f'is not supported by {dialect}')
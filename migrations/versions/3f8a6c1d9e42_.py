@@ -0,0 +1,25 @@
+"""add index of guest registrations by event
+
+Revision ID: 3f8a6c1d9e42
+Revises: 47387e536227
+Create Date: 2026-10-18 09:41:17.530268
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a6c1d9e42'
+down_revision = '47387e536227'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Primary key starts with the guest, so lookups by event need this
+    op.create_index('ix_guest_event_event_id', 'guest_event',
+                    ['event_id', 'guest_id'])
+
+
+def downgrade():
+    op.drop_index('ix_guest_event_event_id', table_name='guest_event')
@@ -0,0 +1,60 @@
+"""add guest_count and participant_count to events
+
+Revision ID: 5c1e7d9a2b36
+Revises: 3f8a6c1d9e42
+Create Date: 2026-10-18 10:12:41.208331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7d9a2b36'
+down_revision = '3f8a6c1d9e42'
+branch_labels = None
+depends_on = None
+
+# Number of events recounted by a single UPDATE statement
+CHUNK_SIZE = 10000
+
+
+def upgrade():
+    op.add_column('events', sa.Column('guest_count', sa.Integer(),
+                                      server_default='0', nullable=False))
+    op.add_column('events', sa.Column('participant_count', sa.Integer(),
+                                      server_default='0', nullable=False))
+
+    events = sa.table('events',
+                      sa.column('id', sa.Integer),
+                      sa.column('guest_count', sa.Integer),
+                      sa.column('participant_count', sa.Integer))
+    guest_event = sa.table('guest_event',
+                           sa.column('event_id', sa.Integer))
+    participant_event = sa.table('participant_event',
+                                 sa.column('event_id', sa.Integer))
+
+    guests = sa.select([sa.func.count()]) \
+        .where(guest_event.c.event_id == events.c.id).as_scalar()
+    participants = sa.select([sa.func.count()]) \
+        .where(participant_event.c.event_id == events.c.id).as_scalar()
+
+    connection = op.get_bind()
+    first, last = connection.execute(
+        sa.select([sa.func.min(events.c.id), sa.func.max(events.c.id)])
+    ).first()
+    if first is None:
+        return
+
+    # Backfill in id ranges, so that no statement touches the whole table
+    for lower in range(first, last + 1, CHUNK_SIZE):
+        connection.execute(
+            events.update()
+            .where(events.c.id.between(lower, lower + CHUNK_SIZE - 1))
+            .values(guest_count=guests, participant_count=participants)
+        )
+
+
+def downgrade():
+    op.drop_column('events', 'participant_count')
+    op.drop_column('events', 'guest_count')
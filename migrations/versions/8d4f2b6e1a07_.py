@@ -0,0 +1,40 @@
+"""add updated_at to events, guests and participants
+
+Revision ID: 8d4f2b6e1a07
+Revises: 5c1e7d9a2b36
+Create Date: 2026-10-18 14:05:19.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f2b6e1a07'
+down_revision = '5c1e7d9a2b36'
+branch_labels = None
+depends_on = None
+
+TABLES = ('events', 'guests', 'participants')
+
+
+def upgrade():
+    # Existing rows are stamped with the migration time (UTC)
+    now = sa.text("timezone('utc', now())") \
+        if op.get_bind().dialect.name == 'postgresql' \
+        else sa.text('CURRENT_TIMESTAMP')
+
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(),
+                                       nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime))
+                   .update().values(updated_at=now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(),
+                                  nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,37 @@
+"""add range index of event spans
+
+Revision ID: 9e2f61c4d8a5
+Revises: 4b7e0d2c9f13
+Create Date: 2026-10-18 19:05:12.318740
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2f61c4d8a5'
+down_revision = '4b7e0d2c9f13'
+branch_labels = None
+depends_on = None
+
+# Same expression is filtered by EventModel.span
+SPAN = "tsrange(least(start, \"end\"), greatest(start, \"end\"), '[)')"
+
+
+def upgrade():
+    # Range types are PostgreSQL only, elsewhere start and end
+    # indexes serve the time range filters
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY ix_events_span ON events '
+                   f'USING gist ({SPAN})')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY ix_events_span')
@@ -0,0 +1,68 @@
+"""add full-text search index of events name and description
+
+Revision ID: c3a91e5f7d20
+Revises: 8d4f2b6e1a07
+Create Date: 2026-10-18 15:42:07.316254
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a91e5f7d20'
+down_revision = '8d4f2b6e1a07'
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE events_fts USING fts5(name, description, "
+    "content='events', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER events_fts_ai AFTER INSERT ON events BEGIN "
+    "INSERT INTO events_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER events_fts_ad AFTER DELETE ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER events_fts_au AFTER UPDATE OF name, description "
+    "ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO events_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    # Index existing rows
+    "INSERT INTO events_fts(events_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS events_fts_au",
+    "DROP TRIGGER IF EXISTS events_fts_ad",
+    "DROP TRIGGER IF EXISTS events_fts_ai",
+    "DROP TABLE IF EXISTS events_fts",
+)
+
+POSTGRESQL_UPGRADE = (
+    "CREATE INDEX ix_events_fts ON events USING gin "
+    "(to_tsvector('english', coalesce(name, '') || ' ' || "
+    "coalesce(description, '')))",
+)
+
+POSTGRESQL_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_events_fts",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_UPGRADE,
+                  'postgresql': POSTGRESQL_UPGRADE}.get(dialect, ())
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_DOWNGRADE,
+                  'postgresql': POSTGRESQL_DOWNGRADE}.get(dialect, ())
+    for statement in statements:
+        op.execute(statement)
@@ -1,22 +1,112 @@
 """
 Module with Event Related Models
 """
-from datetime import datetime
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, \
+    Union
 
 from flask_sqlalchemy import Pagination, BaseQuery
-from sqlalchemy import and_
+from sqlalchemy import DDL, and_, event, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.orm.interfaces import MapperOption
+from sqlalchemy.sql import ColumnElement
 
-from db import db
+from db import db, insert_ignore, unit_of_work
 from models.guest import GuestModel
 from models.participant import ParticipantModel
+from models.search import FullTextIndex
+from utils.export import stream_query
+from utils.hot_set import StatusHotSet
+from utils.interval_index import IntervalIndex, InvalidTimeRange, \
+    parse_moment
+from utils.pagination import InvalidOrder, KeysetPagination, seek
 
+# Events taking place at a moment are the ones overlapping
+# the shortest range starting at it
+MOMENT = timedelta(microseconds=1)
 
-class GuestEventModel(db.Model):
+
+class RegistrationMixin:
+    """
+    Registration of members for events through association table rows.
+    Memberships are changed with single statements by primary key
+    without loading relationship collections
+    """
+    member_key = None
+
+    @classmethod
+    def register(cls, event_id: int, member_ids: Iterable[int]) -> int:
+        """
+        Register members for the event. Already registered members
+        are skipped by the database. Returns number of new registrations
+        :param event_id: int
+        :param member_ids: Iterable[int]
+        :return: int
+        """
+        rows = [{'event_id': event_id, cls.member_key: id_}
+                for id_ in set(member_ids)]
+        if not rows:
+            return 0
+
+        # Members added to the session have to exist before rows
+        # referencing them are inserted
+        db.session.flush()
+        return db.session.execute(
+            insert_ignore(cls.__table__).values(rows)
+        ).rowcount
+
+    @classmethod
+    def unregister(cls, event_id: int, member_ids: Iterable[int]) -> int:
+        """
+        Cancel registrations of members for the event.
+        Returns number of removed registrations
+        :param event_id: int
+        :param member_ids: Iterable[int]
+        :return: int
+        """
+        return cls.query \
+            .filter(cls.event_id == event_id,
+                    getattr(cls, cls.member_key).in_(set(member_ids))) \
+            .delete(synchronize_session=False)
+
+    @classmethod
+    def registered(cls, event_id: int, member_ids: Iterable[int]) -> Set[int]:
+        """
+        Return ids of the members, that are registered for the event
+        :param event_id: int
+        :param member_ids: Iterable[int]
+        :return: Set[int]
+        """
+        member_id = getattr(cls, cls.member_key)
+        rows = db.session.query(member_id) \
+            .filter(cls.event_id == event_id,
+                    member_id.in_(set(member_ids)))
+        return {id_ for id_, in rows}
+
+    @classmethod
+    def event_ids(cls, member_id: int) -> List[int]:
+        """
+        Return ids of the events, that member is registered for
+        :param member_id: int
+        :return: List[int]
+        """
+        rows = db.session.query(cls.event_id) \
+            .filter(getattr(cls, cls.member_key) == member_id)
+        return [id_ for id_, in rows]
+
+
+class GuestEventModel(RegistrationMixin, db.Model):
     """
     Model used to create Many-to-Many relationship between event and guests
     """
     __tablename__ = 'guest_event'
+    # Primary key serves lookups by guest, this index lookups by event
+    __table_args__ = (
+        db.Index('ix_guest_event_event_id', 'event_id', 'guest_id'),
+    )
+    member_key = 'guest_id'
     guest_id = db.Column(db.Integer(),
                          db.ForeignKey('guests.id', ondelete='CASCADE'),
                          primary_key=True)
@@ -25,12 +115,18 @@ class GuestEventModel(db.Model):
                          primary_key=True)
 
 
-class ParticipantEventModel(db.Model):
+class ParticipantEventModel(RegistrationMixin, db.Model):
     """
     Model used to create Many-to-Many
     relationship between event and participants
     """
     __tablename__ = 'participant_event'
+    # Primary key serves lookups by participant, this index lookups by event
+    __table_args__ = (
+        db.Index('ix_participant_event_event_id',
+                 'event_id', 'participant_id'),
+    )
+    member_key = 'participant_id'
     participant_id = db.Column(db.Integer(),
                                db.ForeignKey('participants.id',
                                              ondelete='CASCADE'),
@@ -45,21 +141,53 @@ class EventModel(db.Model):
     Event Model
     """
     __tablename__ = "events"
+    # Columns events can be ordered by. Every one of them is indexed
+    # along with id, which breaks ties in keyset pagination
+    sortable_columns = ('id', 'name', 'start', 'end', 'guest_count',
+                        'participant_count', 'updated_at',)
+    __table_args__ = (
+        db.Index('ix_events_start_id', 'start', 'id'),
+        db.Index('ix_events_end_id', 'end', 'id'),
+        db.Index('ix_events_guest_count_id', 'guest_count', 'id'),
+        db.Index('ix_events_participant_count_id',
+                 'participant_count', 'id'),
+        db.Index('ix_events_updated_at_id', 'updated_at', 'id'),
+    )
+    # Events found in the interval index are fetched by id,
+    # unless there are more of them
+    max_span_ids = 1000
+    # Events created by a single batch at most
+    max_batch_size = 5000
+    # Guests listed on a page at most
+    max_guests_limit = 100
+    # Buckets of the histogram, as named by PostgreSQL date_trunc
+    histogram_buckets = ('hour', 'day', 'week', 'month', 'year',)
+    # Columns loaded regardless of the dumped fields,
+    # as status and conditional requests depend on them
+    required_columns = ('start', 'end', 'updated_at',)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False, unique=True)
     start = db.Column(db.DateTime)
     end = db.Column(db.DateTime)
     description = db.Column(db.String(512), nullable=True)
+    # Maintained along with every registration change
+    guest_count = db.Column(db.Integer, nullable=False,
+                            default=0, server_default='0')
+    participant_count = db.Column(db.Integer, nullable=False,
+                                  default=0, server_default='0')
+    # Registration changes count as modifications of the event too
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Members outlive the event, only their registrations are deleted
+    # with it, so counters of their other events stay correct
     participants = db.relationship(ParticipantModel,
                                    secondary='participant_event',
                                    backref=db.backref('events',
-                                                      lazy='dynamic'),
-                                   cascade='all, delete')
+                                                      lazy='dynamic'))
     guests = db.relationship(GuestModel,
                              secondary='guest_event',
-                             backref=db.backref('events', lazy='dynamic'),
-                             cascade='all, delete')
+                             backref=db.backref('events', lazy='dynamic'))
 
     def __str__(self) -> str:
         """
@@ -74,12 +202,49 @@ class EventModel(db.Model):
         Property for Event Status
         :return: str
         """
-        if self.end < datetime.now():
+        return self.status_at(self.start, self.end, datetime.now())
+
+    @staticmethod
+    def status_at(start: datetime, end: datetime, moment: datetime) -> str:
+        """
+        Status of the event with given start and end at the moment
+        :param start: datetime
+        :param end: datetime
+        :param moment: datetime
+        :return: str
+        """
+        if end < moment:
             return 'past'
-        elif self.start > datetime.now():
+        elif start > moment:
             return 'upcoming'
         return 'ongoing'
 
+    @classmethod
+    def get_version(cls, id_: int) \
+            -> Optional[Tuple[datetime, datetime, datetime]]:
+        """
+        Return update time, start and end of the event
+        without loading the rest of it.
+        Returns None when object is not found
+        :param id_: int
+        :return: Optional[Tuple[datetime, datetime, datetime]]
+        """
+        return db.session.query(cls.updated_at, cls.start, cls.end) \
+            .filter(cls.id == id_).first()
+
+    @classmethod
+    def touch(cls, event_ids: Iterable[int]) -> None:
+        """
+        Mark events as modified, when objects shown within them change
+        :param event_ids: Iterable[int]
+        :return: None
+        """
+        event_ids = set(event_ids)
+        if event_ids:
+            cls.query.filter(cls.id.in_(event_ids)) \
+                .update({cls.updated_at: datetime.utcnow()},
+                        synchronize_session=False)
+
     @classmethod
     def find_by_name(cls, name: str) -> Optional['EventModel']:
         """
@@ -91,26 +256,87 @@ class EventModel(db.Model):
         return cls.query.filter_by(name=name).first()
 
     @classmethod
-    def find_by_id(cls, id_: int) -> Optional['EventModel']:
+    def find_taken_names(cls, names: Iterable[str]) -> Set[str]:
+        """
+        Method for finding names among the given ones,
+        that are taken by events, with a single query
+        :param names: Iterable[str]
+        :return: Set[str]
+        """
+        names = set(names)
+        if not names:
+            return set()
+        return {name for name, in db.session.query(cls.name)
+                .filter(cls.name.in_(names))}
+
+    @classmethod
+    def find_by_id(cls, id_: int, fields: Iterable[str] = ()) \
+            -> Optional['EventModel']:
         """
         Method for finding event by its id.
+        Relationships listed in fields are loaded within the same query,
+        columns not listed in them are not loaded at all.
         Returns None when object is not found
         :param id_: int
+        :param fields: Iterable[str] = ()
         :return: Optional['EventModel']
         """
-        return cls.query.filter_by(id=id_).first()
+        return cls.query.options(*cls.loader_options(fields),
+                                 *cls.column_options(fields)) \
+            .filter_by(id=id_).first()
+
+    @classmethod
+    def loader_options(cls, fields: Iterable[str], many: bool = False) \
+            -> List[MapperOption]:
+        """
+        Choose eager loading strategy for relationships among the fields
+        that are going to be dumped. Relationships of a single event are
+        joined to its query, relationships of many events are loaded
+        with one additional SELECT ... IN query per relationship
+        :param fields: Iterable[str]
+        :param many: bool = False
+        :return: List[MapperOption]
+        """
+        strategy = selectinload if many else joinedload
+        fields = set(fields)
+        return [strategy(getattr(cls, key))
+                for key in cls.__mapper__.relationships.keys()
+                if key in fields]
+
+    @classmethod
+    def column_options(cls, fields: Iterable[str], *required: str) \
+            -> List[MapperOption]:
+        """
+        Defer loading of columns, that are not going to be dumped.
+        Required columns of the model and the ones given are always
+        loaded. Nothing is deferred when fields are not given
+        :param fields: Iterable[str]
+        :param required: str
+        :return: List[MapperOption]
+        """
+        fields = set(fields)
+        if not fields:
+            return []
+
+        fields.update(cls.required_columns, required)
+        return [load_only(*[getattr(cls, key)
+                            for key in cls.__mapper__.column_attrs.keys()
+                            if key in fields])]
 
     @classmethod
     def filter_by_status(cls, status: str,
-                         queryset: Optional[BaseQuery] = None) -> BaseQuery:
+                         queryset: Optional[BaseQuery] = None,
+                         moment: Optional[datetime] = None) -> BaseQuery:
         """
         Filter given query by status using the start and end time of events
+        at the moment, which defaults to the current time
         :param status: str
         :param queryset: Optional[BaseQuery] = None
+        :param moment: Optional[datetime] = None
         :return: BaseQuery
         """
         queryset = queryset or cls.query
-        current_timestamp = datetime.now()
+        current_timestamp = moment or datetime.now()
         filters = {
             'past': cls.end < current_timestamp,
             'upcoming': cls.start > current_timestamp,
@@ -119,6 +345,170 @@ class EventModel(db.Model):
         }
         return queryset.filter(filters.get(status))
 
+    @classmethod
+    def span(cls) -> ColumnElement:
+        """
+        Half-open range of the event, as indexed on PostgreSQL.
+        Bounds are ordered, as range of an inverted event is invalid
+        :return: ColumnElement
+        """
+        return func.tsrange(func.least(cls.start, cls.end),
+                            func.greatest(cls.start, cls.end), '[)')
+
+    @classmethod
+    def get_spans(cls, since: Optional[datetime] = None) -> BaseQuery:
+        """
+        Query id, start, end and modification time of events,
+        modified since the time given or of all of them
+        :param since: Optional[datetime] = None
+        :return: BaseQuery
+        """
+        query = db.session.query(cls.id, cls.start, cls.end, cls.updated_at)
+        if since is not None:
+            query = query.filter(cls.updated_at >= since)
+        return query
+
+    @classmethod
+    def get_hot_rows(cls, since: Optional[datetime] = None) -> BaseQuery:
+        """
+        Query column values of events, modified since the time given
+        or of all events, that have not ended yet.
+        Modification time comes last, as the hot set expects
+        :param since: Optional[datetime] = None
+        :return: BaseQuery
+        """
+        columns = [column for column in cls.__table__.columns
+                   if column.key != 'updated_at']
+        query = db.session.query(*columns, cls.updated_at)
+        if since is not None:
+            return query.filter(cls.updated_at >= since)
+        return query.filter(cls.end > datetime.now())
+
+    @classmethod
+    def get_hot_page(cls, page: int = 1, limit: int = 20,
+                     query_params: Optional[Dict] = None,
+                     fields: Iterable[str] = ()) -> Optional[Pagination]:
+        """
+        Page of upcoming or ongoing events taken from the hot set,
+        when it is enabled and events are only filtered by status.
+        Pages hold column values of events in place of their objects.
+        Returns None when events have to be queried
+        :param page: int = 1
+        :param limit: int = 20
+        :param query_params: Optional[Dict] = None
+        :param fields: Iterable[str] = ()
+        :return: Optional[Pagination]
+        """
+        query_params = (query_params or {}).copy()
+        status = query_params.pop('status', None)
+        order_by = query_params.pop('order_by', None) or 'id'
+        descending = query_params.pop('order', 'id') == 'desc'
+        relationships = set(cls.__mapper__.relationships.keys())
+
+        if not event_hot_set.enabled or query_params \
+                or status not in event_hot_set.statuses \
+                or order_by not in event_hot_set.orders \
+                or relationships.intersection(fields):
+            return None
+
+        # Out of range values are replaced the way paginate does
+        page = max(page, 1)
+        limit = limit if limit >= 0 else 20
+        rows, total = event_hot_set.page(status, order_by, descending,
+                                         page, limit)
+        return Pagination(None, page, limit, total, rows)
+
+    @classmethod
+    def check_hot_set(cls, moment: Optional[datetime] = None) \
+            -> Dict[str, Dict[str, List[int]]]:
+        """
+        Compare upcoming and ongoing events of the hot set with the ones
+        in the database at the moment, which defaults to the current
+        time. Returns ids of events missing from the hot set, the ones
+        it should not hold and the ones held with outdated values.
+        Statuses without any difference are left out
+        :param moment: Optional[datetime] = None
+        :return: Dict[str, Dict[str, List[int]]]
+        """
+        moment = moment or datetime.now()
+        held = {status: event_hot_set.ids(status, moment)
+                for status in event_hot_set.statuses}
+        rows = {row.id: row for row in cls.get_hot_rows()}
+
+        differences = {}
+        for status in event_hot_set.statuses:
+            expected = {id_ for id_, in cls.filter_by_status(
+                status, db.session.query(cls.id), moment
+            )}
+            outdated = [id_ for id_ in held[status] & expected
+                        if tuple(event_hot_set.rows[id_])
+                        != tuple(rows.get(id_, ()))]
+            found = {
+                'missing': sorted(expected - held[status]),
+                'unexpected': sorted(held[status] - expected),
+                'outdated': sorted(outdated),
+            }
+            if any(found.values()):
+                differences[status] = found
+        return differences
+
+    @classmethod
+    def filter_by_time(cls, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None,
+                       queryset: Optional[BaseQuery] = None) -> BaseQuery:
+        """
+        Filter given query by events overlapping [start, end) range,
+        which is unbounded on the side not given.
+        When the interval index is enabled, matching events are looked
+        up in it and then fetched by id, unless there are too many,
+        along with events modified since the latest change the index
+        knows of, which may be missing from it.
+        Raises InvalidTimeRange when range ends before it starts
+        :param start: Optional[datetime] = None
+        :param end: Optional[datetime] = None
+        :param queryset: Optional[BaseQuery] = None
+        :return: BaseQuery
+        """
+        if start is not None and end is not None and start >= end:
+            raise InvalidTimeRange(f'{start.isoformat()}/{end.isoformat()}')
+
+        queryset = queryset or cls.query
+        if event_spans.enabled:
+            # Taken before the lookup, which may refresh the index
+            modified_at = event_spans.modified_at
+            ids = event_spans.overlapping(start, end)
+            if len(ids) <= cls.max_span_ids and modified_at is not None:
+                # Changes of other processes are refreshed periodically,
+                # so recently modified events are matched by range only
+                queryset = queryset.filter(or_(
+                    cls.id.in_(ids),
+                    cls.updated_at > modified_at - event_spans.lag
+                ))
+
+        # Index may be stale, so the range is checked in the database too
+        if queryset.session.get_bind().dialect.name == 'postgresql':
+            return queryset.filter(
+                cls.span().op('&&')(func.tsrange(start, end, '[)'))
+            )
+        if start is not None:
+            queryset = queryset.filter(cls.end > start)
+        if end is not None:
+            queryset = queryset.filter(cls.start < end)
+        return queryset
+
+    @classmethod
+    def filter_by_ids(cls, ids: str,
+                      queryset: Optional[BaseQuery] = None) -> BaseQuery:
+        """
+        Filter given query by comma separated ids
+        :param ids: str
+        :param queryset: Optional[BaseQuery] = None
+        :return: BaseQuery
+        """
+        ids = {int(id_) for id_ in ids.split(',') if id_.strip()}
+        queryset = queryset or cls.query
+        return queryset.filter(cls.id.in_(ids))
+
     @classmethod
     def filter_by_participant(cls, id_: int,
                               queryset: Optional[BaseQuery] = None) \
@@ -149,71 +539,388 @@ class EventModel(db.Model):
             .filter(GuestEventModel.guest_id == id_)
 
     @classmethod
-    def get_list(cls, page: int = 1, limit: int = 20,
-                 query_params: Optional[Dict] = None) -> Pagination:
+    def filter_list(cls, query_params: Optional[Dict] = None,
+                    fields: Iterable[str] = ()) \
+            -> Tuple[BaseQuery, InstrumentedAttribute, bool]:
         """
-        Apply specified filters on the object
-        and, then order and paginate them
-        :param page: int = 1
-        :param limit: int = 20
+        Apply specified filters on the object.
+        Parameter q filters events by full-text search
+        over their name and description. Parameters from and to
+        filter events overlapping the range between them,
+        parameter at filters events taking place at the moment
+        and parameter ids filters events by comma separated ids.
+        Returns the query along with the column to order it by
+        and whether the order is descending.
+        Relationships listed in fields are eagerly loaded,
+        columns not listed in them are not loaded at all.
+        Raises InvalidOrder when order column is not sortable
+        and InvalidTimeRange when range is not valid
         :param query_params: Optional[Dict] = None
-        :return: Pagination
+        :param fields: Iterable[str] = ()
+        :return: Tuple[BaseQuery, InstrumentedAttribute, bool]
         """
         query_params = (query_params or {}).copy()
 
-        order_by = getattr(cls, query_params.pop('order_by', 'id'))
-        order = query_params.pop('order', 'id')
-        order_by = order_by.desc() if order == 'desc' else order_by.asc()
+        order_by = query_params.pop('order_by', None)
+        descending = query_params.pop('order', 'id') == 'desc'
+        search = query_params.pop('q', None)
+        time_range = {key: parse_moment(query_params.pop(key))
+                      for key in ('from', 'to', 'at') if key in query_params}
+        if order_by is not None and order_by not in cls.sortable_columns:
+            raise InvalidOrder(order_by)
 
+        order_column = getattr(cls, order_by or 'id')
         filter_queries = {
             'status': cls.filter_by_status,
+            'ids': cls.filter_by_ids,
             'participant': cls.filter_by_participant,
             'guest': cls.filter_by_guest,
         }
 
-        query = cls.query
+        query = cls.query.options(*cls.loader_options(fields, many=True),
+                                  *cls.column_options(fields,
+                                                      order_column.key))
         # Return empty query when user specifies unsupported filter
         plug = lambda x, y: cls.query.filter(False)
         for field, value in query_params.items():
             query = filter_queries.get(field, plug)(value, query)
 
+        if 'from' in time_range or 'to' in time_range:
+            query = cls.filter_by_time(time_range.get('from'),
+                                       time_range.get('to'), query)
+        if 'at' in time_range:
+            # Event takes place at the moment it starts, not when it ends
+            moment = time_range['at']
+            query = cls.filter_by_time(moment, moment + MOMENT, query)
+
+        if search is not None:
+            query, rank = event_search.search(query, search)
+            # Most relevant events come first, unless order is given
+            if order_by is None:
+                return query, rank, descending
+
+        return query, order_column, descending
+
+    @classmethod
+    def get_list(cls, page: int = 1, limit: int = 20,
+                 query_params: Optional[Dict] = None,
+                 cursor: Optional[Dict] = None,
+                 fields: Iterable[str] = ()) \
+            -> Union[Pagination, KeysetPagination]:
+        """
+        Apply specified filters on the object
+        and, then order and paginate them.
+        When cursor is given the query is keyset paginated,
+        search results are then ordered by id instead of relevance.
+        Pages filtered by status alone may come from the hot set.
+        Relationships listed in fields are eagerly loaded,
+        columns not listed in them are not loaded at all
+        :param page: int = 1
+        :param limit: int = 20
+        :param query_params: Optional[Dict] = None
+        :param cursor: Optional[Dict] = None
+        :param fields: Iterable[str] = ()
+        :return: Union[Pagination, KeysetPagination]
+        """
+        if cursor is None:
+            hot_page = cls.get_hot_page(page, limit, query_params, fields)
+            if hot_page is not None:
+                return hot_page
+
+        query, order_by, descending = cls.filter_list(query_params, fields)
+
+        if cursor is not None:
+            # Keyset is made of columns, search relevance is not one
+            if not isinstance(order_by, InstrumentedAttribute):
+                order_by = cls.id
+            # id breaks ties, so that rows with equal values are not skipped
+            columns = [cls.id] if order_by.key == 'id' else [order_by, cls.id]
+            return seek(query, columns, limit=limit, cursor=cursor,
+                        descending=descending)
+
+        order_by = order_by.desc() if descending else order_by.asc()
         return query.order_by(order_by)\
             .paginate(page, limit, error_out=False)
 
     @classmethod
-    def get_guests_list(cls, event_id: int, page: int = 1, limit: int = 20) \
-            -> Pagination:
+    def get_export(cls, query_params: Optional[Dict] = None,
+                   fields: Iterable[str] = (),
+                   chunk_size: int = 1000) -> Iterator['EventModel']:
+        """
+        Apply specified filters on the object and order them
+        the same way get_list does, without pagination.
+        Rows are fetched from the server-side cursor in chunks,
+        so any number of events is iterated in constant memory
+        :param query_params: Optional[Dict] = None
+        :param fields: Iterable[str] = ()
+        :param chunk_size: int = 1000
+        :return: Iterator['EventModel']
+        """
+        query, order_by, descending = cls.filter_list(query_params, fields)
+
+        columns = [cls.id] if order_by is cls.id else [order_by, cls.id]
+        return stream_query(query.order_by(*[
+            column.desc() if descending else column.asc()
+            for column in columns
+        ]), chunk_size)
+
+    @classmethod
+    def get_histogram(cls, bucket: str = 'day',
+                      query_params: Optional[Dict] = None) \
+            -> List[Tuple[str, int]]:
+        """
+        Count events matching the filters of get_list by the bucket
+        their start falls in. Returns ISO 8601 start of every bucket
+        with at least one event, along with the number of events
+        :param bucket: str = 'day' - one of histogram_buckets
+        :param query_params: Optional[Dict] = None
+        :return: List[Tuple[str, int]]
+        """
+        query, _, _ = cls.filter_list(query_params)
+
+        if query.session.get_bind().dialect.name == 'sqlite':
+            formats = {
+                'hour': ('%Y-%m-%dT%H:00:00',),
+                'day': ('%Y-%m-%dT00:00:00',),
+                # Monday of the week
+                'week': ('%Y-%m-%dT00:00:00', 'weekday 0', '-6 days'),
+                'month': ('%Y-%m-01T00:00:00',),
+                'year': ('%Y-01-01T00:00:00',),
+            }
+            format_, *modifiers = formats[bucket]
+            bucket_start = func.strftime(format_, cls.start, *modifiers)
+        else:
+            bucket_start = func.date_trunc(bucket, cls.start)
+
+        rows = query.filter(cls.start.isnot(None)) \
+            .with_entities(bucket_start, func.count(cls.id)) \
+            .group_by(bucket_start).order_by(bucket_start)
+        return [(start if isinstance(start, str) else start.isoformat(),
+                 count) for start, count in rows]
+
+    @classmethod
+    def clamp_guests_page(cls, page: int, limit: int) -> Tuple[int, int]:
+        """
+        Return page and limit of the event guests list, page below
+        the first one replaced by the first one and limit kept between
+        1 and max_guests_limit
+        :param page: int
+        :param limit: int
+        :return: Tuple[int, int]
         """
-        Return ordered and paginated query of a certain event guests
+        return max(page, 1), min(max(limit, 1), cls.max_guests_limit)
+
+    @classmethod
+    def get_guests_list(cls, event_id: int, page: int = 1, limit: int = 20,
+                        cursor: Optional[Dict] = None) \
+            -> Union[Pagination, KeysetPagination]:
+        """
+        Return ordered and paginated query of a certain event guests.
+        When cursor is given the query is keyset paginated.
+        Page and limit out of range are clamped by clamp_guests_page
         :param event_id: int
         :param page: int = 1
         :param limit: int = 20
-        :return: Pagination
+        :param cursor: Optional[Dict] = None
+        :return: Union[Pagination, KeysetPagination]
         """
-        return GuestModel.query.filter(cls.id == event_id) \
-            .order_by(GuestModel.id).paginate(page, limit, error_out=False)
+        page, limit = cls.clamp_guests_page(page, limit)
+
+        # Filtering by event and ordering by guest lets the guest_event
+        # index by event serve the join, the primary key starts
+        # with the guest and can't
+        query = GuestModel.query \
+            .join(GuestEventModel, GuestEventModel.guest_id == GuestModel.id) \
+            .filter(GuestEventModel.event_id == event_id)
+
+        if cursor is not None:
+            return seek(query, [GuestEventModel.guest_id], attrs=['id'],
+                        limit=limit, cursor=cursor)
+
+        items = query.order_by(GuestEventModel.guest_id) \
+            .limit(limit).offset((page - 1) * limit).all()
+        total = db.session.query(cls.guest_count) \
+            .filter(cls.id == event_id).scalar()
+        return Pagination(query, page, limit, total or 0, items)
+
+    @classmethod
+    def refresh_counts(cls, event_ids: Iterable[int]) -> None:
+        """
+        Recount guests and participants of the events
+        from the association tables
+        :param event_ids: Iterable[int]
+        :return: None
+        """
+        guests = db.session.query(db.func.count(GuestEventModel.guest_id)) \
+            .filter(GuestEventModel.event_id == cls.id).as_scalar()
+        participants = db.session \
+            .query(db.func.count(ParticipantEventModel.participant_id)) \
+            .filter(ParticipantEventModel.event_id == cls.id).as_scalar()
+
+        cls.query.filter(cls.id.in_(set(event_ids))) \
+            .update({cls.guest_count: guests,
+                     cls.participant_count: participants},
+                    synchronize_session=False)
+
+    @classmethod
+    def release_guest(cls, guest_id: int) -> None:
+        """
+        Decrease guest counters of events the guest is registered for.
+        Has to be called within the transaction deleting the guest
+        :param guest_id: int
+        :return: None
+        """
+        event_ids = db.session.query(GuestEventModel.event_id) \
+            .filter(GuestEventModel.guest_id == guest_id)
+        cls._increment(cls.id.in_(event_ids.subquery()), cls.guest_count, -1)
+
+    @classmethod
+    def release_participant(cls, participant_id: int) -> None:
+        """
+        Decrease participant counters of events the participant
+        is registered for. Has to be called within the transaction
+        deleting the participant
+        :param participant_id: int
+        :return: None
+        """
+        event_ids = db.session.query(ParticipantEventModel.event_id) \
+            .filter(ParticipantEventModel.participant_id == participant_id)
+        cls._increment(cls.id.in_(event_ids.subquery()),
+                       cls.participant_count, -1)
+
+    @classmethod
+    def _increment(cls, criterion: ColumnElement,
+                   counter: InstrumentedAttribute, delta: int) -> None:
+        """
+        Add delta to the counter column of events matching the criterion
+        :param criterion: ColumnElement
+        :param counter: InstrumentedAttribute
+        :param delta: int
+        :return: None
+        """
+        if delta:
+            cls.query.filter(criterion) \
+                .update({counter: counter + delta}, synchronize_session=False)
+
+    def register_guests(self, guest_ids: Iterable[int]) -> int:
+        """
+        Register guests for the event.
+        Returns number of guests, that were not registered before
+        :param guest_ids: Iterable[int]
+        :return: int
+        """
+        registered = GuestEventModel.register(self.id, guest_ids)
+        self._increment(EventModel.id == self.id,
+                        EventModel.guest_count, registered)
+        return registered
+
+    def unregister_guests(self, guest_ids: Iterable[int]) -> int:
+        """
+        Cancel registrations of guests for the event.
+        Returns number of guests, that were registered
+        :param guest_ids: Iterable[int]
+        :return: int
+        """
+        unregistered = GuestEventModel.unregister(self.id, guest_ids)
+        self._increment(EventModel.id == self.id,
+                        EventModel.guest_count, -unregistered)
+        return unregistered
+
+    def register_participants(self, participant_ids: Iterable[int]) -> int:
+        """
+        Register participants for the event.
+        Returns number of participants, that were not registered before
+        :param participant_ids: Iterable[int]
+        :return: int
+        """
+        registered = ParticipantEventModel.register(self.id, participant_ids)
+        self._increment(EventModel.id == self.id,
+                        EventModel.participant_count, registered)
+        return registered
+
+    def unregister_participants(self, participant_ids: Iterable[int]) -> int:
+        """
+        Cancel registrations of participants for the event.
+        Returns number of participants, that were registered
+        :param participant_ids: Iterable[int]
+        :return: int
+        """
+        unregistered = ParticipantEventModel.unregister(self.id,
+                                                        participant_ids)
+        self._increment(EventModel.id == self.id,
+                        EventModel.participant_count, -unregistered)
+        return unregistered
 
     def save_to_db(self) -> None:
         """
-        Save object to the database
+        Save object to the database within the current transaction
         :return: None
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
+
+    @classmethod
+    def save_all_to_db(cls, events: List['EventModel']) \
+            -> List['EventModel']:
+        """
+        Save objects to the database within the current transaction.
+        Objects are inserted at once within a savepoint, when that fails,
+        as another transaction has taken a name in the meantime,
+        they are inserted one by one, each within a savepoint of its own.
+        Returns objects, that could not be saved
+        :param events: List['EventModel']
+        :return: List['EventModel']
+        """
+        try:
+            with unit_of_work.savepoint():
+                db.session.add_all(events)
+            return []
+        except IntegrityError:
+            pass
+
+        failed = []
+        for event_ in events:
+            try:
+                with unit_of_work.savepoint():
+                    db.session.add(event_)
+            except IntegrityError:
+                failed.append(event_)
+        return failed
 
     def update_in_db(self, data: Dict) -> None:
         """
-        Update data in the database
+        Update data in the database within the current transaction
         :param data: Dict
         :return: None
         """
         EventModel.query.filter_by(id=self.id).update(data)
-        db.session.commit()
 
     def delete_from_db(self) -> None:
         """
-        Delete object from the database
+        Delete object from the database within the current transaction
         :return: None
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
+
+
+# Index behind the q filter of events
+event_search = FullTextIndex(EventModel.__table__, ('name', 'description',))
+
+# Index behind the time range filters of events on PostgreSQL,
+# elsewhere range is scanned with start and end indexes
+event.listen(EventModel.__table__, 'after_create',
+             DDL('CREATE INDEX ix_events_span ON events USING gist '
+                 '(tsrange(least(start, "end"), greatest(start, "end"), '
+                 "'[)'))").execute_if(dialect='postgresql'))
+
+# Spans looked up by time range filters when enabled,
+# kept in sync with committed changes
+event_spans = IntervalIndex(EventModel.get_spans)
+event_spans.track(EventModel, db.session)
+
+# Upcoming and ongoing events listed by status filter when enabled,
+# kept in sync with committed changes
+event_hot_set = StatusHotSet(EventModel.get_hot_rows,
+                             orders=EventModel.sortable_columns)
+event_hot_set.track(EventModel, db.session)
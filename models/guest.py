@@ -1,9 +1,11 @@
 """
 Module for Guest Model
 """
+from datetime import datetime
 from typing import Optional
 
 from db import db
+from utils.prefix_index import PrefixIndex
 
 
 class GuestModel(db.Model):
@@ -13,6 +15,8 @@ class GuestModel(db.Model):
     __tablename__ = 'guests'
 
     id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
     name = db.Column(db.String(124), nullable=False, unique=True)
 
     def __str__(self) -> str:
@@ -32,18 +36,36 @@ class GuestModel(db.Model):
         """
         return cls.query.filter_by(id=id_).first()
 
+    @classmethod
+    def get_updated_at(cls, id_: int) -> Optional[datetime]:
+        """
+        Return time of the last modification without loading the object.
+        Returns None when object is not found
+        :param id_: int
+        :return: Optional[datetime]
+        """
+        return db.session.query(cls.updated_at) \
+            .filter(cls.id == id_).scalar()
+
     def save_to_db(self) -> None:
         """
-        Save object to the database
+        Save object to the database within the current transaction
         :return: None
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def delete_from_db(self) -> None:
         """
-        Delete object from the database
+        Delete object from the database within the current transaction
         :return: None
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
+
+
+# Names looked up by autocomplete, kept in sync with committed changes
+guest_names = PrefixIndex(
+    lambda: db.session.query(GuestModel.id, GuestModel.name)
+)
+guest_names.track(GuestModel, db.session)
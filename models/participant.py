@@ -1,9 +1,11 @@
 """
 Module for Participant Model
 """
-from typing import Union
+from datetime import datetime
+from typing import Iterable, List, Optional, Union
 
 from db import db
+from utils.prefix_index import PrefixIndex
 
 
 class ParticipantModel(db.Model):
@@ -13,6 +15,8 @@ class ParticipantModel(db.Model):
     __tablename__ = 'participants'
 
     id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
     name = db.Column(db.String(124), nullable=False)
 
     def __str__(self) -> str:
@@ -32,18 +36,55 @@ class ParticipantModel(db.Model):
         """
         return cls.query.filter_by(id=id_).first()
 
+    @classmethod
+    def find_all_by_id(cls, ids: Iterable[int]) -> List['ParticipantModel']:
+        """
+        Method for finding participants by their ids with a single query.
+        Participants, that are not found, are skipped
+        :param ids: Iterable[int]
+        :return: List['ParticipantModel']
+        """
+        return cls.query.filter(cls.id.in_(set(ids))).all()
+
+    @staticmethod
+    def add_all(participants: Iterable['ParticipantModel']) -> None:
+        """
+        Add objects to the current transaction without committing it
+        :param participants: Iterable['ParticipantModel']
+        :return: None
+        """
+        db.session.add_all(participants)
+
+    @classmethod
+    def get_updated_at(cls, id_: int) -> Optional[datetime]:
+        """
+        Return time of the last modification without loading the object.
+        Returns None when object is not found
+        :param id_: int
+        :return: Optional[datetime]
+        """
+        return db.session.query(cls.updated_at) \
+            .filter(cls.id == id_).scalar()
+
     def save_to_db(self) -> None:
         """
-        Save object to the database
+        Save object to the database within the current transaction
         :return: None
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def delete_from_db(self) -> None:
         """
-        Delete object from the database
+        Delete object from the database within the current transaction
         :return: None
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
+
+
+# Names looked up by autocomplete, kept in sync with committed changes
+participant_names = PrefixIndex(
+    lambda: db.session.query(ParticipantModel.id, ParticipantModel.name)
+)
+participant_names.track(ParticipantModel, db.session)
@@ -0,0 +1,124 @@
+"""
+Module with Full-Text Search Index of Model Text Columns
+"""
+import re
+from typing import List, Sequence, Tuple
+
+from flask_sqlalchemy import BaseQuery
+from sqlalchemy import DDL, Table, column, event, func, literal_column, \
+    or_, table
+from sqlalchemy.sql import ColumnElement
+
+
+class FullTextIndex:
+    """
+    Full-text index over text columns of the table.
+    On SQLite it is an FTS5 table with external content kept in sync
+    by triggers, on PostgreSQL a GIN index of the columns tsvector.
+    Index is created and dropped along with the table.
+    Other databases fall back to LIKE scans
+    """
+    def __init__(self, table_: Table, columns: Sequence[str],
+                 config: str = 'english') -> None:
+        """
+        Initialize Index and register its DDL on the table
+        :param table_: Table
+        :param columns: Sequence[str]
+        :param config: str = 'english' - PostgreSQL text search config
+        """
+        self.table = table_
+        self.columns = list(columns)
+        self.config = config
+        self.name = f'{table_.name}_fts'
+        self.fts = table(self.name, column('rowid'), column('rank'))
+
+        for statement in self.sqlite_ddl():
+            event.listen(table_, 'after_create',
+                         DDL(statement).execute_if(dialect='sqlite'))
+        event.listen(table_, 'before_drop',
+                     DDL(f'DROP TABLE IF EXISTS {self.name}')
+                     .execute_if(dialect='sqlite'))
+        event.listen(table_, 'after_create',
+                     DDL(self.postgresql_ddl())
+                     .execute_if(dialect='postgresql'))
+
+    def sqlite_ddl(self) -> List[str]:
+        """
+        Statements creating FTS5 table and triggers copying
+        inserted, updated and deleted rows into it
+        :return: List[str]
+        """
+        columns = ', '.join(self.columns)
+        new = ', '.join(f'new.{col}' for col in self.columns)
+        old = ', '.join(f'old.{col}' for col in self.columns)
+        name, source = self.name, self.table.name
+        return [
+            f"CREATE VIRTUAL TABLE {name} USING fts5({columns}, "
+            f"content='{source}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {name}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {name}(rowid, {columns}) VALUES (new.id, {new}); "
+            f"END",
+            f"CREATE TRIGGER {name}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old}); END",
+            f"CREATE TRIGGER {name}_au AFTER UPDATE OF {columns} "
+            f"ON {source} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {name}(rowid, {columns}) VALUES (new.id, {new}); "
+            f"END",
+        ]
+
+    def postgresql_ddl(self) -> str:
+        """
+        Statement creating GIN index of the columns tsvector
+        :return: str
+        """
+        document = " || ' ' || ".join(f"coalesce({col}, '')"
+                                      for col in self.columns)
+        return f"CREATE INDEX ix_{self.name} ON {self.table.name} " \
+               f"USING gin (to_tsvector('{self.config}', {document}))"
+
+    def search(self, query: BaseQuery, text: str) \
+            -> Tuple[BaseQuery, ColumnElement]:
+        """
+        Filter query by rows matching all words of the text.
+        Returns filtered query along with its relevance, which puts
+        the most relevant rows first when sorted in ascending order
+        :param query: BaseQuery
+        :param text: str
+        :return: Tuple[BaseQuery, ColumnElement]
+        """
+        words = re.findall(r'\w+', text)
+        if not words:
+            return query.filter(False), self.table.c.id
+
+        dialect = query.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            # Words are quoted, so FTS5 syntax is never interpreted.
+            # Last one is matched as prefix of the word being typed
+            match = ' '.join(f'"{word}"' for word in words) + '*'
+            query = query \
+                .join(self.fts, self.fts.c.rowid == self.table.c.id) \
+                .filter(literal_column(self.name).op('MATCH')(match))
+            # bm25 rank is lower for more relevant rows
+            return query, self.fts.c.rank
+
+        if dialect == 'postgresql':
+            document = self.table.c[self.columns[0]]
+            document = func.coalesce(document, '')
+            for col in self.columns[1:]:
+                document = document.op('||')(' ').op('||')(
+                    func.coalesce(self.table.c[col], '')
+                )
+            vector = func.to_tsvector(self.config, document)
+            tsquery = func.plainto_tsquery(self.config, ' '.join(words))
+            return query.filter(vector.op('@@')(tsquery)), \
+                -func.ts_rank(vector, tsquery)
+
+        return query.filter(*[
+            or_(*[self.table.c[col].ilike(f'%{word}%')
+                  for col in self.columns])
+            for word in words
+        ]), self.table.c.id
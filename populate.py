@@ -1,59 +1,231 @@
+import argparse
+import csv
 import os
 import pickle
 import random
+from datetime import datetime, timedelta
+from itertools import islice
 
 from faker import Faker
-from sqlalchemy.sql.expression import func
 
 from app import app
+from db import db
+from models.event import EventModel, GuestEventModel, ParticipantEventModel
 from models.guest import GuestModel
 from models.participant import ParticipantModel
 
-app.app_context().push()
-
-from models.event import EventModel
-
 fake = Faker()
 client = app.test_client()
 
-
-def generate_events(num=1000):
-    for _ in range(num):
-        end_datetime = fake.date_time_between('-1M', '+1M')
-        event = EventModel(
-            name=fake.sentence(),
-            start=fake.date_time_between('-1M', end_datetime),
-            end=end_datetime,
-            description=fake.text(512)
-        )
-
-        for participant in ParticipantModel.query.order_by(func.random()) \
-                .limit(random.randint(1, 3)):
-            event.participants.append(participant)
-
-        for guest in GuestModel.query.order_by(func.random()) \
-                .limit(random.randint(1, 20)):
-            event.guests.append(guest)
-
-        event.save_to_db()
-
-
-def load_participants(path=os.path.join('data', 'authors.pickle')):
-    with open(path, 'rb') as file:
-        participants = pickle.load(file)
-
-    for name in participants:
-        participant = ParticipantModel(name=name)
-        participant.save_to_db()
-
-
-def generate_guests(num=100):
-    for _ in range(num):
-        guest = GuestModel(name=fake.name())
-        guest.save_to_db()
+# Descriptions are drawn from a pool, as generating text for every
+# event takes longer than inserting it
+DESCRIPTIONS_POOL = 1000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_chunks(table, rows, chunk_size):
+    """
+    Insert rows with one executemany per chunk, committed separately,
+    so memory use does not grow with the number of rows
+    """
+    inserted = 0
+    for chunk in chunked(rows, chunk_size):
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        inserted += len(chunk)
+    return inserted
+
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def sync_id_sequence(model):
+    """
+    Move PostgreSQL sequence of the ids past the ids inserted explicitly,
+    so that ids assigned by the database do not collide with them
+    """
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    table = model.__table__.name
+    db.session.execute(
+        db.text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)")
+    )
+    db.session.commit()
+
+
+def unique_names(names, taken):
+    """
+    Make names unique by numbering the repeated ones
+    """
+    for name in names:
+        unique, number = name, 1
+        while unique in taken:
+            number += 1
+            unique = f'{name} {number}'
+        taken.add(unique)
+        yield unique
+
+
+def read_authors(path):
+    """
+    Stream author names from the source. CSV files are read row by row
+    from the authors column of goodbooks books.csv, text files line by
+    line. Pickled lists, the original format, are loaded at once
+    """
+    if path.endswith('.pickle'):
+        with open(path, 'rb') as file:
+            yield from pickle.load(file)
+        return
+
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                for name in row['authors'].split(','):
+                    yield name.strip()
+        else:
+            for line in file:
+                yield line.strip()
+
+
+def load_participants(path=os.path.join('data', 'authors.pickle'),
+                      chunk_size=10000):
+    taken = {name for name, in db.session.query(ParticipantModel.name)}
+    now = datetime.utcnow()
+
+    def new_authors():
+        # Authors source repeats names of authors of many books
+        for name in read_authors(path):
+            if name and name not in taken:
+                taken.add(name)
+                yield {'name': name, 'updated_at': now}
+
+    return insert_chunks(ParticipantModel.__table__, new_authors(),
+                         chunk_size)
+
+
+def generate_guests(num=100, chunk_size=10000):
+    taken = {name for name, in db.session.query(GuestModel.name)}
+    now = datetime.utcnow()
+
+    names = unique_names((fake.name() for _ in range(num)), taken)
+    rows = ({'name': name, 'updated_at': now} for name in names)
+    return insert_chunks(GuestModel.__table__, rows, chunk_size)
+
+
+def generate_events(num=1000, participants=(1, 3), guests=(1, 20),
+                    chunk_size=10000, rng=random):
+    """
+    Generate events with registrations of random participants and guests.
+    Ids are sampled in Python from the ids loaded once, events and both
+    kinds of registrations are inserted in chunks along
+    """
+    participant_ids = [id_ for id_, in db.session.query(ParticipantModel.id)]
+    guest_ids = [id_ for id_, in db.session.query(GuestModel.id)]
+    taken = {name for name, in db.session.query(EventModel.name)}
+    descriptions = [fake.text(512) for _ in range(DESCRIPTIONS_POOL)]
+    now = datetime.utcnow()
+    # Events take place in local time, unlike modifications
+    local_now = datetime.now()
+    first_id = next_id(EventModel)
+
+    names = unique_names((fake.sentence()[:70] for _ in range(num)), taken)
+    for offset, chunk in enumerate(chunked(names, chunk_size)):
+        events, participant_rows, guest_rows = [], [], []
+        for number, name in enumerate(chunk):
+            event_id = first_id + offset * chunk_size + number
+            end = local_now + timedelta(
+                seconds=rng.randint(-30 * 86400, 30 * 86400)
+            )
+            start = end - timedelta(seconds=rng.randint(0, 30 * 86400))
+
+            sampled_participants = rng.sample(
+                participant_ids, min(rng.randint(*participants),
+                                     len(participant_ids))
+            )
+            sampled_guests = rng.sample(
+                guest_ids, min(rng.randint(*guests), len(guest_ids))
+            )
+
+            events.append({
+                'id': event_id,
+                'name': name,
+                'start': start,
+                'end': end,
+                'description': rng.choice(descriptions),
+                'participant_count': len(sampled_participants),
+                'guest_count': len(sampled_guests),
+                'updated_at': now,
+            })
+            participant_rows.extend({'event_id': event_id,
+                                     'participant_id': id_}
+                                    for id_ in sampled_participants)
+            guest_rows.extend({'event_id': event_id, 'guest_id': id_}
+                              for id_ in sampled_guests)
+
+        db.session.execute(EventModel.__table__.insert(), events)
+        if participant_rows:
+            db.session.execute(ParticipantEventModel.__table__.insert(),
+                               participant_rows)
+        if guest_rows:
+            db.session.execute(GuestEventModel.__table__.insert(),
+                               guest_rows)
+        db.session.commit()
+        print(f'events: {offset * chunk_size + len(chunk)}/{num}')
+    sync_id_sequence(EventModel)
+
+
+def parse_range(value):
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Populate database with authors and fake guests '
+                    'and events. Counts are multiplied by scale'
+    )
+    parser.add_argument('--authors', default=os.path.join('data',
+                                                          'authors.pickle'),
+                        help='authors source: .pickle, goodbooks .csv '
+                             'or text file with a name per line')
+    parser.add_argument('--skip-authors', action='store_true')
+    parser.add_argument('--guests', type=int, default=100)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--participants-per-event', type=parse_range,
+                        default=(1, 3), metavar='MIN-MAX')
+    parser.add_argument('--guests-per-event', type=parse_range,
+                        default=(1, 20), metavar='MIN-MAX')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed making generated data reproducible')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    load_participants()
-    generate_guests()
-    generate_events()
+    app.app_context().push()
+    args = parse_args()
+
+    rng = random.Random(args.seed)
+    if args.seed is not None:
+        fake.seed_instance(args.seed)
+
+    if not args.skip_authors:
+        authors = load_participants(args.authors, args.chunk_size)
+        print(f'authors: {authors}')
+    guests = generate_guests(int(args.guests * args.scale), args.chunk_size)
+    print(f'guests: {guests}')
+    generate_events(int(args.events * args.scale),
+                    participants=args.participants_per_event,
+                    guests=args.guests_per_event,
+                    chunk_size=args.chunk_size, rng=rng)
@@ -1,20 +1,107 @@
 """
 Module for Event Endpoints
 """
-from typing import Dict, Tuple
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
 
-from flask import request
+from flask import request, Response
 from flask_babel import gettext as _
 from flask_restful import Resource
+from marshmallow import ValidationError
 
+from db import unit_of_work
 from models.event import EventModel
-from schemas.event import EventSchema
+from schemas.event import EventBatchSchema, EventSchema, EventSerializer
 from utils.auth import jwt_required
-from utils.pagination import create_pagination
+from utils.export import EXPORT_FORMATS, export_response
+from utils.conditional import conditional, is_not_modified, \
+    last_modified_at, make_etag, not_modified, validator_headers
+from utils.pagination import create_pagination, decode_cursor
+from utils.response_cache import response_cache
+from utils.serializer import parse_fields
 
 event_schema = EventSchema()
+event_batch_schema = EventBatchSchema(many=True)
 event_list_schema = EventSchema(many=True,
                                 exclude=('participants',))
+event_serializer = EventSerializer(event_schema)
+event_list_serializer = EventSerializer(event_list_schema)
+
+
+@lru_cache(maxsize=256)
+def sparse_serializer(fields: FrozenSet[str],
+                      many: bool = False) -> EventSerializer:
+    """
+    Return serializer dumping only the given fields, in the order
+    they are dumped in by the full schema.
+    Serializers are compiled once for every set of fields
+    :param fields: FrozenSet[str]
+    :param many: bool = False
+    :return: EventSerializer
+    """
+    schema = event_list_schema if many else event_schema
+    only = [name for name in schema.dump_fields if name in fields]
+    return EventSerializer(EventSchema(only=only, many=many,
+                                       exclude=schema.exclude))
+
+
+def requested_serializer(many: bool = False) -> EventSerializer:
+    """
+    Return serializer of the fields requested with fields parameter.
+    Raises InvalidFields when some of them can not be dumped
+    :param many: bool = False
+    :return: EventSerializer
+    """
+    serializer = event_list_serializer if many else event_serializer
+    fields = parse_fields(request.args.get('fields'),
+                          serializer.dump_fields)
+    return serializer if fields is None else sparse_serializer(fields, many)
+
+
+def datetime_format() -> Optional[str]:
+    """
+    Return datetime format requested by the client.
+    Only ISO 8601 may be chosen instead of the localized format
+    :return: Optional[str]
+    """
+    return 'iso' if request.args.get('datetime_format') == 'iso' else None
+
+
+def invalidate_events(*ids: int, lists: bool = True) -> None:
+    """
+    Invalidate cached details of the events
+    and, unless told otherwise, cached event lists,
+    once changes of the request are committed
+    :param ids: int
+    :param lists: bool = True
+    :return: None
+    """
+    if lists:
+        unit_of_work.on_commit(response_cache.invalidate, 'events')
+        unit_of_work.on_commit(response_cache.invalidate, 'event_histogram')
+    unit_of_work.on_commit(response_cache.invalidate, 'event', *ids)
+
+
+def event_version(id_: int) -> Optional[Tuple[str, datetime]]:
+    """
+    Return ETag and Last-Modified of the event,
+    or None when event is not found
+    :param id_: int
+    :return: Optional[Tuple[str, datetime]]
+    """
+    version = EventModel.get_version(id_)
+    if version is None:
+        return None
+
+    updated_at, start, end = version
+    now = datetime.now()
+    # Status changes once the event starts or ends, without any update
+    passed = [moment.astimezone(timezone.utc)
+              for moment in (start, end) if moment <= now]
+    return make_etag('event', id_, updated_at,
+                     EventModel.status_at(start, end, now)), \
+        last_modified_at(updated_at, *passed)
 
 
 class RetrieveUpdateDestroyEvent(Resource):
@@ -22,15 +109,22 @@ class RetrieveUpdateDestroyEvent(Resource):
     Resource for manging Events
     """
     @classmethod
+    @conditional(event_version)
+    @response_cache.cached('event', id_arg='id_')
     def get(cls, id_: int) -> Tuple[Dict, int]:
         """
-        Retrieve Details on Event
+        Retrieve Details on Event.
+        Passing datetime_format=iso dumps datetimes in ISO 8601,
+        passing comma separated fields dumps only them
         :param id_: int
         :return: Tuple[Dict, int]
         """
-        event = EventModel.find_by_id(id_)
+        serializer = requested_serializer()
+        event = EventModel.find_by_id(id_, fields=serializer.dump_fields)
         if event:
-            return event_schema.dump(event), 200
+            return serializer.dump(
+                event, datetime_format=datetime_format()
+            ), 200
 
         return {'message': _('event_not_found').format(id_)}, 404
 
@@ -43,11 +137,12 @@ class RetrieveUpdateDestroyEvent(Resource):
         :return: Tuple[Dict, int]
         """
         event_json = request.get_json()
-        event = EventModel.find_by_id(id_)
+        event = EventModel.find_by_id(id_, fields=event_schema.dump_fields)
 
         if event:
             event.update_in_db(data=event_json)
-            return event_schema.dump(event), 200
+            invalidate_events(id_)
+            return event_serializer.dump(event), 200
         return {'message': _('event_not_found').format(id_)}, 404
 
     @classmethod
@@ -59,12 +154,13 @@ class RetrieveUpdateDestroyEvent(Resource):
         :return: Tuple[Dict, int]
         """
         event_json = request.get_json()
-        event = EventModel.find_by_id(id_)
+        event = EventModel.find_by_id(id_, fields=event_schema.dump_fields)
 
         if event:
             _ = event_schema.load(event_json)
             event.update_in_db(data=event_json)
-            return event_schema.dump(event), 200
+            invalidate_events(id_)
+            return event_serializer.dump(event), 200
         
         return {'message': _('event_not_found').format(id_)}, 404
 
@@ -80,8 +176,9 @@ class RetrieveUpdateDestroyEvent(Resource):
 
         if event:
             event.delete_from_db()
-            return {'message': _('event_not_found').format(id_)}, 404
-        return {'message': _('event_deleted').format(id_)}, 404
+            invalidate_events(id_)
+            return {'message': _('event_deleted').format(id_)}, 200
+        return {'message': _('event_not_found').format(id_)}, 404
 
 
 class ListCreateEvent(Resource):
@@ -89,27 +186,62 @@ class ListCreateEvent(Resource):
     Resource for listing and creating Events
     """
     @classmethod
+    @response_cache.cached('events')
     def get(cls) -> Tuple[Dict, int]:
         """
-        Get list of Events. Filter, Ordered and Paginated
+        Get list of Events. Filter, Ordered and Paginated.
+        Passing cursor parameter switches to keyset pagination.
+        Page is sent with ETag, so unchanged page is not sent again.
+        Passing datetime_format=iso dumps datetimes in ISO 8601,
+        passing comma separated fields dumps only them
         :return: Tuple[Dict, int]
         """
+        serializer = requested_serializer(many=True)
         filters = dict(request.args)
         page = int(filters.pop('page', 1))
         limit = int(filters.pop('limit', 20))
+        cursor = filters.pop('cursor', None)
+        # Kept in filters, so that page links preserve it
+        query_params = filters.copy()
+        query_params.pop('datetime_format', None)
+        query_params.pop('fields', None)
 
-        paginated_events = EventModel.get_list(query_params=filters.copy(),
+        paginated_events = EventModel.get_list(query_params=query_params,
                                                page=page,
-                                               limit=limit)
+                                               limit=limit,
+                                               cursor=decode_cursor(cursor)
+                                               if cursor is not None
+                                               else None,
+                                               fields=serializer
+                                               .dump_fields)
+
+        # Page changes along with any of its events, their statuses
+        # or the number of events, so it is checked before serializing
+        now = datetime.now()
+        etag = make_etag('events',
+                         [(event.id, event.updated_at,
+                           EventModel.status_at(event.start, event.end, now))
+                          for event in paginated_events.items],
+                         getattr(paginated_events, 'total', None),
+                         getattr(paginated_events, 'next_key', None),
+                         getattr(paginated_events, 'prev_key', None))
+        if is_not_modified(etag):
+            return not_modified(etag)
 
         response = create_pagination(items=paginated_events,
-                                     schema=event_list_schema,
+                                     schema=serializer,
                                      page=page,
                                      limit=limit,
                                      query_params=filters,
-                                     url=request.base_url)
+                                     url=request.base_url,
+                                     cursor=cursor,
+                                     dump_options={
+                                         'now': now,
+                                         'datetime_format':
+                                             datetime_format(),
+                                     })
 
-        return response, 200
+        return response, 200, validator_headers(etag)
 
     @classmethod
     @jwt_required(admin=True)
@@ -128,5 +260,140 @@ class ListCreateEvent(Resource):
 
         event = event_schema.load(event_json)
         event.save_to_db()
+        invalidate_events()
+
+        return event_serializer.dump(event), 201
+
+
+class CreateEventBatch(Resource):
+    """
+    Resource for creating many Events at once
+    """
+    @classmethod
+    @jwt_required(admin=True)
+    def post(cls) -> Tuple[Dict, int]:
+        """
+        Create new Events of the list. Events failing validation
+        or named the way another event is, are reported by their index
+        in the list, all the others are created within one transaction.
+        Events failing to be inserted are rolled back to their savepoint
+        :return: Tuple[Dict, int]
+        """
+        events_json = request.get_json()
+
+        if not isinstance(events_json, list) \
+                or len(events_json) > EventModel.max_batch_size:
+            return {
+                       'message': _('invalid_event_batch')
+                           .format(EventModel.max_batch_size)
+                   }, 400
+
+        errors: Dict[int, Dict[str, List[str]]] = {}
+        try:
+            events = event_batch_schema.load(events_json)
+        except ValidationError as err:
+            # Valid events are loaded again without the failed ones
+            errors.update(err.messages)
+            events = event_batch_schema.load(
+                [event_json for index, event_json in enumerate(events_json)
+                 if index not in errors]
+            )
+
+        indexes = [index for index in range(len(events_json))
+                   if index not in errors]
+        taken = EventModel.find_taken_names(event.name for event in events)
+        created = {}
+        for index, event in zip(indexes, events):
+            if event.name in taken:
+                errors[index] = {
+                    'name': [_('event_already_exists').format(event.name)]
+                }
+                continue
+            # Later events of the batch may not take the name either
+            taken.add(event.name)
+            created[index] = event
+
+        if created:
+            # Names may be taken by other requests since they were checked
+            failed = EventModel.save_all_to_db(list(created.values()))
+            for index, event in list(created.items()):
+                if event in failed:
+                    errors[index] = {
+                        'name': [_('event_already_exists')
+                                 .format(event.name)]
+                    }
+                    del created[index]
+            invalidate_events()
+
+        status = 201 if not errors else 207 if created else 400
+        return {
+                   'events': event_list_serializer.dump(created.values()),
+                   'errors': dict(sorted(errors.items())),
+               }, status
+
+
+class EventHistogram(Resource):
+    """
+    Resource for counting Events over time
+    """
+    @classmethod
+    @response_cache.cached('event_histogram')
+    def get(cls) -> Tuple[Dict, int]:
+        """
+        Count Events matching the filters of the list endpoint
+        by the hour, day, week, month or year they start in,
+        chosen with bucket parameter. Buckets without events
+        are left out
+        :return: Tuple[Dict, int]
+        """
+        filters = dict(request.args)
+        bucket = filters.pop('bucket', 'day')
+
+        if bucket not in EventModel.histogram_buckets:
+            return {
+                       'message': _('invalid_histogram_bucket')
+                           .format(bucket)
+                   }, 400
+
+        counts = EventModel.get_histogram(bucket, query_params=filters)
+        return {
+                   'bucket': bucket,
+                   'total': sum(count for start, count in counts),
+                   'buckets': [{'start': start, 'count': count}
+                               for start, count in counts],
+               }, 200
+
+
+class ExportEvents(Resource):
+    """
+    Resource for exporting Events
+    """
+    @classmethod
+    def get(cls) -> Union[Response, Tuple[Dict, int]]:
+        """
+        Stream all Events matching the filters of the list endpoint
+        as NDJSON or CSV, chosen with format parameter.
+        Passing gzip=1 compresses the stream
+        :return: Union[Response, Tuple[Dict, int]]
+        """
+        serializer = requested_serializer(many=True)
+        filters = dict(request.args)
+        format_ = filters.pop('format', 'ndjson')
+        gzip = filters.pop('gzip', '0') in ('1', 'true')
+        filters.pop('datetime_format', None)
+        filters.pop('fields', None)
+
+        if format_ not in EXPORT_FORMATS:
+            return {
+                       'message': _('invalid_export_format').format(format_)
+                   }, 400
 
-        return event_schema.dump(event), 201
+        events = EventModel.get_export(query_params=filters,
+                                       fields=serializer.dump_fields)
+        return export_response(
+            serializer.dump_iter(events, datetime_format=datetime_format()),
+            format_=format_,
+            columns=serializer.keys,
+            name='events',
+            gzip=gzip
+        )
@@ -1,20 +1,22 @@
 """
 Module for Guest Endpoints
 """
-import json
-import os
-from typing import Tuple, Dict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 
-import requests
 from flask import request
 from flask_babel import gettext as _
 from flask_restful import Resource, reqparse
 
-from models.event import EventModel
-from models.guest import GuestModel
+from models.event import EventModel, GuestEventModel
+from models.guest import GuestModel, guest_names
+from resources.event import invalidate_events
 from schemas.guest import GuestSchema
-from utils.auth import jwt_required, decode_token
-from utils.pagination import create_pagination
+from utils.auth import jwt_required, get_claims
+from utils.books import books_client
+from utils.conditional import conditional, last_modified_at, make_etag
+from utils.instrumentation import timed_serialization
+from utils.pagination import create_pagination, decode_cursor
 
 guest_schema = GuestSchema()
 guest_list_schema = GuestSchema(many=True)
@@ -30,13 +32,9 @@ class Login(Resource):
         Endpoint for login in. Uses book reviews /api/login for authorization
         :return:
         """
-        books_url = os.getenv('BOOKS_URL')
+        response = books_client.login(request.get_json())
 
-        response = requests.post(books_url + '/api/login/',
-                                 headers={'Content-Type': 'application/json'},
-                                 data=json.dumps(request.get_json()))
-
-        return json.loads(response.text), response.status_code
+        return response.json(), response.status_code
 
 
 class EventGuests(Resource):
@@ -48,6 +46,7 @@ class EventGuests(Resource):
                                    help=_('page_number'))
     pagination_parser.add_argument('limit', type=int, default=20,
                                    help=_('limit'))
+    pagination_parser.add_argument('cursor', type=str)
 
     @classmethod
     def get(cls, event_id: int) -> Tuple[Dict, int]:
@@ -57,16 +56,23 @@ class EventGuests(Resource):
         :return: Tuple[Dict, int]
         """
         args = cls.pagination_parser.parse_args()
-        page, limit = args['page'], args['limit']
-
-        paginated_events = EventModel.get_guests_list(event_id=event_id,
-                                                      page=page,
-                                                      limit=limit)
-
-        response = create_pagination(items=paginated_events,
+        page, limit = EventModel.clamp_guests_page(args['page'],
+                                                   args['limit'])
+        cursor = args['cursor']
+
+        paginated_guests = EventModel.get_guests_list(
+            event_id=event_id,
+            page=page,
+            limit=limit,
+            cursor=decode_cursor(cursor) if cursor is not None else None
+        )
+
+        response = create_pagination(items=paginated_guests,
                                      schema=guest_list_schema,
                                      page=page,
-                                     url=request.url_root)
+                                     limit=limit,
+                                     url=request.base_url,
+                                     cursor=cursor)
 
         return response, 200
 
@@ -83,21 +89,20 @@ class EventGuests(Resource):
         if event is None:
             return {'message': _('event_not_found').format(event_id)}, 404
 
-        claims = decode_token(request.headers['Authorization'])
+        claims = get_claims()
 
         guest = GuestModel.find_by_id(claims['id'])
         if guest is None:
-            books_url = os.getenv('BOOKS_URL')
-            user_details = requests.get(f'{books_url}/api/user/{claims["id"]}')
-            guest = GuestModel(id=claims['id'],
-                               name=user_details.json()['name'])
+            user_details = books_client.get_user(claims['id'])
+            if user_details is None:
+                return {'message': _('error_loading_user')}, 500
+
+            guest = GuestModel(id=claims['id'], name=user_details['name'])
             guest.save_to_db()
 
-        if guest in event.guests:
+        if not event.register_guests([guest.id]):
             return {'message': _('user_already_registered_for_event')}, 400
-
-        event.guests.append(guest)
-        event.save_to_db()
+        invalidate_events(event.id)
 
         return {'message': _('registered_for_event')}, 200
 
@@ -114,23 +119,64 @@ class EventGuests(Resource):
         if event is None:
             return {'message': _('event_not_found').format(event_id)}, 404
 
-        claims = decode_token(request.headers['Authorization'])
+        claims = get_claims()
 
-        guest = GuestModel.find_by_id(claims['id'])
-        if guest is None or guest not in event.guests:
+        if not event.unregister_guests([claims['id']]):
             return {'message': _('user_not_registered_for_event')}, 400
-
-        event.guests.remove(guest)
-        event.save_to_db()
+        invalidate_events(event.id)
 
         return {'message': _('unregistered_from_event')}, 200
 
 
+def guest_version(id_: int) -> Optional[Tuple[str, datetime]]:
+    """
+    Return ETag and Last-Modified of the guest,
+    or None when guest is not found
+    :param id_: int
+    :return: Optional[Tuple[str, datetime]]
+    """
+    updated_at = GuestModel.get_updated_at(id_)
+    if updated_at is None:
+        return None
+    return make_etag('guest', id_, updated_at), last_modified_at(updated_at)
+
+
+class GuestList(Resource):
+    """
+    Resource for looking up Guests by name
+    """
+    search_parser = reqparse.RequestParser()
+    search_parser.add_argument('prefix', type=str, required=True,
+                               help=_('name_prefix'))
+    search_parser.add_argument('limit', type=int, default=10,
+                               help=_('limit'))
+
+    @classmethod
+    def get(cls) -> Tuple[Dict, int]:
+        """
+        Autocomplete Guests with a word of the name
+        starting with the prefix. Served from the in-memory index
+        :return: Tuple[Dict, int]
+        """
+        args = cls.search_parser.parse_args()
+        limit = min(max(args['limit'], 1), 50)
+
+        return {
+                   'results': [
+                       {'id': id_, 'name': name}
+                       for id_, name in guest_names.search(
+                           args['prefix'], limit
+                       )
+                   ]
+               }, 200
+
+
 class GuestResource(Resource):
     """
     Resource for managing Guest Account
     """
     @classmethod
+    @conditional(guest_version)
     def get(cls, id_) -> Tuple[Dict, int]:
         """
         Retrieve Details about User
@@ -139,7 +185,8 @@ class GuestResource(Resource):
         """
         guest = GuestModel.find_by_id(id_)
         if guest:
-            return guest_schema.dump(guest)
+            with timed_serialization():
+                return guest_schema.dump(guest)
         return {'message': _('user_not_found').format(id_)}, 404
 
     @classmethod
@@ -156,13 +203,12 @@ class GuestResource(Resource):
         if guest is None:
             guest = GuestModel(id=id_)
 
-        books_url = os.getenv('BOOKS_URL')
-        user_details = requests.get(f'{books_url}/api/user/{id_}')
+        user_details = books_client.get_user(id_, fresh=True)
 
-        if user_details.status_code != 200:
+        if user_details is None:
             return {'message': _('error_loading_user')}, 500
 
-        guest.name = user_details.json()['name']
+        guest.name = user_details['name']
         guest.save_to_db()
 
         return {'message': _('profile_updated')}, 200
@@ -179,5 +225,8 @@ class GuestResource(Resource):
         if guest is None:
             return {'message': _('user_not_found').format(id_)}, 404
 
+        event_ids = GuestEventModel.event_ids(guest.id)
+        EventModel.release_guest(guest.id)
         guest.delete_from_db()
+        invalidate_events(*event_ids)
         return {'message': _('user_deleted')}, 200
@@ -1,18 +1,21 @@
 """
 Module for our Participant Endpoints
 """
-import os
-from typing import Tuple, Dict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 
-import requests
 from flask import request
 from flask_babel import gettext as _
-from flask_restful import Resource
+from flask_restful import Resource, reqparse
 
-from models.event import EventModel
-from models.participant import ParticipantModel
+from models.event import EventModel, ParticipantEventModel
+from models.participant import ParticipantModel, participant_names
+from resources.event import invalidate_events
 from schemas.participant import ParticipantSchema
 from utils.auth import jwt_required
+from utils.books import books_client, UpstreamError
+from utils.conditional import conditional, last_modified_at, make_etag
+from utils.instrumentation import timed_serialization
 
 participant_schema = ParticipantSchema()
 
@@ -26,6 +29,13 @@ class EventParticipants(Resource):
     def post(cls, event_id: int) -> Tuple[Dict, int]:
         """
         Register participants for events.
+        Unknown authors are loaded from the book reviews api concurrently
+        and all registrations are saved in a single transaction.
+        Result is reported for every participant with a status,
+        which is a machine code left untranslated, one of
+        registered_for_event, author_already_registered_for_event,
+        author_not_found and error_loading_author, the latter when
+        the author could not be loaded or has no name.
         Only available to admin
         :param event_id: int
         :return: Tuple[Dict, int]
@@ -35,32 +45,53 @@ class EventParticipants(Resource):
             return {'message': _('event_not_found').format(event_id)}, 404
 
         body = request.get_json()
-        for id_ in body.get('participants'):
-            participant = ParticipantModel.find_by_id(id_)
-
-            if participant is None:
-                books_url = os.getenv('BOOKS_URL')
-                author_details = requests.get(f'{books_url}/api/author/{id_}')
-                participant = ParticipantModel(id=id_,
-                                               name=author_details.json()
-                                               .get('name'))
-                participant.save_to_db()
-
-            if participant in event.participants:
-                return {
-                           'message': _('author_already_registered_for_event')
-                       }, 400
-
-            event.participants.append(participant)
-            event.save_to_db()
-
-        return {'message': _('registered_for_event')}, 200
+        ids = list(dict.fromkeys(int(id_) for id_ in body.get('participants')))
+
+        known = {participant.id
+                 for participant in ParticipantModel.find_all_by_id(ids)}
+        authors = books_client.get_authors(
+            [id_ for id_ in ids if id_ not in known]
+        )
+
+        statuses = {}
+        for id_, author_details in authors.items():
+            if isinstance(author_details, UpstreamError):
+                statuses[id_] = 'error_loading_author'
+            elif author_details is None:
+                statuses[id_] = 'author_not_found'
+            elif not author_details.get('name'):
+                statuses[id_] = 'error_loading_author'
+        ParticipantModel.add_all(
+            ParticipantModel(id=id_, name=author_details['name'])
+            for id_, author_details in authors.items()
+            if id_ not in statuses
+        )
+
+        candidates = [id_ for id_ in ids if id_ not in statuses]
+        for id_ in ParticipantEventModel.registered(event.id, candidates):
+            statuses[id_] = 'author_already_registered_for_event'
+
+        event.register_participants(
+            [id_ for id_ in candidates if id_ not in statuses]
+        )
+        invalidate_events(event.id)
+
+        return {
+                   'message': _('registered_for_event'),
+                   'participants': [
+                       {
+                           'id': id_,
+                           'status': statuses.get(id_, 'registered_for_event')
+                       } for id_ in ids
+                   ]
+               }, 200
 
     @classmethod
     @jwt_required(admin=True)
     def delete(cls, event_id: int) -> Tuple[Dict, int]:
         """
         Unregister participants for events.
+        None of them is unregistered, when any is not registered.
         Only available to admin
         :param event_id: int
         :return: Tuple[Dict, int]
@@ -71,19 +102,60 @@ class EventParticipants(Resource):
 
         body = request.get_json()
         for id_ in body.get('participants'):
-            participant = ParticipantModel.find_by_id(id_)
-
-            if participant is None or participant not in event.participants:
+            if not event.unregister_participants([id_]):
                 return {'message': _('author_not_found').format(id_)}, 404
-
-            event.participants.remove(participant)
-            event.save_to_db()
+        invalidate_events(event.id)
 
         return {'message': _('unregistered_from_event')}, 200
 
 
+def participant_version(id_: int) -> Optional[Tuple[str, datetime]]:
+    """
+    Return ETag and Last-Modified of the participant,
+    or None when participant is not found
+    :param id_: int
+    :return: Optional[Tuple[str, datetime]]
+    """
+    updated_at = ParticipantModel.get_updated_at(id_)
+    if updated_at is None:
+        return None
+    return make_etag('participant', id_, updated_at), \
+        last_modified_at(updated_at)
+
+
+class ParticipantList(Resource):
+    """
+    Resource for looking up Participants by name
+    """
+    search_parser = reqparse.RequestParser()
+    search_parser.add_argument('prefix', type=str, required=True,
+                               help=_('name_prefix'))
+    search_parser.add_argument('limit', type=int, default=10,
+                               help=_('limit'))
+
+    @classmethod
+    def get(cls) -> Tuple[Dict, int]:
+        """
+        Autocomplete Participants with a word of the name
+        starting with the prefix. Served from the in-memory index
+        :return: Tuple[Dict, int]
+        """
+        args = cls.search_parser.parse_args()
+        limit = min(max(args['limit'], 1), 50)
+
+        return {
+                   'results': [
+                       {'id': id_, 'name': name}
+                       for id_, name in participant_names.search(
+                           args['prefix'], limit
+                       )
+                   ]
+               }, 200
+
+
 class ParticipantResource(Resource):
     @classmethod
+    @conditional(participant_version)
     def get(cls, id_) -> Tuple[Dict, int]:
         """
         Retrieve Details about Participant
@@ -92,7 +164,8 @@ class ParticipantResource(Resource):
         """
         participant = ParticipantModel.find_by_id(id_)
         if participant:
-            return participant_schema.dump(participant)
+            with timed_serialization():
+                return participant_schema.dump(participant)
         return {'message': _('author_not_found').format(id_)}, 404
 
     @classmethod
@@ -109,14 +182,17 @@ class ParticipantResource(Resource):
         if participant is None:
             participant = ParticipantModel(id=id_)
 
-        books_url = os.getenv('BOOKS_URL')
-        author_details = requests.get(f'{books_url}/api/author/{id_}')
+        author_details = books_client.get_author(id_, fresh=True)
 
-        if author_details.status_code != 200:
+        if author_details is None or not author_details.get('name'):
             return {'message': _('error_loading_author')}, 500
 
-        participant.name = author_details.json()['name']
+        participant.name = author_details['name']
+        event_ids = ParticipantEventModel.event_ids(participant.id)
+        # Events embed participant names, so they change along
+        EventModel.touch(event_ids)
         participant.save_to_db()
+        invalidate_events(*event_ids, lists=False)
         return {'message': _('updated_author')}, 200
 
     @classmethod
@@ -131,5 +207,8 @@ class ParticipantResource(Resource):
         if participant is None:
             return {'message': _('author_not_found').format(id_)}, 404
 
+        event_ids = ParticipantEventModel.event_ids(participant.id)
+        EventModel.release_participant(participant.id)
         participant.delete_from_db()
+        invalidate_events(*event_ids)
         return {'message': _('author_deleted')}, 200
@@ -2,14 +2,16 @@
 Module with Event Schema
 """
 from datetime import datetime
+from operator import attrgetter
 from typing import Dict
 
 from flask_babel import format_datetime
-from marshmallow import fields, post_load
+from marshmallow import ValidationError, fields, post_load
 
 from ma import ma
 from models.event import EventModel
 from schemas.participant import ParticipantSchema
+from utils.serializer import DumpContext, Getter, Serializer
 
 
 class EventSchema(ma.SQLAlchemyAutoSchema):
@@ -28,8 +30,13 @@ class EventSchema(ma.SQLAlchemyAutoSchema):
         Connecting schema to Event Model
         """
         model = EventModel
-        dump_only = ('id', 'participants',)
+        # Used for conditional requests only
+        exclude = ('updated_at',)
+        dump_only = ('id', 'participants',
+                     'guest_count', 'participant_count',)
         include_fk = True
+        # Exported CSV columns follow the order of the fields
+        ordered = True
 
     @staticmethod
     def dump_start(obj: EventModel) -> str:
@@ -52,11 +59,16 @@ class EventSchema(ma.SQLAlchemyAutoSchema):
     @staticmethod
     def load_datetime(value: str) -> datetime:
         """
-        Deserializer input String to Python Datetime
+        Deserializer input String to Python Datetime.
+        Raises ValidationError when value is not in the format,
+        so that it is reported along with the other fields
         :param value: str
         :return: datetime
         """
-        return datetime.strptime(value, '%Y.%m.%d %H:%M')
+        try:
+            return datetime.strptime(value, '%Y.%m.%d %H:%M')
+        except (TypeError, ValueError):
+            raise ValidationError('Not a valid datetime.') from None
 
     @post_load
     def make_event(self, data: Dict, **kwargs: Dict) -> EventModel:
@@ -67,3 +79,49 @@ class EventSchema(ma.SQLAlchemyAutoSchema):
         :return: EventModel
         """
         return EventModel(**data)
+
+
+class EventBatchSchema(EventSchema):
+    """
+    Event Schema of batch items. Status of created events is dumped
+    right away, so they are required to start and end
+    """
+    start = fields.Method(serialize='dump_start',
+                          deserialize='load_datetime', required=True)
+    end = fields.Method(serialize='dump_end',
+                        deserialize='load_datetime', required=True)
+
+
+class EventSerializer(Serializer):
+    """
+    Fast Serializer of the Event Schema. Datetimes are formatted
+    with the formatter of the dump call and status is computed
+    against the time the call started
+    """
+    datetime_fields = ('start', 'end',)
+
+    def compile_field(self, name: str, field: fields.Field) -> Getter:
+        """
+        Create getter of the field value
+        :param name: str
+        :param field: fields.Field
+        :return: Getter
+        """
+        if name in self.datetime_fields:
+            get = attrgetter(name)
+            return lambda obj, context: context.format_datetime(get(obj))
+
+        if name == 'status':
+            return self.dump_status
+
+        return super().compile_field(name, field)
+
+    @staticmethod
+    def dump_status(obj: EventModel, context: DumpContext) -> str:
+        """
+        Dump status of the event at the time of the dump call
+        :param obj: EventModel
+        :param context: DumpContext
+        :return: str
+        """
+        return EventModel.status_at(obj.start, obj.end, context.now)
@@ -18,6 +18,8 @@ class GuestSchema(ma.SQLAlchemyAutoSchema):
         Connecting schema to Guest Model
         """
         model = GuestModel
+        # Used for conditional requests only
+        exclude = ('updated_at',)
 
     @post_load
     def make_guest(self, data: Dict, **kwargs: Dict) -> GuestModel:
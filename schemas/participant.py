@@ -18,6 +18,8 @@ class ParticipantSchema(ma.SQLAlchemyAutoSchema):
         Connecting schema to Participant Model
         """
         model = ParticipantModel
+        # Used for conditional requests only
+        exclude = ('updated_at',)
         dump_only = ('id',)
 
     @post_load
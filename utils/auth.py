@@ -1,16 +1,22 @@
 """
 Module with Authentication Utilities
 """
+import hashlib
 import json
-import os
-from datetime import datetime
+import time
 from functools import wraps
 from typing import Dict, Callable, Union
 
 import jwt
-from flask import request, Response
+from flask import current_app, g, request, Response
 from flask_babel import gettext as _
 
+from utils.cache import MISSING, TTLCache
+
+# Claims of already verified tokens by token digest.
+# Entries expire together with the tokens
+verified_tokens = TTLCache(maxsize=10000)
+
 
 class jwt_required:
     """
@@ -34,30 +40,26 @@ class jwt_required:
         """
         @wraps(func)
         def wrapper(*args, **kwargs):
-            token = request.headers.get('Authorization')
-            if token:
+            if request.headers.get('Authorization'):
+                claims = get_claims()
 
                 # Check if user is owner of the object he is trying to access
-                if self.owner:
-                    claims = decode_token(token)
-                    if claims.get('id') != kwargs.get('id_'):
-                        return Response(json.dumps(
-                            {
-                                'message': _('owner_or_admin_required')
-                            }),
-                            status=400,
-                            content_type='application/json')
+                if self.owner and claims.get('id') != kwargs.get('id_'):
+                    return Response(json.dumps(
+                        {
+                            'message': _('owner_or_admin_required')
+                        }),
+                        status=400,
+                        content_type='application/json')
 
                 # Check if user is admin
-                if self.admin:
-                    claims = decode_token(token)
-                    if not claims.get('is_admin'):
-                        return Response(json.dumps(
-                            {
-                                'message': _('admin_required')
-                            }),
-                            status=400,
-                            content_type='application/json')
+                if self.admin and not claims.get('is_admin'):
+                    return Response(json.dumps(
+                        {
+                            'message': _('admin_required')
+                        }),
+                        status=400,
+                        content_type='application/json')
 
                 return func(*args, **kwargs)
 
@@ -71,16 +73,36 @@ class jwt_required:
         return wrapper
 
 
+def get_claims() -> Dict:
+    """
+    Return claims of the current request JWT Token.
+    Token is decoded once per request
+    :return: Dict
+    """
+    if 'claims' not in g:
+        g.claims = decode_token(request.headers['Authorization'])
+    return g.claims
+
+
 def decode_token(token: str) -> Dict:
     """
-    Decode JWT Token with App Secret Key
+    Decode JWT Token with App Secret Key.
+    Signatures of recently seen tokens are not verified again
     :param token: str
     :return: Dict
     """
-    claims = jwt.decode(token,
-                        os.getenv('SECRET_KEY'),
-                        algorithms='HS256')
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(digest)
+    if claims is not MISSING:
+        return claims
+
+    try:
+        claims = jwt.decode(token,
+                            current_app.secret_key,
+                            algorithms=['HS256'],
+                            options={'require': ['exp']})
+    except jwt.ExpiredSignatureError as err:
+        raise jwt.PyJWTError(_('token_expired')) from err
 
-    if int(claims.get('exp')) < int(datetime.now().strftime('%s')):
-        raise jwt.PyJWTError(_('token_expired'))
+    verified_tokens.set(digest, claims, ttl=claims['exp'] - time.time())
     return claims
@@ -0,0 +1,276 @@
+"""
+Client for the Book Reviews service located at BOOKS_URL
+"""
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.cache import MISSING, TTLCache
+
+
+class UpstreamError(Exception):
+    """
+    Raised when Book Reviews service can not be reached
+    or is failing to answer requests
+    """
+
+
+class CircuitBreaker:
+    """
+    Stop calling failing service for a while after a number
+    of consecutive failures. Once reset timeout passes a single
+    trial call is let through, which either closes the circuit
+    or opens it again
+    """
+    def __init__(self, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0) -> None:
+        """
+        Initialize Circuit Breaker
+        :param failure_threshold: int = 5
+        :param reset_timeout: float = 30.0
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Whether calls are currently being rejected
+        :return: bool
+        """
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        Check whether call may be made
+        :return: bool
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or \
+                    time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        """
+        Close the circuit after successful call
+        :return: None
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """
+        Count failed call and open the circuit when threshold is reached
+        :return: None
+        """
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class BooksClient:
+    """
+    HTTP client for the Book Reviews service. Keeps connections
+    alive in a pool shared by all calls, limits time spent on every
+    call and retries idempotent requests with exponential backoff.
+    User and author documents are cached, including missing ones
+    """
+    def __init__(self, base_url: Optional[str] = None, *,
+                 timeout: float = 5.0, connect_timeout: float = 2.0,
+                 retries: int = 2, backoff_factor: float = 0.2,
+                 pool_size: int = 20,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[TTLCache] = None,
+                 negative_ttl: float = 30.0,
+                 max_workers: int = 8) -> None:
+        """
+        Initialize Client. When base_url is not given
+        BOOKS_URL environment variable is used
+        :param base_url: Optional[str] = None
+        :param timeout: float = 5.0 - seconds to wait for response
+        :param connect_timeout: float = 2.0
+        :param retries: int = 2
+        :param backoff_factor: float = 0.2
+        :param pool_size: int = 20 - connections kept alive
+        :param breaker: Optional[CircuitBreaker] = None
+        :param cache: Optional[TTLCache] = None
+        :param negative_ttl: float = 30.0 - seconds to remember
+            that document does not exist
+        :param max_workers: int = 8 - threads fetching documents
+            concurrently, shouldn't exceed pool_size
+        """
+        self._base_url = base_url
+        self.timeout = (connect_timeout, timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache if cache is not None \
+            else TTLCache(maxsize=10000, ttl=300.0)
+        self.negative_ttl = negative_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='books')
+
+        # Only GET requests are safe to be repeated
+        retry = Retry(total=retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({'GET'}),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def base_url(self) -> str:
+        """
+        Base url of the Book Reviews service
+        :return: str
+        """
+        return (self._base_url or os.getenv('BOOKS_URL', '')).rstrip('/')
+
+    def request(self, method: str, path: str, **kwargs: Dict) \
+            -> requests.Response:
+        """
+        Make request to the service.
+        Raises UpstreamError when service is unreachable
+        or circuit is open
+        :param method: str
+        :param path: str
+        :param kwargs: Dict - passed to requests
+        :return: requests.Response
+        """
+        if not self.breaker.allow():
+            raise UpstreamError('Book Reviews service is unavailable')
+
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, self.base_url + path,
+                                            **kwargs)
+        except requests.RequestException as err:
+            self.breaker.record_failure()
+            raise UpstreamError(str(err)) from err
+        except BaseException:
+            # Any other failure ends the trial call as well,
+            # which would keep the circuit open for good otherwise
+            self.breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def login(self, credentials: Dict) -> requests.Response:
+        """
+        Log user in with the service credentials
+        :param credentials: Dict
+        :return: requests.Response
+        """
+        return self.request('POST', '/api/login/', json=credentials)
+
+    def get_user(self, id_: int, fresh: bool = False) -> Optional[Dict]:
+        """
+        Get details about user. Returns None when user is not found
+        :param id_: int
+        :param fresh: bool = False - bypass cached document
+        :return: Optional[Dict]
+        """
+        return self._get_cached(f'/api/user/{id_}', fresh)
+
+    def get_author(self, id_: int, fresh: bool = False) -> Optional[Dict]:
+        """
+        Get details about author. Returns None when author is not found
+        :param id_: int
+        :param fresh: bool = False - bypass cached document
+        :return: Optional[Dict]
+        """
+        return self._get_cached(f'/api/author/{id_}', fresh)
+
+    def get_authors(self, ids: Iterable[int]) \
+            -> Dict[int, Union[Dict, None, UpstreamError]]:
+        """
+        Get details about many authors concurrently.
+        Every id is mapped either to its document, to None when author
+        is not found, or to the error raised while loading it
+        :param ids: Iterable[int]
+        :return: Dict[int, Union[Dict, None, UpstreamError]]
+        """
+        # Context is copied, so calls are attributed to the request
+        futures = {id_: self.executor.submit(contextvars.copy_context().run,
+                                             self.get_author, id_)
+                   for id_ in set(ids)}
+
+        authors = {}
+        for id_, future in futures.items():
+            try:
+                authors[id_] = future.result()
+            except UpstreamError as err:
+                authors[id_] = err
+        return authors
+
+    def _get_cached(self, path: str, fresh: bool = False) -> Optional[Dict]:
+        """
+        Get JSON document from the cache or from the service.
+        Fetched document is cached either way. When service fails
+        to answer, expired document is served if there is one
+        :param path: str
+        :param fresh: bool = False
+        :return: Optional[Dict]
+        """
+        if not fresh:
+            document = self.cache.get(path)
+            if document is not MISSING:
+                return document
+
+        try:
+            document = self._get_document(path)
+        except UpstreamError:
+            document = self.cache.get_stale(path)
+            if document is MISSING:
+                raise
+            return document
+
+        self.cache.set(path, document,
+                       ttl=None if document is not None else self.negative_ttl)
+        return document
+
+    def _get_document(self, path: str) -> Optional[Dict]:
+        """
+        Get JSON document from the service.
+        Returns None when service rejects the request,
+        raises UpstreamError when service fails to answer it
+        :param path: str
+        :return: Optional[Dict]
+        """
+        response = self.request('GET', path)
+        if response.status_code >= 500:
+            raise UpstreamError(f'Book Reviews service responded '
+                                f'with {response.status_code}')
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+
+books_client = BooksClient()
@@ -0,0 +1,124 @@
+"""
+In-process Caching Utilities
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Returned by cache lookups when key is not cached,
+# so that None can be cached as a regular value
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe mapping bounded by the number of entries.
+    Least recently used entries are evicted first and every entry
+    expires after its time to live. Expired entries are kept until
+    evicted, so they still can be served as stale values
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0) -> None:
+        """
+        Initialize Cache
+        :param maxsize: int = 1024
+        :param ttl: float = 300.0 - default time to live in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Number of cached entries including expired ones
+        :return: int
+        """
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Return value cached under the key
+        or default when it is missing or expired
+        :param key: Hashable
+        :param default: Any = MISSING
+        :return: Any
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Return value cached under the key even if it has expired
+        :param key: Hashable
+        :param default: Any = MISSING
+        :return: Any
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            self.stale_hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any,
+            ttl: Optional[float] = None) -> None:
+        """
+        Cache value under the key, evicting least recently used
+        entries when cache is full
+        :param key: Hashable
+        :param value: Any
+        :param ttl: Optional[float] = None - defaults to cache ttl
+        :return: None
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove key from the cache and return its value
+        :param key: Hashable
+        :param default: Any = None
+        :return: Any
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        Return cache usage counters
+        :return: Dict
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale_hits': self.stale_hits,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
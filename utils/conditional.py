@@ -0,0 +1,123 @@
+"""
+Conditional Requests Utilities (ETag / Last-Modified)
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import request, Response
+from flask_babel import get_locale, get_timezone
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Create strong entity tag out of the parts identifying object version.
+    Tag also depends on the query arguments, locale and timezone,
+    as they change representation of the object
+    :param parts: Any
+    :return: str
+    """
+    args = sorted(request.args.items(multi=True))
+    raw = repr((parts, args, str(get_locale()), str(get_timezone())))
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+def last_modified_at(*moments: Optional[datetime]) -> Optional[datetime]:
+    """
+    Return the latest of the moments as UTC datetime rounded to seconds.
+    Naive datetimes are taken as UTC
+    :param moments: Optional[datetime]
+    :return: Optional[datetime]
+    """
+    moments = [moment if moment.tzinfo else
+               moment.replace(tzinfo=timezone.utc)
+               for moment in moments if moment is not None]
+    if not moments:
+        return None
+    return max(moments).astimezone(timezone.utc).replace(microsecond=0)
+
+
+def is_not_modified(etag: Optional[str],
+                    last_modified: Optional[datetime] = None) -> bool:
+    """
+    Check whether client already has current version of the resource.
+    If-None-Match takes precedence over If-Modified-Since
+    :param etag: Optional[str]
+    :param last_modified: Optional[datetime] = None
+    :return: bool
+    """
+    if request.if_none_match:
+        return etag is not None \
+               and request.if_none_match.contains_weak(etag.strip('"'))
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def validator_headers(etag: Optional[str],
+                      last_modified: Optional[datetime] = None) \
+        -> Dict[str, str]:
+    """
+    Create ETag and Last-Modified response headers
+    :param etag: Optional[str]
+    :param last_modified: Optional[datetime] = None
+    :return: Dict[str, str]
+    """
+    headers = {}
+    if etag is not None:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        headers['Last-Modified'] = last_modified \
+            .strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return headers
+
+
+def not_modified(etag: Optional[str],
+                 last_modified: Optional[datetime] = None) -> Response:
+    """
+    Create empty 304 Not Modified response
+    :param etag: Optional[str]
+    :param last_modified: Optional[datetime] = None
+    :return: Response
+    """
+    return Response(status=304,
+                    headers=validator_headers(etag, last_modified))
+
+
+def conditional(validators: Callable[..., Optional[Tuple[str,
+                                                         datetime]]]) \
+        -> Callable:
+    """
+    Decorator answering conditional GET requests with 304 Not Modified
+    before the endpoint is called. Validators are called with the view
+    arguments and return ETag and Last-Modified of the resource,
+    or None when it does not exist
+    :param validators: Callable[..., Optional[Tuple[str, datetime]]]
+    :return: Callable
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            version = validators(**kwargs)
+            if version is None:
+                return func(*args, **kwargs)
+
+            etag, last_modified = version
+            if is_not_modified(etag, last_modified):
+                return not_modified(etag, last_modified)
+
+            response = func(*args, **kwargs)
+            if isinstance(response, Response):
+                return response
+            if not isinstance(response, tuple):
+                response = (response, 200)
+
+            headers = dict(response[2]) if len(response) > 2 else {}
+            if response[1] == 200:
+                headers.update(validator_headers(etag, last_modified))
+            return response[0], response[1], headers
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,122 @@
+"""
+Streaming Export Utilities
+"""
+import csv
+import json
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flask import Response, stream_with_context
+from flask_sqlalchemy import BaseQuery
+from werkzeug.utils import secure_filename
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Compressed output is flushed to the client in chunks of at least this size
+GZIP_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    File-like object returning written value instead of storing it,
+    so that csv.writer can produce lines one by one
+    """
+    @staticmethod
+    def write(value: str) -> str:
+        """
+        Return the value
+        :param value: str
+        :return: str
+        """
+        return value
+
+
+def stream_query(query: BaseQuery, chunk_size: int = 1000) -> Iterator[Any]:
+    """
+    Iterate over query results fetched in chunks from the server-side
+    cursor, where database driver supports one
+    :param query: BaseQuery
+    :param chunk_size: int = 1000
+    :return: Iterator[Any]
+    """
+    return iter(query.execution_options(stream_results=True)
+                .yield_per(chunk_size))
+
+
+def ndjson_lines(rows: Iterable[Dict]) -> Iterator[str]:
+    """
+    Write every row as JSON document on a line of its own
+    :param rows: Iterable[Dict]
+    :return: Iterator[str]
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    """
+    Write rows as CSV lines preceded by the header with column names
+    :param rows: Iterable[Dict]
+    :param columns: List[str]
+    :return: Iterator[str]
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row.get(column) for column in columns])
+
+
+def gzip_chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """
+    Compress lines into gzip stream
+    :param lines: Iterable[str]
+    :return: Iterator[bytes]
+    """
+    compressor = zlib.compressobj(wbits=31)
+    buffer = []
+    size = 0
+    for line in lines:
+        chunk = compressor.compress(line.encode())
+        if chunk:
+            buffer.append(chunk)
+            size += len(chunk)
+        if size >= GZIP_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+
+    buffer.append(compressor.flush())
+    yield b''.join(buffer)
+
+
+def export_response(rows: Iterable[Dict], *, format_: str,
+                    columns: Optional[List[str]] = None,
+                    name: str = 'export', gzip: bool = False) -> Response:
+    """
+    Create response streaming rows in the export format.
+    Rows are produced while response is being sent,
+    so they are never held in memory all at once
+    :param rows: Iterable[Dict]
+    :param format_: str - one of EXPORT_FORMATS
+    :param columns: Optional[List[str]] = None - required by csv
+    :param name: str = 'export' - file name without extension
+    :param gzip: bool = False - compress response with gzip
+    :return: Response
+    """
+    lines = csv_lines(rows, columns) if format_ == 'csv' \
+        else ndjson_lines(rows)
+
+    filename = secure_filename(
+        f'{name}_{time.strftime("%Y-%m-%d_%H-%M-%S")}.{format_}'
+    )
+    headers = {'Content-Disposition': f'attachment;filename={filename}'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+        lines = gzip_chunks(lines)
+
+    return Response(stream_with_context(lines),
+                    mimetype=EXPORT_FORMATS[format_],
+                    headers=headers)
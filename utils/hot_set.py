@@ -0,0 +1,264 @@
+"""
+In-memory Hot Set of Upcoming and Ongoing Objects
+"""
+import bisect
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, \
+    Sequence, Set, Tuple
+
+from utils.snapshot import Row, Snapshot
+
+EPOCH = datetime(1970, 1, 1)
+
+# Objects start right after their start time
+MICROSECOND = timedelta(microseconds=1)
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel. Every slot holds timers of the ticks,
+    that are equal modulo the number of slots, so timers set further
+    than a revolution ahead wait in their slot for the next rounds.
+    Timers are only fired when the wheel is advanced, at which point
+    all of them due by then are fired
+    """
+    def __init__(self, resolution: float = 1.0, size: int = 3600) -> None:
+        """
+        Initialize Wheel
+        :param resolution: float = 1.0 - seconds of a tick
+        :param size: int = 3600 - number of slots
+        """
+        self.resolution = resolution
+        self.size = size
+        self.slots: List[List[Tuple[datetime, Any]]] = \
+            [[] for _ in range(size)]
+        self.tick: Optional[int] = None
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _tick(self, moment: datetime) -> int:
+        return int((moment - EPOCH).total_seconds() // self.resolution)
+
+    def schedule(self, deadline: datetime, item: Any) -> None:
+        """
+        Set timer firing the item at the deadline
+        :param deadline: datetime
+        :param item: Any
+        :return: None
+        """
+        tick = self._tick(deadline)
+        # Overdue timers go to the current slot, which is checked next
+        if self.tick is not None and tick < self.tick:
+            tick = self.tick
+        self.slots[tick % self.size].append((deadline, item))
+        self.count += 1
+
+    def advance(self, now: datetime) -> List[Any]:
+        """
+        Move the wheel to the moment, returning items of the fired
+        timers in the order of their deadlines
+        :param now: datetime
+        :return: List[Any]
+        """
+        now_tick = self._tick(now)
+        first = now_tick if self.tick is None else min(self.tick, now_tick)
+        if now_tick - first >= self.size:
+            indexes = range(self.size)
+        else:
+            indexes = [tick % self.size for tick in range(first, now_tick + 1)]
+        self.tick = now_tick if self.tick is None \
+            else max(self.tick, now_tick)
+
+        due = []
+        for index in indexes:
+            slot = self.slots[index]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                (due if timer[0] <= now else keep).append(timer)
+            self.slots[index] = keep
+
+        self.count -= len(due)
+        due.sort(key=itemgetter(0))
+        return [item for _, item in due]
+
+    def clear(self) -> None:
+        """
+        Cancel all timers
+        :return: None
+        """
+        self.slots = [[] for _ in range(self.size)]
+        self.tick = None
+        self.count = 0
+
+
+class StatusHotSet(Snapshot):
+    """
+    Upcoming and ongoing objects, loaded from rows with id, start and end
+    attributes. Rows of every status are kept sorted by each of the
+    orders, so pages are sliced out of them. Timer wheel moves objects
+    from upcoming to ongoing at their start and drops them at their end,
+    and is advanced to the current time before every lookup.
+    Object is upcoming while its start is ahead and ongoing strictly
+    between start and end, the way EventModel.filter_by_status does
+    """
+    statuses = ('upcoming', 'ongoing')
+
+    def __init__(self, loader: Callable[[Optional[datetime]], Iterable[Row]],
+                 orders: Sequence[str] = ('id',),
+                 max_age: float = 3600.0,
+                 refresh_interval: float = 5.0) -> None:
+        """
+        Initialize Hot Set
+        :param loader: Callable[[Optional[datetime]], Iterable[Row]] -
+            returns rows of objects modified since the time given,
+            or of all objects, that have not ended yet
+        :param orders: Sequence[str] = ('id',) - attributes rows are
+            sorted by, along with id
+        :param max_age: float = 3600.0 - seconds before set is reloaded
+        :param refresh_interval: float = 5.0 - seconds between refreshes
+        """
+        super().__init__(loader, max_age, refresh_interval)
+        self.orders = tuple(orders)
+        self.wheel = TimerWheel()
+        self.rows: Dict[int, Row] = {}
+        self.status: Dict[int, Optional[str]] = {}
+        self.keys: Dict[str, Dict[str, List[Tuple]]] = {}
+        self._clear()
+
+    def _clear(self) -> None:
+        self.rows, self.status = {}, {}
+        self.keys = {status: {order: [] for order in self.orders}
+                     for status in self.statuses}
+        self.wheel.clear()
+
+    @staticmethod
+    def status_at(row: Row, now: datetime) -> Optional[str]:
+        """
+        Status of the object at the moment, None at the very moment
+        it starts, when it is neither upcoming nor ongoing
+        :param row: Row
+        :param now: datetime
+        :return: Optional[str]
+        """
+        if row.start > now:
+            return 'upcoming'
+        if row.start < now < row.end:
+            return 'ongoing'
+        return None
+
+    def _key(self, row: Row, order: str) -> Tuple:
+        return getattr(row, order), row.id
+
+    def _move(self, row: Row, status: Optional[str]) -> None:
+        previous = self.status.get(row.id)
+        if previous == status:
+            return
+        for order, keys in self.keys.get(previous, {}).items():
+            key = self._key(row, order)
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+        for order, keys in self.keys.get(status, {}).items():
+            bisect.insort(keys, self._key(row, order))
+        self.status[row.id] = status
+
+    def _insert(self, row: Row, now: datetime) -> None:
+        if row.start is None or row.end is None or row.end <= now:
+            return
+        self.rows[row.id] = row
+        self._move(row, self.status_at(row, now))
+        # Timers at every change of the status,
+        # which is evaluated again once they fire
+        for deadline in (row.start, row.start + MICROSECOND, row.end):
+            if deadline > now:
+                self.wheel.schedule(deadline, (row.id, row))
+
+    def _advance(self, now: datetime) -> None:
+        for id_, row in self.wheel.advance(now):
+            # Timers of replaced rows are left to fire with no effect
+            if self.rows.get(id_) is not row:
+                continue
+            if row.end <= now:
+                self.discard(id_)
+            else:
+                self._move(row, self.status_at(row, now))
+
+    def replace(self, rows: List[Row]) -> None:
+        """
+        Replace all rows, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        now = datetime.now()
+        self._clear()
+        self.wheel.advance(now)
+        for row in rows:
+            self._insert(row, now)
+
+    def apply(self, rows: List[Row]) -> None:
+        """
+        Add or update the rows, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        now = datetime.now()
+        self._advance(now)
+        for row in rows:
+            self.discard(row.id)
+            self._insert(row, now)
+
+    def discard(self, id_: int) -> None:
+        """
+        Remove row of the object, called with the lock held
+        :param id_: int
+        :return: None
+        """
+        row = self.rows.pop(id_, None)
+        if row is not None:
+            self._move(row, None)
+            del self.status[id_]
+
+    def ids(self, status: str, now: Optional[datetime] = None) -> Set[int]:
+        """
+        Return ids of the objects with the status at the moment,
+        which defaults to the current time
+        :param status: str - one of statuses
+        :param now: Optional[datetime] = None
+        :return: Set[int]
+        """
+        self.sync()
+        with self._lock:
+            self._advance(now or datetime.now())
+            return {key[-1] for key in self.keys[status][self.orders[0]]}
+
+    def page(self, status: str, order: str = 'id',
+             descending: bool = False, page: int = 1, limit: int = 20,
+             now: Optional[datetime] = None) -> Tuple[List[Row], int]:
+        """
+        Return rows of the page of objects with the status at the moment,
+        which defaults to the current time, along with their total number
+        :param status: str - one of statuses
+        :param order: str = 'id' - one of orders
+        :param descending: bool = False
+        :param page: int = 1
+        :param limit: int = 20
+        :param now: Optional[datetime] = None
+        :return: Tuple[List[Row], int]
+        """
+        self.sync()
+        with self._lock:
+            self._advance(now or datetime.now())
+            keys = self.keys[status][order]
+            total = len(keys)
+            offset = (page - 1) * limit
+            if descending:
+                keys = keys[max(total - offset - limit, 0):
+                            max(total - offset, 0)][::-1]
+            else:
+                keys = keys[offset:offset + limit]
+            return [self.rows[key[-1]] for key in keys], total
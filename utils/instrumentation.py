@@ -0,0 +1,369 @@
+"""
+Request-scoped Instrumentation of SQL, Upstream Calls and Serialization
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import Flask, Response, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.books import books_client
+from utils.cache import MISSING
+
+# Statements EXPLAIN is run for, others may change data
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH')
+
+
+class RequestMetrics:
+    """
+    Time spent by the request in the database, in the Book Reviews
+    service and in serialization, Book Reviews documents found in
+    its cache and whether the response was taken from the response
+    cache. Upstream calls made concurrently
+    are added up, so their time may exceed the request time
+    """
+    def __init__(self) -> None:
+        """
+        Initialize Metrics at the start of the request
+        """
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.upstream_count = 0
+        self.upstream_time = 0.0
+        self.upstream_cache_hits = 0
+        self.upstream_cache_misses = 0
+        self.serialize_time = 0.0
+        self.serializing = False
+        # HIT or MISS, as sent in X-Cache header of cached endpoints
+        self.cache = None
+        self._lock = threading.Lock()
+
+    def add_sql(self, duration: float) -> None:
+        """
+        Record executed statement
+        :param duration: float - seconds
+        :return: None
+        """
+        self.sql_count += 1
+        self.sql_time += duration
+
+    def add_upstream(self, duration: float) -> None:
+        """
+        Record call to the Book Reviews service,
+        which may be made from another thread
+        :param duration: float - seconds
+        :return: None
+        """
+        with self._lock:
+            self.upstream_count += 1
+            self.upstream_time += duration
+
+    def add_upstream_cache(self, hit: bool) -> None:
+        """
+        Record lookup of a document in the Book Reviews cache,
+        which may be made from another thread
+        :param hit: bool
+        :return: None
+        """
+        with self._lock:
+            if hit:
+                self.upstream_cache_hits += 1
+            else:
+                self.upstream_cache_misses += 1
+
+    @property
+    def total_time(self) -> float:
+        """
+        Seconds since the request started
+        :return: float
+        """
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Value of the Server-Timing header
+        :return: str
+        """
+        metrics = [
+            f'db;dur={self.sql_time * 1000:.2f};'
+            f'desc="{self.sql_count} queries"',
+            f'upstream;dur={self.upstream_time * 1000:.2f};'
+            f'desc="{self.upstream_count} calls, '
+            f'{self.upstream_cache_hits} cached"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'total;dur={self.total_time * 1000:.2f}',
+        ]
+        if self.cache is not None:
+            metrics.append(f'cache;desc="{self.cache}"')
+        return ', '.join(metrics)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Metrics in milliseconds, as written to the log
+        :return: Dict[str, Any]
+        """
+        return {
+            'total_ms': round(self.total_time * 1000, 3),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'upstream_count': self.upstream_count,
+            'upstream_ms': round(self.upstream_time * 1000, 3),
+            'upstream_cache_hits': self.upstream_cache_hits,
+            'upstream_cache_misses': self.upstream_cache_misses,
+            'serialize_ms': round(self.serialize_time * 1000, 3),
+            'cache': self.cache,
+        }
+
+
+# Metrics of the request being handled. Context variable is copied
+# to the threads loading documents, so their calls are counted as well
+current_metrics: ContextVar[Optional[RequestMetrics]] = \
+    ContextVar('current_metrics', default=None)
+
+
+@contextmanager
+def timed_serialization() -> Iterator[None]:
+    """
+    Add time spent within the block to serialization time of the
+    request. Nested blocks are counted once
+    :return: Iterator[None]
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+class Instrumentation:
+    """
+    Measure every request of the app. Results are sent in Server-Timing
+    header and logged as a JSON line. Statements taking longer than
+    slow query threshold are logged along with their EXPLAIN output
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        """
+        Initialize Instrumentation
+        :param app: Optional[Flask] = None
+        """
+        self.enabled = True
+        self.server_timing = True
+        self.slow_query_threshold = None
+        self.logger = logging.getLogger('app.requests')
+        self.slow_query_logger = logging.getLogger('app.slow_queries')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Configure instrumentation from INSTRUMENTATION, SERVER_TIMING
+        and SLOW_QUERY_THRESHOLD app settings, the latter in seconds
+        :param app: Flask
+        :return: None
+        """
+        self.enabled = app.config.get('INSTRUMENTATION', True)
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        self.slow_query_threshold = app.config.get('SLOW_QUERY_THRESHOLD')
+        if not self.enabled:
+            return
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.end_request)
+
+        if not event.contains(Engine, 'before_cursor_execute',
+                              self.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute',
+                         self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute',
+                         self.after_cursor_execute)
+            event.listen(Engine, 'handle_error', self.handle_error)
+        if not getattr(books_client.request, 'instrumented', False):
+            books_client.request = self.instrument_upstream(
+                books_client.request
+            )
+        if not getattr(books_client.cache.get, 'instrumented', False):
+            books_client.cache.get = self.instrument_upstream_cache(
+                books_client.cache.get
+            )
+
+    @staticmethod
+    def start_request() -> None:
+        """
+        Start measuring the request
+        :return: None
+        """
+        current_metrics.set(RequestMetrics())
+
+    def finish_request(self, response: Response) -> Response:
+        """
+        Add Server-Timing header to the response and log metrics
+        :param response: Response
+        :return: Response
+        """
+        metrics = current_metrics.get()
+        if metrics is None:
+            return response
+
+        metrics.cache = response.headers.get('X-Cache')
+        if self.server_timing:
+            response.headers['Server-Timing'] = metrics.server_timing()
+        self.logger.info(json.dumps({
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            **metrics.as_dict(),
+        }))
+        return response
+
+    @staticmethod
+    def end_request(exc: Optional[BaseException] = None) -> None:
+        """
+        Stop measuring the request
+        :param exc: Optional[BaseException] = None
+        :return: None
+        """
+        current_metrics.set(None)
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany) -> None:
+        """
+        Remember when statement started
+        :return: None
+        """
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters,
+                             context, executemany) -> None:
+        """
+        Record statement duration and log it when it was slow
+        :return: None
+        """
+        duration = time.perf_counter() - conn.info['query_started'].pop()
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.add_sql(duration)
+
+        if self.slow_query_threshold is not None \
+                and duration >= self.slow_query_threshold:
+            self.log_slow_query(conn, statement, parameters, executemany,
+                                duration)
+
+    @staticmethod
+    def handle_error(exception_context) -> None:
+        """
+        Forget start of the failed statement
+        :param exception_context: ExceptionContext
+        :return: None
+        """
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+    def log_slow_query(self, conn, statement: str, parameters: Any,
+                       executemany: bool, duration: float) -> None:
+        """
+        Log slow statement with its query plan.
+        Plan is only explained for statements reading data
+        :param conn: Connection
+        :param statement: str
+        :param parameters: Any
+        :param executemany: bool
+        :param duration: float - seconds
+        :return: None
+        """
+        plan = None
+        explained = statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS)
+        if explained and not executemany:
+            plan = self.explain(conn, statement, parameters)
+
+        self.slow_query_logger.warning(json.dumps({
+            'duration_ms': round(duration * 1000, 3),
+            'statement': statement,
+            'parameters': repr(parameters),
+            'path': request.full_path.rstrip('?')
+            if has_request_context() else None,
+            'plan': plan,
+        }))
+
+    @staticmethod
+    def explain(conn, statement: str, parameters: Any) -> Optional[str]:
+        """
+        Query plan of the statement. Raw cursor is used,
+        so the plan statement itself is not instrumented
+        :param conn: Connection
+        :param statement: str
+        :param parameters: Any
+        :return: Optional[str]
+        """
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' \
+            else 'EXPLAIN '
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return '\n'.join(' '.join(str(value) for value in row)
+                             for row in cursor.fetchall())
+        except Exception as err:
+            return f'explain failed: {err}'
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def instrument_upstream(func: Callable) -> Callable:
+        """
+        Wrap request method of the Book Reviews client
+        :param func: Callable
+        :return: Callable
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = current_metrics.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_upstream(time.perf_counter() - started)
+
+        wrapper.instrumented = True
+        return wrapper
+
+    @staticmethod
+    def instrument_upstream_cache(func: Callable) -> Callable:
+        """
+        Wrap get method of the Book Reviews documents cache
+        :param func: Callable
+        :return: Callable
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            value = func(*args, **kwargs)
+            metrics = current_metrics.get()
+            if metrics is not None:
+                metrics.add_upstream_cache(value is not MISSING)
+            return value
+
+        wrapper.instrumented = True
+        return wrapper
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,283 @@
+"""
+In-memory Interval Index of Model Time Spans
+"""
+import random
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.snapshot import Snapshot
+
+# Span is (start, end), row loaded from the database is (id, start, end,
+# updated_at) with the time of its last modification
+Span = Tuple[datetime, datetime]
+Row = Tuple[int, Optional[datetime], Optional[datetime], datetime]
+
+
+class InvalidTimeRange(ValueError):
+    """
+    Raised when time range bound is not a datetime
+    or range ends before it starts
+    """
+
+
+def parse_moment(value: str) -> datetime:
+    """
+    Parse ISO 8601 date or datetime. Datetimes with offset are
+    converted to local time, in which event times are stored.
+    Raises InvalidTimeRange when value can not be parsed
+    :param value: str
+    :return: datetime
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidTimeRange(value) from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+class _Node:
+    """
+    Node of the tree, keyed by span start and id. Holds the latest
+    end of the spans within its subtree, so subtrees ending before
+    the searched range are skipped
+    """
+    __slots__ = ('key', 'end', 'max_end', 'priority', 'left', 'right')
+
+    def __init__(self, key: Tuple[datetime, int], end: datetime,
+                 priority: float) -> None:
+        self.key = key
+        self.end = end
+        self.max_end = end
+        self.priority = priority
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+
+    def update(self) -> None:
+        """
+        Recompute latest end after children changed
+        :return: None
+        """
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+def _split(node: Optional[_Node], key: Tuple[datetime, int]) \
+        -> Tuple[Optional[_Node], Optional[_Node]]:
+    """
+    Split the tree into nodes with lower keys and the rest
+    """
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) \
+        -> Optional[_Node]:
+    """
+    Merge trees, all keys of the left one being lower
+    """
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _insert(node: Optional[_Node], new: _Node) -> _Node:
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.key)
+        new.update()
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    node.update()
+    return node
+
+
+def _remove(node: Optional[_Node], key: Tuple[datetime, int]) \
+        -> Optional[_Node]:
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    node.update()
+    return node
+
+
+def _build(items: List[Tuple[Tuple[datetime, int], datetime]],
+           low: int, high: int) -> Optional[_Node]:
+    """
+    Build balanced tree of sorted items, priorities are assigned later
+    """
+    if low >= high:
+        return None
+    middle = (low + high) // 2
+    key, end = items[middle]
+    node = _Node(key, end, 0.0)
+    node.left = _build(items, low, middle)
+    node.right = _build(items, middle + 1, high)
+    node.update()
+    return node
+
+
+class IntervalTree:
+    """
+    Treap of spans augmented with the latest end of every subtree.
+    Spans overlapping a range are found in O(log n + k) expected time,
+    spans are added and removed one by one in O(log n)
+    """
+    def __init__(self, spans: Optional[Dict[int, Span]] = None) -> None:
+        """
+        Initialize Tree, building it at once from the spans given
+        :param spans: Optional[Dict[int, Span]] = None - by id
+        """
+        self.spans: Dict[int, Span] = dict(spans or {})
+        items = sorted(((start, id_), end)
+                       for id_, (start, end) in self.spans.items())
+        self.root = _build(items, 0, len(items))
+
+        # Random priorities sorted from the root down keep the heap order
+        # of the balanced tree, later insertions are balanced by them
+        priorities = sorted((random.random() for _ in items), reverse=True)
+        queue = deque([self.root] if self.root is not None else [])
+        for priority in priorities:
+            node = queue.popleft()
+            node.priority = priority
+            queue.extend(child for child in (node.left, node.right)
+                         if child is not None)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def add(self, id_: int, start: datetime, end: datetime) -> None:
+        """
+        Add span of the object or replace its previous one
+        :param id_: int
+        :param start: datetime
+        :param end: datetime
+        :return: None
+        """
+        self.remove(id_)
+        self.spans[id_] = (start, end)
+        self.root = _insert(self.root,
+                            _Node((start, id_), end, random.random()))
+
+    def remove(self, id_: int) -> None:
+        """
+        Remove span of the object
+        :param id_: int
+        :return: None
+        """
+        span = self.spans.pop(id_, None)
+        if span is not None:
+            self.root = _remove(self.root, (span[0], id_))
+
+    def overlapping(self, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[int]:
+        """
+        Return ids of spans overlapping [start, end) range.
+        Range is unbounded on the side not given
+        :param start: Optional[datetime] = None
+        :param end: Optional[datetime] = None
+        :return: List[int]
+        """
+        start = start or datetime.min
+        end = end or datetime.max
+        ids = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.key[0] < end:
+                if node.end > start:
+                    ids.append(node.key[1])
+                stack.append(node.right)
+        return ids
+
+
+class IntervalIndex(Snapshot):
+    """
+    Interval tree of object time spans, loaded from rows of id, start,
+    end and modification time. Objects deleted by other processes stay
+    until the next load, so found ids have to be looked up in the database
+    """
+    def __init__(self, loader: Callable[[Optional[datetime]], Iterable[Row]],
+                 max_age: float = 3600.0,
+                 refresh_interval: float = 5.0) -> None:
+        """
+        Initialize Index
+        :param loader: Callable[[Optional[datetime]], Iterable[Row]] -
+            returns rows of objects modified since the time given,
+            or of all of them
+        :param max_age: float = 3600.0 - seconds before index is reloaded
+        :param refresh_interval: float = 5.0 - seconds between refreshes
+        """
+        super().__init__(loader, max_age, refresh_interval)
+        self.tree = IntervalTree()
+
+    def replace(self, rows: List[Row]) -> None:
+        """
+        Build tree of all spans, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        self.tree = IntervalTree({id_: (start, end)
+                                  for id_, start, end, _ in rows
+                                  if start is not None and end is not None})
+
+    def apply(self, rows: List[Row]) -> None:
+        """
+        Add or update spans, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        for id_, start, end, _ in rows:
+            if start is None or end is None:
+                self.tree.remove(id_)
+            else:
+                self.tree.add(id_, start, end)
+
+    def discard(self, id_: int) -> None:
+        """
+        Remove span of the object, called with the lock held
+        :param id_: int
+        :return: None
+        """
+        self.tree.remove(id_)
+
+    def overlapping(self, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[int]:
+        """
+        Return ids of objects, which spans overlap [start, end) range
+        :param start: Optional[datetime] = None
+        :param end: Optional[datetime] = None
+        :return: List[int]
+        """
+        self.sync()
+        with self._lock:
+            return self.tree.overlapping(start, end)
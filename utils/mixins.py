@@ -1,11 +1,13 @@
 """
 App Mixins
 """
-from typing import Dict, Tuple
+from typing import Any, Dict, Iterator, Tuple
 
 from flask import request
 from flask_babel import gettext as _
 
+from utils.export import stream_query
+
 
 class AdminRequiredMixin:
     """
@@ -30,3 +32,30 @@ class AdminRequiredMixin:
         :return: Tuple[Dict, int]
         """
         return {'message': _('admin_required')}, 400
+
+
+class StreamingExportMixin:
+    """
+    Stream admin panel exports from the server-side cursor in chunks,
+    instead of loading all exported rows at once.
+    Used with flask-admin SQLAlchemy ModelView
+    """
+    export_chunk_size = 1000
+
+    def _export_data(self) -> Tuple[None, Iterator[Any]]:
+        """
+        Return iterator over the rows of the current list view,
+        with its search, filters and sorting applied
+        :return: Tuple[None, Iterator[Any]]
+        """
+        view_args = self._get_list_extra_args()
+
+        sort_column = self._get_column_by_idx(view_args.sort)
+        if sort_column is not None:
+            sort_column = sort_column[0]
+
+        _count, query = self.get_list(0, sort_column, view_args.sort_desc,
+                                      view_args.search, view_args.filters,
+                                      execute=False,
+                                      page_size=self.export_max_rows)
+        return None, stream_query(query, self.export_chunk_size)
@@ -1,36 +1,281 @@
 """
 Pagination Utilities
 """
-from typing import Dict, Optional
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from flask_sqlalchemy import Pagination
 from marshmallow import Schema
+from sqlalchemy import DateTime, and_, tuple_
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.sql import ColumnElement
 
+from utils.instrumentation import timed_serialization
 
-def create_pagination(*, items: Pagination, schema: Schema,  page: int = 1,
-                      limit: int = 20, query_params: Optional[Dict] = None,
-                      url: str) -> Dict:
+
+class InvalidCursor(ValueError):
+    """
+    Raised when pagination cursor can not be decoded or applied
+    """
+
+
+class InvalidOrder(ValueError):
+    """
+    Raised when items are ordered by a column, that is not sortable
+    """
+
+
+class KeysetPagination:
+    """
+    Page of items fetched by seeking past a (order column, id) key
+    instead of OFFSET. Holds the keys of the neighbouring pages
+    in place of page numbers and has no total count.
+    Key is a dict with column values of the boundary row and
+    the direction of the page to fetch with it
+    """
+    def __init__(self, items: List, next_key: Optional[Dict] = None,
+                 prev_key: Optional[Dict] = None) -> None:
+        """
+        Initialize Page
+        :param items: List
+        :param next_key: Optional[Dict] = None
+        :param prev_key: Optional[Dict] = None
+        """
+        self.items = items
+        self.next_key = next_key
+        self.prev_key = prev_key
+
+
+def encode_cursor(key: Dict) -> str:
+    """
+    Pack pagination key into an opaque url-safe string
+    :param key: Dict
+    :return: str
+    """
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """
+    Unpack pagination key created by encode_cursor.
+    Empty cursor stands for the first page.
+    Raises InvalidCursor when cursor is malformed
+    :param cursor: str
+    :return: Dict
+    """
+    if not cursor:
+        return {}
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (TypeError, ValueError) as err:
+        raise InvalidCursor('Malformed cursor') from err
+
+    if not isinstance(key, dict) or not isinstance(key.get('key'), list) \
+            or key.get('direction') not in ('next', 'prev'):
+        raise InvalidCursor('Malformed cursor')
+    return key
+
+
+def seek(queryset: Query, columns: Sequence[InstrumentedAttribute], *,
+         limit: int = 20, cursor: Dict, descending: bool = False,
+         attrs: Optional[Sequence[str]] = None) -> KeysetPagination:
+    """
+    Paginate given query by seeking past the key stored in the cursor
+    instead of using OFFSET. Query is ordered by the given columns,
+    the last of which has to be unique and not nullable. Rows with NULL
+    in the first column are ordered after all others, or before them
+    in descending order. Total number of rows is not counted
+    :param queryset: Query
+    :param columns: Sequence[InstrumentedAttribute]
+    :param limit: int = 20
+    :param cursor: Dict
+    :param descending: bool = False
+    :param attrs: Optional[Sequence[str]] = None - item attributes holding
+        values of the columns, defaults to the columns keys
+    :return: KeysetPagination
+    """
+    attrs = attrs or [column.key for column in columns]
+    backwards = cursor.get('direction') == 'prev'
+    # Going to the previous page is the same seek in the reversed order
+    reverse = descending != backwards
+
+    bound = None
+    if cursor.get('key'):
+        if len(cursor['key']) != len(columns):
+            raise InvalidCursor('Malformed cursor')
+
+        bound = [_restore_value(column, value)
+                 for column, value in zip(columns, cursor['key'])]
+
+    items = []
+    for condition, order_by in _seek_phases(columns, bound, reverse):
+        query = queryset if condition is None \
+            else queryset.filter(condition)
+        items += query.order_by(*order_by) \
+            .limit(limit + 1 - len(items)).all()
+        if len(items) > limit:
+            break
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+
+    if not items:
+        return KeysetPagination(items)
+
+    next_key = prev_key = None
+    if backwards or has_more:
+        next_key = _item_key(items[-1], attrs, 'next')
+    if has_more if backwards else cursor.get('key'):
+        prev_key = _item_key(items[0], attrs, 'prev')
+    return KeysetPagination(items, next_key=next_key, prev_key=prev_key)
+
+
+def _seek_past(columns: Sequence[InstrumentedAttribute],
+               bound: Optional[List], reverse: bool) \
+        -> Tuple[Optional[ColumnElement], List[ColumnElement]]:
+    """
+    Condition of the rows following the bound in the order of the
+    columns, or preceding it when reverse, and the order itself.
+    Columns are compared as a row value, which indexes serve
+    :param columns: Sequence[InstrumentedAttribute]
+    :param bound: Optional[List] - None to start from the first row
+    :param reverse: bool
+    :return: Tuple[Optional[ColumnElement], List[ColumnElement]]
+    """
+    order_by = [column.desc() if reverse else column.asc()
+                for column in columns]
+    if bound is None:
+        return None, order_by
+    key, bound = tuple_(*columns), tuple_(*bound)
+    return key < bound if reverse else key > bound, order_by
+
+
+def _seek_phases(columns: Sequence[InstrumentedAttribute],
+                 bound: Optional[List], reverse: bool) \
+        -> List[Tuple[Optional[ColumnElement], List[ColumnElement]]]:
+    """
+    Conditions and orders of the rows following the bound, queried
+    one after another until the page is full. Row value comparison
+    skips NULLs, so rows with NULL in the first column, which come
+    after the others, or before them when reverse, are queried
+    on their own, ordered by the rest of the columns
+    :param columns: Sequence[InstrumentedAttribute]
+    :param bound: Optional[List] - None to start from the first row
+    :param reverse: bool
+    :return: List[Tuple[Optional[ColumnElement], List[ColumnElement]]]
+    """
+    column, rest = columns[0], columns[1:]
+    if not rest or not any(getattr(expression, 'nullable', False)
+                           for expression in column.property.columns):
+        return [_seek_past(columns, bound, reverse)]
+
+    def phase(condition: ColumnElement, columns_: Sequence,
+              bound_: Optional[List]) \
+            -> Tuple[ColumnElement, List[ColumnElement]]:
+        past, order_by = _seek_past(columns_, bound_, reverse)
+        return (condition if past is None else and_(condition, past),
+                order_by)
+
+    values = column.isnot(None)
+    nulls = column.is_(None)
+    if bound is None:
+        phases = [phase(values, columns, None), phase(nulls, rest, None)]
+        return phases[::-1] if reverse else phases
+    if bound[0] is None:
+        phases = [phase(nulls, rest, bound[1:])]
+        return phases + [phase(values, columns, None)] if reverse \
+            else phases
+    phases = [phase(values, columns, bound)]
+    return phases if reverse else phases + [phase(nulls, rest, None)]
+
+
+def _item_key(item: Any, attrs: Sequence[str], direction: str) -> Dict:
+    """
+    Build JSON serializable pagination key out of the item
+    :param item: Any
+    :param attrs: Sequence[str]
+    :param direction: str
+    :return: Dict
+    """
+    values = []
+    for attr in attrs:
+        value = getattr(item, attr)
+        values.append(value.isoformat()
+                      if isinstance(value, datetime) else value)
+    return {'key': values, 'direction': direction}
+
+
+def _restore_value(column: InstrumentedAttribute, value: Any) -> Any:
+    """
+    Restore value of the column stored in the pagination key
+    :param column: InstrumentedAttribute
+    :param value: Any
+    :return: Any
+    """
+    if isinstance(value, str) and isinstance(column.type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError as err:
+            raise InvalidCursor('Malformed cursor') from err
+    return value
+
+
+def create_pagination(*, items: Union[Pagination, KeysetPagination],
+                      schema: Schema, page: int = 1, limit: int = 20,
+                      query_params: Optional[Dict] = None,
+                      url: str, cursor: Optional[str] = None,
+                      dump_options: Optional[Dict] = None) -> Dict:
     """
     Create response from paginated items by adding a number of params,
-    such as links next and previous pages and other
-    :param items: Sequence
+    such as links next and previous pages and other.
+    Keyset paginated items get links with cursors instead of page numbers
+    :param items: Union[Pagination, KeysetPagination]
     :param schema: Schema
     :param page: int = 1
     :param limit: int = 20
     :param query_params: Optional[Dict]
     :param url: str
+    :param cursor: Optional[str] = None
+    :param dump_options: Optional[Dict] = None - passed to schema dump
     :return: Dict
     """
-    response = {
-        'page': page,
-        'limit': limit,
-    }
-
+    dump_options = dump_options or {}
     # Create url path out of given parameters
     query_params = (query_params or {}).copy()
     query_params = ''.join(
         [f'&{key}={value}' for key, value in query_params.items()])
 
+    if isinstance(items, KeysetPagination):
+        response = {
+            'cursor': cursor or '',
+            'limit': limit,
+        }
+
+        next_ = items.next_key and encode_cursor(items.next_key)
+        response['next'] = f'{url}?cursor={next_}' \
+                           f'&limit={limit}{query_params}' if next_ else None
+
+        prev = items.prev_key and encode_cursor(items.prev_key)
+        response['prev'] = f'{url}?cursor={prev}' \
+                           f'&limit={limit}{query_params}' if prev else None
+
+        with timed_serialization():
+            response['results'] = schema.dump(items.items, **dump_options)
+        return response
+
+    response = {
+        'page': page,
+        'limit': limit,
+    }
+
     # Add next page link or None
     next_ = items.next_num
     response[
@@ -43,6 +288,7 @@ def create_pagination(*, items: Pagination, schema: Schema,  page: int = 1,
         'prev'] = f'{url}?page={prev}' \
                   f'&limit={limit}{query_params}' if prev else None
 
-    response['results'] = schema.dump(items.items)
+    with timed_serialization():
+        response['results'] = schema.dump(items.items, **dump_options)
 
     return response
@@ -0,0 +1,204 @@
+"""
+In-memory Prefix Index of Model Names for Autocomplete
+"""
+import bisect
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, \
+    Tuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.unit_of_work import collect_until_commit
+
+# Names are matched by the beginning of any of their words
+WORD_START = re.compile(r'(?<!\w)\w')
+
+
+class PrefixIndex:
+    """
+    Sorted array of name keys searched with bisect.
+    Index is loaded from the database on the first lookup and reloaded
+    in the background after max_age seconds, while lookups are served
+    from the current one, so changes made by other processes show up
+    eventually. Changes committed through the tracked sessions
+    are applied right away, and again after a reload running meanwhile
+    """
+    def __init__(self, loader: Callable[[], Iterable[Tuple[int, str]]],
+                 max_age: float = 300.0) -> None:
+        """
+        Initialize Index
+        :param loader: Callable[[], Iterable[Tuple[int, str]]] - returns
+            id and name of every object
+        :param max_age: float = 300.0 - seconds before index is reloaded
+        """
+        self.loader = loader
+        self.max_age = max_age
+        self.loaded_at = None
+        self.names: Dict[int, str] = {}
+        self.keys: List[Tuple[str, int]] = []
+        # Changes committed while loads are running, one dict per load
+        self._loading: List[Dict[int, Optional[str]]] = []
+        self._reloading = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_keys(name: str) -> Set[str]:
+        """
+        Create keys of the name, one for every word it contains
+        :param name: str
+        :return: Set[str]
+        """
+        name = name.casefold()
+        return {name[match.start():] for match in WORD_START.finditer(name)}
+
+    def load(self) -> None:
+        """
+        Load all names, replacing current contents of the index.
+        Changes committed while names are loaded are applied again,
+        as they may be missing from the loaded ones
+        :return: None
+        """
+        changes = {}
+        with self._lock:
+            self._loading.append(changes)
+        try:
+            names = dict(self.loader())
+            keys = sorted((key, id_) for id_, name in names.items()
+                          for key in self.make_keys(name))
+            with self._lock:
+                self.names, self.keys = names, keys
+                self.apply_changes(changes)
+                self.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._loading.remove(changes)
+
+    def reload_in_background(self) -> None:
+        """
+        Load all names in a thread of its own, within context
+        of the current app. Only one reload runs at a time
+        :return: None
+        """
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        app = current_app._get_current_object()
+
+        def reload() -> None:
+            try:
+                with app.app_context():
+                    self.load()
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, daemon=True).start()
+
+    def invalidate(self) -> None:
+        """
+        Reload index on the next lookup
+        :return: None
+        """
+        self.loaded_at = None
+
+    def add(self, id_: int, name: str) -> None:
+        """
+        Add object to the index or update its name
+        :param id_: int
+        :param name: str
+        :return: None
+        """
+        with self._lock:
+            self.remove(id_)
+            self.names[id_] = name
+            for key in self.make_keys(name):
+                bisect.insort(self.keys, (key, id_))
+
+    def remove(self, id_: int) -> None:
+        """
+        Remove object from the index
+        :param id_: int
+        :return: None
+        """
+        with self._lock:
+            name = self.names.pop(id_, None)
+            if name is None:
+                return
+            for key in self.make_keys(name):
+                position = bisect.bisect_left(self.keys, (key, id_))
+                if position < len(self.keys) \
+                        and self.keys[position] == (key, id_):
+                    del self.keys[position]
+
+    def search(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Return id and name of objects, with a word of the name starting
+        with the prefix. Objects are sorted by the matched word
+        :param prefix: str
+        :param limit: int = 10
+        :return: List[Tuple[int, str]]
+        """
+        if self.loaded_at is None:
+            self.load()
+        elif time.monotonic() - self.loaded_at > self.max_age:
+            self.reload_in_background()
+
+        prefix = prefix.casefold()
+        results = {}
+        with self._lock:
+            position = bisect.bisect_left(self.keys, (prefix,))
+            while position < len(self.keys) and len(results) < limit:
+                key, id_ = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                results.setdefault(id_, self.names[id_])
+                position += 1
+        return list(results.items())
+
+    def track(self, model: type, session: Session) -> None:
+        """
+        Keep index in sync with the objects of the model flushed within
+        the session. Changes are applied once they are committed
+        :param model: type - model with id and name columns
+        :param session: Session - session or its factory
+        :return: None
+        """
+        pending = collect_until_commit(session, ('prefix_index', id(self)),
+                                       dict, self.apply_committed)
+
+        @event.listens_for(session, 'after_flush')
+        def collect(session_: Session, flush_context) -> None:
+            changes = pending(session_)
+            for obj in list(session_.new) + list(session_.dirty):
+                if isinstance(obj, model):
+                    changes[obj.id] = obj.name
+            for obj in session_.deleted:
+                if isinstance(obj, model):
+                    changes[obj.id] = None
+
+    def apply_committed(self, changes: Dict[int, Optional[str]]) -> None:
+        """
+        Apply committed names, None of deleted objects
+        :param changes: Dict[int, Optional[str]]
+        :return: None
+        """
+        with self._lock:
+            for loading in self._loading:
+                loading.update(changes)
+            self.apply_changes(changes)
+
+    def apply_changes(self, changes: Dict[int, Optional[str]]) -> None:
+        """
+        Add or remove objects, called with the lock held
+        :param changes: Dict[int, Optional[str]]
+        :return: None
+        """
+        for id_, name in changes.items():
+            if name is None:
+                self.remove(id_)
+            else:
+                self.add(id_, name)
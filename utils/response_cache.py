@@ -0,0 +1,237 @@
+"""
+Server-side Cache of GET Endpoints Responses
+"""
+import json
+import threading
+from functools import wraps
+from typing import Callable, Dict, Optional, Union
+from urllib.parse import urlencode
+
+from flask import Flask, request
+from flask_babel import get_locale, get_timezone
+
+from utils.cache import MISSING, TTLCache
+from utils.conditional import is_not_modified, not_modified
+
+
+class MemoryBackend:
+    """
+    Cache backend keeping responses in the process memory
+    """
+    def __init__(self, maxsize: int = 10000) -> None:
+        """
+        Initialize Backend
+        :param maxsize: int = 10000 - number of cached responses
+        """
+        self.entries = TTLCache(maxsize=maxsize)
+        # Counters are kept apart from the entries, so they are never evicted
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return value stored under the key
+        :param key: str
+        :return: Optional[str]
+        """
+        value = self.entries.get(key)
+        return None if value is MISSING else value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        Store value under the key for ttl seconds
+        :param key: str
+        :param value: str
+        :param ttl: float
+        :return: None
+        """
+        self.entries.set(key, value, ttl=ttl)
+
+    def counter(self, key: str) -> int:
+        """
+        Return value of the counter
+        :param key: str
+        :return: int
+        """
+        return self.counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        """
+        Increment counter and return its new value
+        :param key: str
+        :return: int
+        """
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+
+class RedisBackend:
+    """
+    Cache backend shared by all app processes through Redis
+    or any server speaking its protocol. Requires redis package
+    """
+    def __init__(self, url: str) -> None:
+        """
+        Initialize Backend
+        :param url: str - redis://host:port/db
+        """
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return value stored under the key
+        :param key: str
+        :return: Optional[str]
+        """
+        value = self.client.get(key)
+        return None if value is None else value.decode()
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        Store value under the key for ttl seconds
+        :param key: str
+        :param value: str
+        :param ttl: float
+        :return: None
+        """
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def counter(self, key: str) -> int:
+        """
+        Return value of the counter
+        :param key: str
+        :return: int
+        """
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        """
+        Increment counter and return its new value
+        :param key: str
+        :return: int
+        """
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """
+    Cache of successful GET responses keyed by the endpoint scope,
+    normalized query arguments, locale and timezone.
+    Every scope has a generation counter, which is a part of the key,
+    so increasing it invalidates all cached responses of the scope.
+    ETag of the response is cached along, so conditional requests
+    are answered from the cache as well. Hits and misses are counted
+    by the backend, so they are shared by processes sharing it
+    """
+    def __init__(self, backend: Union[MemoryBackend, RedisBackend, None]
+                 = None, ttl: float = 30.0) -> None:
+        """
+        Initialize Cache
+        :param backend: Union[MemoryBackend, RedisBackend, None] = None
+        :param ttl: float = 30.0 - seconds to keep responses
+        """
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Configure cache from RESPONSE_CACHE_URL and RESPONSE_CACHE_TTL
+        app settings. URL is either memory:// or redis://
+        :param app: Flask
+        :return: None
+        """
+        url = app.config.get('RESPONSE_CACHE_URL') or 'memory://'
+        self.backend = RedisBackend(url) \
+            if url.startswith(('redis://', 'rediss://', 'unix://')) \
+            else MemoryBackend()
+        self.ttl = float(app.config.get('RESPONSE_CACHE_TTL', self.ttl))
+
+    def cached(self, scope: str, id_arg: Optional[str] = None) -> Callable:
+        """
+        Decorator caching responses of the endpoint.
+        When id_arg is given every object gets a scope of its own
+        :param scope: str
+        :param id_arg: Optional[str] = None - view argument with object id
+        :return: Callable
+        """
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = self._key(scope if id_arg is None
+                                else f'{scope}:{kwargs[id_arg]}')
+
+                payload = self.backend.get(key)
+                if payload is not None:
+                    self.backend.incr('stats:hits')
+                    body, status, headers = json.loads(payload)
+                    if is_not_modified(headers.get('ETag')):
+                        response = not_modified(headers.get('ETag'))
+                        response.headers['X-Cache'] = 'HIT'
+                        return response
+                    headers['X-Cache'] = 'HIT'
+                    return body, status, headers
+
+                self.backend.incr('stats:misses')
+                response = func(*args, **kwargs)
+                if not isinstance(response, tuple):
+                    return response
+
+                body, status = response[0], response[1]
+                headers = dict(response[2]) if len(response) > 2 else {}
+                if status == 200:
+                    validators = {name: value
+                                  for name, value in headers.items()
+                                  if name in ('ETag', 'Last-Modified')}
+                    self.backend.set(key,
+                                     json.dumps([body, status, validators]),
+                                     self.ttl)
+                headers['X-Cache'] = 'MISS'
+                return body, status, headers
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, scope: str, *ids: int) -> None:
+        """
+        Invalidate cached responses of the scope,
+        or of the objects within it, when ids are given
+        :param scope: str
+        :param ids: int
+        :return: None
+        """
+        if not ids:
+            self.backend.incr(f'generation:{scope}')
+        for id_ in set(ids):
+            self.backend.incr(f'generation:{scope}:{id_}')
+
+    def stats(self) -> Dict:
+        """
+        Return cache usage counters
+        :return: Dict
+        """
+        hits = self.backend.counter('stats:hits')
+        misses = self.backend.counter('stats:misses')
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
+
+    def _key(self, scope: str) -> str:
+        """
+        Build key of the current request response
+        :param scope: str
+        :return: str
+        """
+        generation = self.backend.counter(f'generation:{scope}')
+        args = urlencode(sorted(request.args.items(multi=True)))
+        return f'response:{scope}:{generation}:{get_locale()}:' \
+               f'{get_timezone()}:{request.host}:{args}'
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,210 @@
+"""
+Precompiled Serializers producing the same output as Marshmallow Schemas
+"""
+from datetime import datetime, timezone
+from functools import partial
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, \
+    List, Optional, Tuple, Union
+
+from babel import dates
+from flask import current_app
+from flask_babel import get_locale, get_timezone
+from marshmallow import fields, Schema
+
+from utils.instrumentation import timed_serialization
+
+# Fields whose values are dumped as they are stored in the model
+PLAIN_FIELDS = (fields.Integer, fields.String, fields.Boolean)
+
+
+class InvalidFields(ValueError):
+    """
+    Raised when client asks for fields, that can not be dumped
+    """
+
+
+def parse_fields(value: Optional[str], allowed: Iterable[str]) \
+        -> Optional[FrozenSet[str]]:
+    """
+    Parse comma separated list of fields requested by client.
+    Returns None when all fields are requested
+    :param value: Optional[str]
+    :param allowed: Iterable[str]
+    :return: Optional[FrozenSet[str]]
+    """
+    if value is None:
+        return None
+
+    fields_ = frozenset(field.strip() for field in value.split(',')
+                        if field.strip())
+    unknown = fields_.difference(allowed)
+    if not fields_ or unknown:
+        raise InvalidFields(', '.join(sorted(unknown)))
+    return fields_
+
+
+class DatetimeFormatter:
+    """
+    Format datetimes the way flask_babel.format_datetime does,
+    with locale, timezone and format resolved once.
+    Formatted values are memoized, as rows often share them
+    """
+    def __init__(self, format_: Optional[str] = None) -> None:
+        """
+        Initialize Formatter for the current request
+        :param format_: Optional[str] = None - defaults to the app
+            datetime format, iso skips Babel
+        """
+        self.iso = format_ == 'iso'
+        self._memo = {}
+        if self.iso:
+            return
+
+        # Same lookup of the app defaults as flask_babel does
+        date_formats = current_app.extensions['babel'].date_formats
+        format_ = format_ or date_formats['datetime']
+        format_ = date_formats.get(f'datetime.{format_}') or format_
+        self._format = partial(dates.format_datetime, format=format_,
+                               tzinfo=get_timezone(), locale=get_locale())
+
+    def __call__(self, value: Optional[datetime]) -> Optional[str]:
+        """
+        Format datetime. Naive datetimes are taken as UTC
+        :param value: Optional[datetime]
+        :return: Optional[str]
+        """
+        if value is None:
+            return None
+
+        formatted = self._memo.get(value)
+        if formatted is None:
+            if self.iso:
+                formatted = (value if value.tzinfo else
+                             value.replace(tzinfo=timezone.utc)).isoformat()
+            else:
+                formatted = self._format(value)
+            self._memo[value] = formatted
+        return formatted
+
+
+class DumpContext:
+    """
+    State shared by all objects dumped within a single call
+    """
+    def __init__(self, now: Optional[datetime] = None,
+                 datetime_format: Optional[str] = None) -> None:
+        """
+        Initialize Context
+        :param now: Optional[datetime] = None
+        :param datetime_format: Optional[str] = None
+        """
+        self.now = now or datetime.now()
+        self.format_datetime = DatetimeFormatter(datetime_format)
+
+
+# Getter receives the object being dumped and the dump context
+Getter = Callable[[Any, DumpContext], Any]
+
+
+class Serializer:
+    """
+    Serializer compiled once from the schema dump fields.
+    Plain fields are read straight from the object, nested schemas
+    are compiled as well, other fields are dumped by Marshmallow.
+    Keys come in the schema order, so JSON output is the same
+    """
+    def __init__(self, schema: Schema) -> None:
+        """
+        Compile Serializer
+        :param schema: Schema
+        """
+        self.schema = schema
+        self.many = schema.many
+        self.dump_fields = schema.dump_fields
+        self.getters: List[Tuple[str, Getter]] = [
+            (field.data_key or name, self.compile_field(name, field))
+            for name, field in schema.dump_fields.items()
+        ]
+
+    def compile_field(self, name: str, field: fields.Field) -> Getter:
+        """
+        Create getter of the field value
+        :param name: str
+        :param field: fields.Field
+        :return: Getter
+        """
+        attribute = field.attribute or name
+
+        if type(field) in PLAIN_FIELDS and not getattr(field, 'as_string',
+                                                       False):
+            get = attrgetter(attribute)
+            return lambda obj, context: get(obj)
+
+        if isinstance(field, fields.Nested) \
+                and isinstance(field.schema, Schema):
+            nested = Serializer(field.schema)
+            get = attrgetter(attribute)
+
+            def get_nested(obj: Any, context: DumpContext) -> Any:
+                value = get(obj)
+                if value is None:
+                    return None
+                if nested.many:
+                    return [nested.dump_one(item, context)
+                            for item in value]
+                return nested.dump_one(value, context)
+
+            return get_nested
+
+        return lambda obj, context: field.serialize(name, obj)
+
+    def dump_one(self, obj: Any, context: DumpContext) -> Dict:
+        """
+        Dump single object
+        :param obj: Any
+        :param context: DumpContext
+        :return: Dict
+        """
+        return {key: get(obj, context) for key, get in self.getters}
+
+    def dump(self, obj: Any, many: Optional[bool] = None,
+             now: Optional[datetime] = None,
+             datetime_format: Optional[str] = None) \
+            -> Union[Dict, List[Dict]]:
+        """
+        Dump object or list of objects, the same way schema does
+        :param obj: Any
+        :param many: Optional[bool] = None - defaults to schema many
+        :param now: Optional[datetime] = None - current time,
+            taken once per call unless given
+        :param datetime_format: Optional[str] = None
+        :return: Union[Dict, List[Dict]]
+        """
+        context = DumpContext(now, datetime_format)
+        with timed_serialization():
+            if self.many if many is None else many:
+                return [self.dump_one(item, context) for item in obj]
+            return self.dump_one(obj, context)
+
+    def dump_iter(self, objs: Iterable[Any],
+                  now: Optional[datetime] = None,
+                  datetime_format: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Dump objects one by one, as they are iterated
+        :param objs: Iterable[Any]
+        :param now: Optional[datetime] = None
+        :param datetime_format: Optional[str] = None
+        :return: Iterator[Dict]
+        """
+        context = DumpContext(now, datetime_format)
+        for obj in objs:
+            yield self.dump_one(obj, context)
+
+    @property
+    def keys(self) -> List[str]:
+        """
+        Keys of the dumped objects in their order
+        :return: List[str]
+        """
+        return [key for key, _ in self.getters]
@@ -0,0 +1,171 @@
+"""
+In-memory Snapshot of Model Rows Refreshed by Modification Time
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.unit_of_work import collect_until_commit
+
+# Row loaded from the database starts with the object id
+# and ends with the time of its last modification
+Row = Sequence
+
+
+class Snapshot:
+    """
+    Rows of objects kept in memory of the process.
+    Snapshot is loaded from the database on the first lookup and after
+    max_age seconds. In between, rows modified since the latest loaded
+    modification are refreshed after changes committed through
+    the tracked sessions and every refresh_interval seconds,
+    so changes made by other processes show up as well.
+    Objects deleted by other processes stay until the next load.
+    Subclasses keep rows in structures of their own
+    """
+    # Rows committed later than modified are read again within the lag
+    lag = timedelta(seconds=10)
+
+    def __init__(self, loader: Callable[[Optional[datetime]], Iterable[Row]],
+                 max_age: float = 3600.0,
+                 refresh_interval: float = 5.0) -> None:
+        """
+        Initialize Snapshot
+        :param loader: Callable[[Optional[datetime]], Iterable[Row]] -
+            returns rows of objects modified since the time given,
+            or of all of them
+        :param max_age: float = 3600.0 - seconds before snapshot is reloaded
+        :param refresh_interval: float = 5.0 - seconds between refreshes
+        """
+        self.loader = loader
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        # Lookups are only made through the snapshot when it is enabled
+        self.enabled = False
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.modified_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+
+    def replace(self, rows: List[Row]) -> None:
+        """
+        Replace all rows, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        raise NotImplementedError
+
+    def apply(self, rows: List[Row]) -> None:
+        """
+        Add or update the rows, called with the lock held
+        :param rows: List[Row]
+        :return: None
+        """
+        raise NotImplementedError
+
+    def discard(self, id_: int) -> None:
+        """
+        Remove row of the object, called with the lock held
+        :param id_: int
+        :return: None
+        """
+        raise NotImplementedError
+
+    def load(self) -> None:
+        """
+        Load all rows, replacing current contents of the snapshot
+        :return: None
+        """
+        rows = list(self.loader(None))
+        with self._lock:
+            self.replace(rows)
+            self.modified_at = max((row[-1] for row in rows), default=None)
+            self.loaded_at = self.refreshed_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """
+        Apply rows of the objects modified since the latest
+        loaded modification
+        :return: None
+        """
+        since = self.modified_at - self.lag \
+            if self.modified_at is not None else None
+        rows = list(self.loader(since))
+        with self._lock:
+            self.apply(rows)
+            for row in rows:
+                if self.modified_at is None or row[-1] > self.modified_at:
+                    self.modified_at = row[-1]
+            self.refreshed_at = time.monotonic()
+
+    def sync(self) -> None:
+        """
+        Load or refresh the snapshot, when it is due
+        :return: None
+        """
+        now = time.monotonic()
+        if self.loaded_at is None or now - self.loaded_at > self.max_age:
+            self.load()
+        elif self.refreshed_at is None \
+                or now - self.refreshed_at > self.refresh_interval:
+            self.refresh()
+
+    def invalidate(self) -> None:
+        """
+        Refresh snapshot on the next lookup
+        :return: None
+        """
+        self.refreshed_at = None
+
+    def remove(self, id_: int) -> None:
+        """
+        Remove object from the snapshot
+        :param id_: int
+        :return: None
+        """
+        with self._lock:
+            self.discard(id_)
+
+    def track(self, model: type, session: Session) -> None:
+        """
+        Keep snapshot in sync with the objects of the model changed
+        within the session. Deleted objects are removed once deletion
+        is committed, other changes are refreshed on the next lookup,
+        as bulk updates do not tell which objects they changed
+        :param model: type - model with id column
+        :param session: Session - session or its factory
+        :return: None
+        """
+        pending = collect_until_commit(session, ('snapshot', id(self)),
+                                       set, self.apply_committed)
+
+        @event.listens_for(session, 'after_flush')
+        def collect(session_: Session, flush_context) -> None:
+            changes = pending(session_)
+            for obj in list(session_.new) + list(session_.dirty):
+                if isinstance(obj, model):
+                    changes.add(None)
+            for obj in session_.deleted:
+                if isinstance(obj, model):
+                    changes.add(obj.id)
+
+        @event.listens_for(session, 'after_bulk_update')
+        @event.listens_for(session, 'after_bulk_delete')
+        def collect_bulk(context) -> None:
+            if getattr(context.mapper, 'class_', None) is model:
+                pending(context.session).add(None)
+
+    def apply_committed(self, changes: Set[Optional[int]]) -> None:
+        """
+        Remove deleted objects and refresh snapshot on the next lookup
+        :param changes: Set[Optional[int]] - ids of deleted objects,
+            None when other objects changed
+        :return: None
+        """
+        for id_ in changes - {None}:
+            self.remove(id_)
+        self.invalidate()
@@ -0,0 +1,190 @@
+"""
+Request-scoped Unit of Work committing Changes once per Request
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+from flask import Flask, Response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import SessionTransaction
+
+# Requests of these methods do not change data, their transaction
+# is rolled back once the session is removed, after streaming is done
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _boundary(transaction: SessionTransaction) -> SessionTransaction:
+    """
+    Savepoint or outermost transaction, that the transaction
+    is committed or rolled back with
+    :param transaction: SessionTransaction
+    :return: SessionTransaction
+    """
+    while transaction.parent is not None and not transaction.nested:
+        transaction = transaction.parent
+    return transaction
+
+
+def collect_until_commit(session: Session, key: Hashable,
+                         factory: Callable[[], Any],
+                         apply: Callable[[Any], None]) \
+        -> Callable[[Session], Any]:
+    """
+    Keep changes collected within transactions of the session until
+    the outermost one is committed, and apply them then. Changes of
+    a savepoint are merged into the enclosing transaction when it is
+    released and dropped when it is rolled back, as are changes of
+    a rolled back transaction. Returns function giving changes of the
+    current transaction of the session, which are collected into
+    :param session: Session - session or its factory
+    :param key: Hashable - unique key of the changes in session info
+    :param factory: Callable[[], Any] - creates empty changes,
+        which are merged with update method
+    :param apply: Callable[[Any], None] - applies committed changes
+    :return: Callable[[Session], Any]
+    """
+    def pending(session_: Session,
+                transaction: Optional[SessionTransaction] = None) -> Any:
+        transaction = _boundary(transaction or session_.transaction)
+        return session_.info.setdefault(key, {}) \
+            .setdefault(transaction, factory())
+
+    @event.listens_for(session, 'after_commit')
+    def commit(session_: Session) -> None:
+        transaction = _boundary(session_.transaction)
+        changes = session_.info.get(key, {}).pop(transaction, None)
+        if transaction.parent is not None:
+            if changes:
+                pending(session_, transaction.parent).update(changes)
+            return
+
+        session_.info.pop(key, None)
+        if changes:
+            apply(changes)
+
+    @event.listens_for(session, 'after_rollback')
+    def rollback(session_: Session) -> None:
+        transaction = _boundary(session_.transaction)
+        session_.info.get(key, {}).pop(transaction, None)
+        if transaction.parent is None:
+            session_.info.pop(key, None)
+
+    return pending
+
+
+class UnitOfWork:
+    """
+    One transaction per request. Models flush their changes instead
+    of committing them, and the transaction is committed once the
+    request is handled, or rolled back when it is answered with
+    an error, so a request failing halfway leaves no changes.
+    Callbacks deferred with on_commit run after the outermost
+    transaction is committed, so that caches are not invalidated
+    before changes are visible to other requests.
+    Blocks run within savepoint fail on their own, leaving changes
+    of the rest of the request to be committed
+    """
+    def __init__(self, session: Optional[Session] = None,
+                 app: Optional[Flask] = None) -> None:
+        """
+        Initialize Unit of Work
+        :param session: Optional[Session] = None - session or its factory
+        :param app: Optional[Flask] = None
+        """
+        self.session = session
+        self._pending = None
+        if session is not None:
+            self.track(session)
+        if app is not None:
+            self.init_app(app)
+
+    def track(self, session: Session) -> None:
+        """
+        Run deferred callbacks once changes of the session are committed
+        :param session: Session - session or its factory
+        :return: None
+        """
+        self.session = session
+        self._pending = collect_until_commit(
+            session, ('unit_of_work', id(self)), dict, self.run_callbacks
+        )
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Commit transaction of every request changing data
+        :param app: Flask
+        :return: None
+        """
+        app.after_request(self.finish_request)
+
+    def finish_request(self, response: Response) -> Response:
+        """
+        Commit changes of the request, unless it is answered with
+        a client or server error, in which case they are rolled back.
+        Commit failures are handled as errors of the request
+        :param response: Response
+        :return: Response
+        """
+        if request.method in SAFE_METHODS:
+            return response
+
+        if response.status_code >= 400:
+            self.session.rollback()
+        else:
+            self.session.commit()
+        return response
+
+    def on_commit(self, callback: Callable, *args: Any) -> None:
+        """
+        Defer call of the callback until changes are committed.
+        Callback is called once, however many times it is deferred
+        with the same arguments, and not at all when changes
+        are rolled back
+        :param callback: Callable
+        :param args: Any
+        :return: None
+        """
+        self._pending(self.session()).setdefault((callback, args))
+
+    @staticmethod
+    def run_callbacks(callbacks: Dict) -> None:
+        """
+        Call deferred callbacks in the order they were deferred
+        :param callbacks: Dict
+        :return: None
+        """
+        for callback, args in callbacks:
+            callback(*args)
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        """
+        Run the block within a savepoint. Changes of the block, along
+        with callbacks deferred within it, are rolled back when
+        it raises, and the exception is raised again
+        :return: Iterator[None]
+        """
+        connection = self.session.connection()
+        if connection.dialect.name == 'sqlite':
+            self.begin_sqlite(connection.connection)
+        with self.session.begin_nested():
+            yield
+
+    @staticmethod
+    def begin_sqlite(dbapi_connection) -> None:
+        """
+        SQLite driver only begins transaction before statements
+        changing data, so it is begun before the first savepoint,
+        which would be committed when released otherwise.
+        Raw cursor is used, so the statement is not instrumented
+        :param dbapi_connection: Connection - of sqlite3
+        :return: None
+        """
+        if dbapi_connection.in_transaction:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('BEGIN')
+        finally:
+            cursor.close()